@@ -1,24 +1,183 @@
-# Import the schedule_event function from the tools.calendar_tool module.
-# This function is responsible for interacting with the Google Calendar API to schedule events.
-from tools.calendar_tool import schedule_event
+# Standard library imports
+import datetime  # For working-hours arithmetic
+import os        # For reading scheduling settings from the environment
+import threading # For loading free/busy once per scheduler, even from parallel tasks
 
-# Define a function named `manage_calendar` that takes one argument: `task`.
-# The `task` parameter is expected to be a dictionary containing task details.
-def manage_calendar(task):
+# Import the Calendar helpers: single and batched inserts plus the free/busy query.
+# These are responsible for interacting with the Google Calendar API.
+from tools.calendar_tool import fetch_busy_intervals, schedule_event, schedule_events_bulk
+
+# Sorted, merged busy intervals with O(log n) conflict checks
+from utils.interval_index import IntervalIndex
+
+# Length of a booked client call, in minutes
+SLOT_MINUTES = int(os.environ.get("BROKER_CALENDAR_SLOT_MINUTES", "60"))
+
+# Working hours (UTC, like the events themselves) in which calls may be booked
+DAY_START_HOUR = int(os.environ.get("BROKER_CALENDAR_DAY_START", "9"))
+DAY_END_HOUR = int(os.environ.get("BROKER_CALENDAR_DAY_END", "17"))
+
+# Number of working days (Mon-Fri, starting today) searched for free slots
+HORIZON_DAYS = int(os.environ.get("BROKER_CALENDAR_HORIZON_DAYS", "5"))
+
+# Booked calls start on this grid (e.g. 10:00, 10:15, ...), even after odd-length meetings
+SLOT_STEP_MINUTES = 15
+
+
+class NoFreeSlotError(RuntimeError):
+    """Raised when no free slot is left within the scheduling horizon."""
+
+
+def _round_up(moment, minutes):
+    """Rounds a datetime up to the next multiple of `minutes` past the hour."""
+    step = datetime.timedelta(minutes=minutes)
+    floor = moment.replace(minute=0, second=0, microsecond=0)
+    return floor + step * -(-(moment - floor) // step)
+
+
+class CalendarScheduler:
+    """
+    Assigns conflict-free slots for calendar tasks within working hours.
+
+    Free/busy is fetched from the Calendar API once, on first use, and kept in an
+    `IntervalIndex`; every booking made through the scheduler is added to the index,
+    so tasks of the same run never double-book each other or existing events.
+    One scheduler is meant to live for one agent run.
+
+    Args:
+        now (datetime, optional): Earliest possible start (naive UTC); defaults to now.
+        slot_minutes (int): Length of each booked call.
+        horizon_days (int): Working days searched for free slots.
+        busy (list, optional): (start, end) busy intervals to use instead of querying
+                               the API (e.g. for tests).
     """
-    This function handles scheduling a calendar event for a client task.
-    Currently, it uses hardcoded data to demonstrate the scheduling logic.
-    In production, event details should ideally be extracted from the `task` parameter.
+
+    def __init__(self, now=None, slot_minutes=SLOT_MINUTES, horizon_days=HORIZON_DAYS, busy=None):
+        self.now = now or datetime.datetime.utcnow().replace(second=0, microsecond=0)
+        self.duration = datetime.timedelta(minutes=slot_minutes)
+        self.windows = self._working_windows(horizon_days)
+        self._busy = IntervalIndex(busy) if busy is not None else None
+        self._lock = threading.Lock()
+
+    def _working_windows(self, horizon_days):
+        """Lists the (start, end) working-hour windows to search, earliest first."""
+        windows = []
+        day = self.now.date()
+        while len(windows) < horizon_days:
+            if day.weekday() < 5:  # Skip Saturdays and Sundays
+                start = datetime.datetime.combine(day, datetime.time(DAY_START_HOUR))
+                end = datetime.datetime.combine(day, datetime.time(DAY_END_HOUR))
+                start = max(start, _round_up(self.now, SLOT_STEP_MINUTES))
+                if start + self.duration <= end:
+                    windows.append((start, end))
+            day += datetime.timedelta(days=1)
+        return windows
+
+    @property
+    def busy(self):
+        """The busy-interval index, loaded with one free/busy query on first use."""
+        if self._busy is None:
+            with self._lock:
+                if self._busy is None:
+                    intervals = fetch_busy_intervals(self.windows[0][0], self.windows[-1][1]) if self.windows else []
+                    self._busy = IntervalIndex(intervals)
+        return self._busy
+
+    def reserve(self):
+        """
+        Books the earliest free slot in the index (not yet in the calendar).
+
+        Returns:
+            datetime: Start of the reserved slot.
+
+        Raises:
+            NoFreeSlotError: If the horizon has no free slot left.
+        """
+        busy = self.busy
+        for window_start, window_end in self.windows:
+            candidate = window_start
+            while True:
+                slot = busy.next_free(candidate, self.duration, window_end)
+                if slot is None:
+                    break  # Day is full; try the next working day
+                aligned = _round_up(slot, SLOT_STEP_MINUTES)
+                if aligned == slot and busy.try_add(slot, slot + self.duration):
+                    return slot
+                # Off the grid, or another thread took the slot first: search again from here
+                candidate = aligned
+        raise NoFreeSlotError(f"No free {self.duration} slot in the next {len(self.windows)} working days")
+
+    def release(self, start):
+        """Frees a reserved slot whose event could not be created."""
+        self.busy.remove(start, start + self.duration)
+
+    def event_for(self, task, start):
+        """Builds the event for a calendar task booked at `start`."""
+        return {
+            "title": task.get("content") or "Client Call",  # The planned task describes the call
+            "time": start.isoformat(),
+            "duration_minutes": int(self.duration.total_seconds() // 60),
+        }
+
+
+def manage_calendar(task, scheduler=None):
+    """
+    Books a calendar event for a client task in the earliest free working-hours slot.
+
+    Parameters:
+        task (dict): Calendar task with a 'content' field (used as the event title).
+        scheduler (CalendarScheduler, optional): Shared scheduler of the current run, so
+                  free/busy is fetched once and tasks don't double-book; a new one is
+                  created if omitted.
+
+    Returns:
+        dict: The created event.
+
+    Raises:
+        NoFreeSlotError: If no slot is free within the scheduling horizon.
+        ApiCallError: If the event could not be created.
+    """
+    scheduler = scheduler or CalendarScheduler()
+    start = scheduler.reserve()
+    try:
+        # Send the event to Google Calendar via the API
+        return schedule_event(scheduler.event_for(task, start))
+    except Exception:
+        scheduler.release(start)  # The slot stays free for other tasks
+        raise
+
+
+def manage_calendar_bulk(tasks, scheduler=None):
+    """
+    Books events for many calendar tasks at once.
+
+    Slots are assigned locally against the free/busy index, then every event is
+    created through Calendar batch requests instead of one round trip per task.
+
+    Parameters:
+        tasks (list of dict): Calendar tasks, each with a 'content' field.
+        scheduler (CalendarScheduler, optional): Scheduler to book with (see `manage_calendar`).
+
+    Returns:
+        list of dict: One result per task, in order, with keys 'title', 'id', 'htmlLink',
+                      'start' and 'error' (see `tools.calendar_tool.schedule_events_bulk`).
     """
+    scheduler = scheduler or CalendarScheduler()
+    results = [None] * len(tasks)
+    events, indexes, starts = [], [], []
+    for index, task in enumerate(tasks):
+        try:
+            start = scheduler.reserve()
+        except NoFreeSlotError as e:
+            results[index] = {"title": task.get("content"), "id": None, "htmlLink": None,
+                              "start": None, "error": str(e)}
+            continue
+        events.append(scheduler.event_for(task, start))
+        indexes.append(index)
+        starts.append(start)
 
-    # Create a dictionary called `event` that holds the event details.
-    # The "title" key specifies the name of the calendar event.
-    # The "time" key contains the date and time in ISO 8601 format (e.g., "YYYY-MM-DDTHH:MM:SS").
-    event = {
-        "title": "Client Call",          # Static event title for now, shown in the calendar
-        "time": "2025-06-10T15:00:00"    # Static date/time string for the event
-    }
-
-    # Call the imported `schedule_event` function and pass the `event` dictionary to it.
-    # This triggers the logic that sends the event to Google Calendar via the API.
-    schedule_event(event)
\ No newline at end of file
+    for index, start, result in zip(indexes, starts, schedule_events_bulk(events)):
+        if result["error"] is not None:
+            scheduler.release(start)
+        results[index] = dict(result, start=start.isoformat())
+    return results
@@ -1,8 +1,8 @@
-# Import the function to send emails using Gmail API
-from tools.gmail_tool import send_email
+# Import the functions to send emails (one at a time or batched) using Gmail API
+from tools.gmail_tool import send_bulk, send_email
 
-# Import helper to fetch client email by name and to log completed tasks into the DB
-from utils.db import get_client_email_by_name, log_task_completion
+# Import the in-memory client directory used to resolve names to email addresses
+from utils.client_directory import ClientNotFoundError, get_client_directory
 
 
 def extract_client_name(content):
@@ -21,13 +21,45 @@ def extract_client_name(content):
     return match.group(1) if match else "Client"
 
 
+# Subject line used for every missing-documents reminder
+REMINDER_SUBJECT = "Follow-up Required for Pre-Approval"
+
+
+def build_reminder_body(name):
+    """
+    Builds the missing-documents reminder email for a client.
+
+    Parameters:
+        name (str): The client's name used in the greeting.
+
+    Returns:
+        str: Plain-text email body.
+    """
+    return f"""
+Hi {name},
+
+This is a reminder to send the following documents needed for your pre-approval:
+
+- ID proof
+- Bank statement
+- Payslip
+
+Please reply to this email or upload them via the Broker Portal.
+
+Regards,  
+Broker AI Assistant
+    """
+
+
 def handle_emails(task):
     """
     Handles an email task by:
     1. Extracting the client name from the task content.
-    2. Retrieving the associated client email from the database.
+    2. Resolving the client's email via the in-memory client directory.
     3. Constructing and sending a reminder email.
-    4. Logging the completion of the email task.
+
+    The completion is recorded by the caller (`main.run_agent` logs every finished
+    task under its ID), so it is not written to `completed_tasks` here.
 
     Parameters:
         task (dict): Dictionary with at least a "content" field describing the task.
@@ -35,35 +67,49 @@ def handle_emails(task):
 
     Returns:
         None
+
+    Raises:
+        ClientNotFoundError: If the name matches no client, so the task fails
+                             instead of emailing a placeholder address.
     """
 
     # Extract the client's name from the task content string
     name = extract_client_name(task["content"])
 
-    # Fetch the client's email address using the extracted name
-    client_email = get_client_email_by_name(name)
+    # Resolve the client's email address (exact, case-insensitive or fuzzy match)
+    client_email = get_client_directory().resolve_email(name)
 
-    # Define the email body using a formatted multi-line string
-    body = f"""
-Hi {name},
-
-This is a reminder to send the following documents needed for your pre-approval:
-
-- ID proof
-- Bank statement
-- Payslip
+    # Send the constructed email to the retrieved client email address
+    send_email(client_email, REMINDER_SUBJECT, build_reminder_body(name))
 
-Please reply to this email or upload them via the Broker Portal.
 
-Regards,  
-Broker AI Assistant
+def handle_emails_bulk(tasks):
     """
+    Handles many email tasks at once, sending all reminders through Gmail batch requests.
 
-    # Send the constructed email to the retrieved client email address
-    send_email(client_email, "Follow-up Required for Pre-Approval", body)
+    As with `handle_emails`, completions are recorded by the caller.
 
-    # Create a summary to log the completion of this email task
-    summary = f"Sent follow-up email to {name} for missing documents."
+    Parameters:
+        tasks (list of dict): Email tasks, each with a "content" field.
 
-    # Log the task as completed in the database with type 'email'
-    log_task_completion("email", summary)
\ No newline at end of file
+    Returns:
+        list of dict: Per-task send results (see `tools.gmail_tool.send_bulk`), in task order.
+    """
+    names = [extract_client_name(task["content"]) for task in tasks]
+
+    # One directory load serves every name in the batch
+    directory = get_client_directory()
+    results = [None] * len(tasks)
+    messages, indexes = [], []
+    for index, name in enumerate(names):
+        try:
+            client_email = directory.resolve_email(name)
+        except ClientNotFoundError as e:
+            results[index] = {'to': None, 'id': None, 'error': str(e)}
+            continue
+        messages.append((client_email, REMINDER_SUBJECT, build_reminder_body(name)))
+        indexes.append(index)
+
+    for index, result in zip(indexes, send_bulk(messages) if messages else []):
+        results[index] = result
+    return results
@@ -1,12 +1,92 @@
-# Import the local LLM runner for generating task plans
-from models.offline_model_runner import run_llm
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Import the local LLM runner (blocking and streaming) for generating task plans
+from models.offline_model_runner import run_llm, stream_llm
 
 # Import database functions for getting necessary data
 from utils.db import (
     fetch_clients_for_followup,
     fetch_missing_documents,
-    fetch_upcoming_appointments
+    fetch_upcoming_appointments,
+    make_task_id
 )
+from utils.logger import log_event
+from utils.metrics import observe, span
+
+# Ranks planner data and keeps the prompt within a token budget
+from agents.prompt_builder import build_prompt
+
+# Queries feeding the planning prompt; they are independent and run concurrently
+PLANNING_QUERIES = {
+    "followups": fetch_clients_for_followup,
+    "documents": fetch_missing_documents,
+    "appointments": fetch_upcoming_appointments,
+}
+
+# Keyword rules used to classify a plan line, checked in order.
+# A line matching none of them defaults to DEFAULT_TASK_TYPE.
+TASK_RULES = [
+    ("email", ("email",)),
+    ("calendar", ("call", "meeting")),
+    ("crm", ("update", "log")),
+]
+DEFAULT_TASK_TYPE = "email"
+
+
+def gather_planning_data():
+    """
+    Runs the planning queries concurrently, each on its own pooled connection.
+
+    Planning latency is bounded by the slowest query instead of the sum of all three.
+    Per-query timings are written to the execution log.
+
+    Returns:
+        tuple: (data, timings) where `data` maps each PLANNING_QUERIES name to its rows
+               (same shapes as the individual fetch functions) and `timings` maps
+               each name to its duration in milliseconds.
+    """
+    timings = {}
+
+    def timed(name, fetch):
+        start = time.perf_counter()
+        try:
+            return fetch()
+        finally:
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+            observe(f"planner.{name}", timings[name])
+
+    with ThreadPoolExecutor(max_workers=len(PLANNING_QUERIES),
+                            thread_name_prefix="planner-fetch") as pool:
+        # Each fetch runs in a copy of this context, so its spans count towards the current run
+        futures = {name: pool.submit(contextvars.copy_context().run, timed, name, fetch)
+                   for name, fetch in PLANNING_QUERIES.items()}
+        data = {name: future.result() for name, future in futures.items()}
+
+    for name, duration_ms in timings.items():
+        log_event(f"Planner query: {name}", duration_ms=duration_ms, rows=len(data[name]))
+    return data, timings
+
+
+def build_plan_prompt():
+    """
+    Gathers client data from the database and formats it into the planning prompt.
+
+    See `agents.prompt_builder` for the ranking and token-budget rules.
+
+    Returns:
+        str: The full LLM prompt.
+    """
+
+    # Step 1: Fetch follow-up clients, missing documents, and appointments (concurrently)
+    data, _ = gather_planning_data()
+
+    # Steps 2-3: Rank the data, group documents per client, and build the prompt
+    # within the token budget so its size stays flat as the client book grows
+    with span("planner.prompt"):
+        return build_prompt(data["followups"], data["documents"], data["appointments"])
+
 
 def generate_daily_plan():
     """
@@ -22,90 +102,122 @@ def generate_daily_plan():
         list of dict: Each dict represents a task with 'type' and 'content' keys.
     """
 
-    # Step 1: Fetch follow-up clients, missing documents, and appointments
-    followups = fetch_clients_for_followup()
-    documents = fetch_missing_documents()
-    appointments = fetch_upcoming_appointments()
+    # Steps 1-3: Build the prompt from the current database state
+    prompt = build_plan_prompt()
 
-    # Step 2: Format follow-up data as a readable list
-    followup_text = "\n".join(
-        f"{c['name']} ({c['status']}) - Last contacted: {c['last_contacted']}"
-        for c in followups
-    )
+    # Step 4: Get response from the LLM model (no newline stop: the plan has one task per line)
+    plan_text = run_llm(prompt, stop=None)
+    print("LLM Plan Response:", plan_text)  # Debug log
 
-    # Format missing documents as a list of client names and document types
-    docs_text = "\n".join(
-        f"{d['name']} is missing {d['type']}"
-        for d in documents
-    )
+    # Step 5: Parse and return structured task data
+    return parse_llm_tasks(plan_text)
 
-    # Format upcoming appointments
-    appt_text = "\n".join(
-        f"{a['name']} – {a['title']} at {a['datetime']}"
-        for a in appointments
-    )
 
-    # Step 3: Construct the full LLM prompt using the gathered data
-    prompt = f"""
-You are a digital assistant for a mortgage broker.
+def generate_daily_plan_stream():
+    """
+    Streaming version of `generate_daily_plan`.
 
-Your job is to recommend today's top 3 tasks based on:
+    The plan is requested with `stream_llm` and each task is yielded as soon as its
+    line is complete, so callers can start executing the first task while the model
+    is still generating the rest of the plan.
 
-=== Clients Needing Follow-Up ===
-{followup_text or 'None'}
+    Yields:
+        dict: Task with 'id', 'type' and 'content' keys.
+    """
+    prompt = build_plan_prompt()
+    for task in stream_llm_tasks(stream_llm(prompt, stop=None)):
+        log_event("Planned task", task_id=task["id"], task_type=task["type"])
+        yield task
 
-=== Missing Documents ===
-{docs_text or 'None'}
 
-=== Upcoming Appointments ===
-{appt_text or 'None'}
+def classify_task(line, rules=None):
+    """
+    Determines the task type of a plan line using keyword rules.
 
-Respond with exactly 3 tasks as actionable items.
-"""
+    Parameters:
+        line (str): One line of the LLM plan.
+        rules (list, optional): (task_type, keywords) pairs checked in order;
+                                defaults to TASK_RULES.
 
-    # Step 4: Get response from the LLM model
-    plan_text = run_llm(prompt)
-    print("LLM Plan Response:", plan_text)  # Debug log
+    Returns:
+        str: The matching task type, or DEFAULT_TASK_TYPE if no rule matches.
+    """
+    lowered = line.lower()
+    for task_type, keywords in rules or TASK_RULES:
+        if any(keyword in lowered for keyword in keywords):
+            return task_type
+    return DEFAULT_TASK_TYPE  # Default to email if unclear
 
-    # Step 5: Parse and return structured task data
-    return parse_llm_tasks(plan_text)
+
+def parse_task_line(line, rules=None):
+    """
+    Converts one plan line into a task dictionary.
+
+    Parameters:
+        line (str): One line of the LLM plan.
+        rules (list, optional): Classification rules (see `classify_task`).
+
+    Returns:
+        dict: Task with 'id', 'type' and 'content' keys. The ID is stable for the
+              same task on the same day (see `utils.db.make_task_id`).
+    """
+    task_type = classify_task(line, rules)
+    # Strip numbering/bullet formatting and surrounding whitespace
+    content = line.strip("-•123. ").strip()
+    return {"id": make_task_id(task_type, content), "type": task_type, "content": content}
+
+
+def iter_lines(chunks):
+    """
+    Reassembles streamed text chunks into complete lines.
+
+    Parameters:
+        chunks (iterable of str): Text pieces in arrival order (tokens or lines).
+
+    Yields:
+        str: Each line as soon as its newline arrives; the final partial line at the end.
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        *complete, buffer = buffer.split("\n")
+        yield from complete
+    if buffer:
+        yield buffer
+
+
+def stream_llm_tasks(chunks, rules=None):
+    """
+    Incrementally parses a streamed LLM plan into task dictionaries.
+
+    Uses the same classification and clean-up as `parse_llm_tasks`, but emits each
+    task as soon as its line is complete. Blank lines are skipped.
+
+    Parameters:
+        chunks (iterable of str): Streamed plan text (e.g. from `stream_llm`).
+        rules (list, optional): Classification rules (see `classify_task`).
+
+    Yields:
+        dict: Task with 'id', 'type' and 'content' keys.
+    """
+    for line in iter_lines(chunks):
+        if line.strip():
+            yield parse_task_line(line, rules)
 
 
 def parse_llm_tasks(plan_text):
     """
     Parses the LLM's response into structured task dictionaries.
 
-    Assumes each line contains a task and categorizes it based on keywords.
+    Assumes each line contains a task and categorizes it based on keywords
+    (see TASK_RULES).
 
     Parameters:
         plan_text (str): Multiline string from the LLM listing tasks.
 
     Returns:
-        list of dict: Each dict has a 'type' and 'content' field.
+        list of dict: Each dict has 'id', 'type' and 'content' fields.
     """
 
-    tasks = []
-
     # Process each line to detect task type and clean up text
-    for line in plan_text.strip().split("\n"):
-
-        # Determine task type based on keywords in the text
-        if "email" in line.lower():
-            task_type = "email"
-        elif "call" in line.lower() or "meeting" in line.lower():
-            task_type = "calendar"
-        elif "update" in line.lower() or "log" in line.lower():
-            task_type = "crm"
-        else:
-            task_type = "email"  # Default to email if unclear
-
-        # Strip numbering/bullet formatting and surrounding whitespace
-        cleaned_line = line.strip("-•123. ").strip()
-
-        # Append parsed task to the task list
-        tasks.append({
-            "type": task_type,
-            "content": cleaned_line
-        })
-
-    return tasks
\ No newline at end of file
+    return [parse_task_line(line) for line in plan_text.strip().split("\n")]
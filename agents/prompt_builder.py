@@ -0,0 +1,202 @@
+"""
+Bounded, prioritized prompt construction for the planner.
+
+With large client books, dumping every client, missing document and appointment
+into the prompt overflows the model context and slows inference. This module:
+
+1. Ranks candidates within each section:
+   - follow-ups by staleness of `last_contacted` (never contacted first),
+     ties broken by number of missing documents;
+   - missing documents grouped into one line per client, ranked by count,
+     ties broken by staleness;
+   - appointments by proximity (soonest first).
+2. Fills the prompt round-robin across the sections, highest priority first,
+   until the token budget (BROKER_PROMPT_TOKEN_BUDGET, default 1500) is spent,
+   so every section is represented however large the others are.
+3. Notes how many lower-priority items were left out.
+"""
+
+import datetime
+import os
+
+# Approximate token budget for the data sections of the planning prompt
+TOKEN_BUDGET = int(os.environ.get("BROKER_PROMPT_TOKEN_BUDGET", "1500"))
+
+PROMPT_TEMPLATE = """
+You are a digital assistant for a mortgage broker.
+
+Your job is to recommend today's top 3 tasks based on:
+
+=== Clients Needing Follow-Up ===
+{followup_text}
+
+=== Missing Documents ===
+{docs_text}
+
+=== Upcoming Appointments ===
+{appt_text}
+
+Respond with exactly 3 tasks as actionable items.
+"""
+
+
+def estimate_tokens(text):
+    """
+    Roughly estimates the token count of a piece of text (about 4 characters per token).
+
+    Args:
+        text (str): Text to measure.
+
+    Returns:
+        int: Estimated number of tokens.
+    """
+    return len(text) // 4 + 1
+
+
+def _as_datetime(value):
+    """Converts DB date/datetime values to datetime; returns None for anything else."""
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time())
+    return None
+
+
+def _staleness_days(last_contacted, now):
+    """Days since the client was last contacted; never-contacted clients rank first."""
+    contacted = _as_datetime(last_contacted)
+    if contacted is None:
+        return float("inf")
+    return (now - contacted).total_seconds() / 86400
+
+
+def group_missing_documents(documents):
+    """
+    Groups missing-document rows by client name.
+
+    Args:
+        documents (list of dict): Rows with 'name' and 'type' keys.
+
+    Returns:
+        dict: Client name -> list of missing document types (in row order).
+    """
+    grouped = {}
+    for d in documents:
+        grouped.setdefault(d['name'], []).append(d['type'])
+    return grouped
+
+
+def rank_candidates(followups, documents, appointments, now=None):
+    """
+    Turns raw planner rows into prompt lines, ranked within each section.
+
+    Args:
+        followups (list of dict): Rows from `fetch_clients_for_followup`.
+        documents (list of dict): Rows from `fetch_missing_documents`.
+        appointments (list of dict): Rows from `fetch_upcoming_appointments`.
+        now (datetime, optional): Reference time (defaults to the current time).
+
+    Returns:
+        dict: Section name ('followups', 'documents', 'appointments') -> ordered list of lines.
+    """
+    now = now or datetime.datetime.now()
+    missing = group_missing_documents(documents)
+    staleness = {c['name']: _staleness_days(c['last_contacted'], now) for c in followups}
+
+    ranked_followups = sorted(
+        followups,
+        key=lambda c: (-staleness[c['name']], -len(missing.get(c['name'], ()))),
+    )
+    ranked_docs = sorted(
+        missing.items(),
+        key=lambda item: (-len(item[1]), -staleness.get(item[0], 0)),
+    )
+    ranked_appts = sorted(
+        appointments,
+        key=lambda a: _as_datetime(a['datetime']) or datetime.datetime.max,
+    )
+
+    return {
+        "followups": [
+            f"{c['name']} ({c['status']}) - Last contacted: {c['last_contacted']}"
+            for c in ranked_followups
+        ],
+        "documents": [
+            f"{name} is missing {', '.join(types)}"
+            for name, types in ranked_docs
+        ],
+        "appointments": [
+            f"{a['name']} – {a['title']} at {a['datetime']}"
+            for a in ranked_appts
+        ],
+    }
+
+
+def select_within_budget(sections, token_budget):
+    """
+    Picks lines round-robin across sections, in rank order, until the budget is spent.
+
+    Args:
+        sections (dict): Section name -> ranked list of lines.
+        token_budget (int): Maximum estimated tokens for all selected lines.
+
+    Returns:
+        tuple: (selected, omitted) where `selected` maps section name -> chosen lines
+               and `omitted` maps section name -> number of lines left out.
+    """
+    selected = {name: [] for name in sections}
+    remaining = {name: list(lines) for name, lines in sections.items()}
+    used = 0
+
+    while any(remaining.values()):
+        progressed = False
+        for name, lines in remaining.items():
+            if not lines:
+                continue
+            cost = estimate_tokens(lines[0])
+            if used + cost > token_budget:
+                continue
+            selected[name].append(lines.pop(0))
+            used += cost
+            progressed = True
+        if not progressed:
+            break  # Nothing else fits
+
+    omitted = {name: len(lines) for name, lines in remaining.items()}
+    return selected, omitted
+
+
+def _render_section(lines, omitted):
+    """Renders one prompt section, noting any omitted lower-priority items."""
+    if not lines and not omitted:
+        return "None"
+    text = "\n".join(lines)
+    if omitted:
+        text += f"\n(+{omitted} lower-priority items omitted)"
+    return text.strip()
+
+
+def build_prompt(followups, documents, appointments, token_budget=None, now=None):
+    """
+    Builds the planning prompt from ranked, budget-limited client data.
+
+    Args:
+        followups (list of dict): Rows from `fetch_clients_for_followup`.
+        documents (list of dict): Rows from `fetch_missing_documents`.
+        appointments (list of dict): Rows from `fetch_upcoming_appointments`.
+        token_budget (int, optional): Token budget for the data sections
+                                      (defaults to TOKEN_BUDGET).
+        now (datetime, optional): Reference time for ranking.
+
+    Returns:
+        str: The full LLM prompt.
+    """
+    sections = rank_candidates(followups, documents, appointments, now)
+    budget = TOKEN_BUDGET if token_budget is None else token_budget
+    selected, omitted = select_within_budget(sections, budget)
+
+    return PROMPT_TEMPLATE.format(
+        followup_text=_render_section(selected["followups"], omitted["followups"]),
+        docs_text=_render_section(selected["documents"], omitted["documents"]),
+        appt_text=_render_section(selected["appointments"], omitted["appointments"]),
+    )
@@ -0,0 +1,287 @@
+"""
+benchmarks/run_benchmarks.py
+
+Reproducible performance benchmarks for the Broker AI agent.
+
+Every external service is replaced by a local stand-in from `fakes/`:
+- MySQL    -> a SQLite file seeded with a synthetic client book (`fakes/mysql_sqlite.py`),
+- LLM      -> an OpenAI-compatible completion server with configurable latency (`fakes/llm_server.py`),
+- Google   -> Gmail/Calendar endpoints that record sends and events (`fakes/gmail_server.py`).
+
+For each client-book size it times the agent entry points (`run_agent`,
+`generate_daily_plan`, `build_digest`, `send_daily_digest`, `send_daily_digest_bulk`) and the
+dashboard data functions, and reports throughput and p50/p95 latency per stage,
+followed by the span breakdown from `utils.metrics` (db.query, llm.stream, gmail.send, ...).
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 100,10000,100000 --iterations 5
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json --max-regression 1.25
+
+With --baseline, the run exits with status 1 if any stage's p95 is more than
+--max-regression times the baseline's p95 for the same size, so it can gate a deploy.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add the repository root to the Python path so internal modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fakes.gmail_server import FakeGmailServer
+from fakes.llm_server import FakeLLMServer
+from fakes.mysql_sqlite import client_email, client_name, connect, create_schema, seed_client_book
+
+DEFAULT_SIZES = (100, 10_000, 100_000)
+
+# Plan served by the fake LLM: one email, one calendar and one CRM task for seeded clients
+BENCHMARK_PLAN = (
+    f"1. Send an email: follow up with {client_name(0)} to request the missing payslip\n"
+    f"2. Schedule a call with {client_name(1)} to review loan options\n"
+    f"3. Update notes for {client_email(2)}: Sent pre-approval checklist\n"
+)
+
+
+def percentile(values, pct):
+    """
+    Return the nearest-rank percentile of a list of numbers.
+
+    Args:
+        values (list): Samples (need not be sorted).
+        pct (float): Percentile between 0 and 100.
+
+    Returns:
+        float: The sample at that rank (0.0 for an empty list).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))  # ceil(n * pct / 100), at least 1
+    return ordered[int(rank) - 1]
+
+
+def time_stage(func, iterations, before=None):
+    """
+    Call `func` repeatedly and summarise its latency.
+
+    Args:
+        func (callable): The operation to time (called with no arguments).
+        iterations (int): Number of timed calls.
+        before (callable, optional): Untimed setup run before every call
+                                     (e.g. clearing caches).
+
+    Returns:
+        dict: {"iterations", "p50_ms", "p95_ms", "mean_ms", "throughput_per_s"}
+    """
+    durations = []
+    for _ in range(iterations):
+        if before:
+            before()
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    total_s = sum(durations) / 1000
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(durations, 50), 2),
+        "p95_ms": round(percentile(durations, 95), 2),
+        "mean_ms": round(sum(durations) / len(durations), 2),
+        "throughput_per_s": round(iterations / total_s, 2) if total_s else None,
+    }
+
+
+def span_breakdown(snapshot):
+    """
+    Summarise the `utils.metrics` histograms collected during a size's run.
+
+    Returns:
+        dict: stage -> {"count", "mean_ms"}
+    """
+    return {
+        stage: {"count": hist["count"], "mean_ms": round(hist["sum"] / hist["count"], 2)}
+        for stage, hist in sorted(snapshot["histograms"].items()) if hist["count"]
+    }
+
+
+def benchmark_size(clients, args, workdir):
+    """
+    Seed a client book of `clients` rows and time every stage against it.
+
+    Returns:
+        dict: {"clients", "stages": {...}, "spans": {...}}
+    """
+    # App modules are imported here, after main() pointed their settings at the fakes
+    import main
+    from agents.planner_agent import generate_daily_plan
+    from models.offline_model_runner import response_cache
+    from tools.gmail_tool import build_digest, send_daily_digest, send_daily_digest_bulk
+    from utils import db, metrics, query_cache
+    from utils.db_pool import ConnectionPool, set_pool
+
+    path = os.path.join(workdir, f"broker_{clients}.db")
+    print(f"⏳ Seeding {clients} clients into {path}")
+    create_schema(path)
+    seed_client_book(path, clients=clients)
+
+    # Point every utils.db call at the seeded SQLite file
+    set_pool(ConnectionPool(pool_size=args.pool_size, connect_factory=connect, database=path))
+    db._task_log_schema_ready = False  # New database: re-run the schema checks once
+    db.ensure_task_log_schema()
+    query_cache.clear()
+    metrics.reset()
+
+    def cold():
+        """Start each timed call without cached query results or completions."""
+        query_cache.clear()
+        response_cache.clear()
+
+    recipients = [client_email(i) for i in range(min(clients, args.digest_recipients))]
+    agent_tasks = []
+    stages = {}
+
+    print("⏱️  dashboard data functions")
+    stages["dashboard.fetch_task_stats"] = time_stage(db.fetch_task_stats.uncached, args.iterations)
+    stages["dashboard.fetch_task_log_page"] = time_stage(db.fetch_task_log_page.uncached, args.iterations)
+    stages["dashboard.fetch_client_emails"] = time_stage(db.fetch_client_emails.uncached, args.iterations)
+
+    print("⏱️  generate_daily_plan")
+    stages["generate_daily_plan"] = time_stage(generate_daily_plan, args.iterations, before=cold)
+
+    print("⏱️  run_agent")
+    results = []
+    stages["run_agent"] = time_stage(lambda: results.append(main.run_agent()), args.iterations, before=cold)
+    if results:
+        agent_tasks = results[-1]
+        stages["run_agent"]["tasks_per_run"] = len(agent_tasks)
+        stages["run_agent"]["failed_per_run"] = sum(1 for t in agent_tasks if t.get("status") == "failed")
+
+    # The dashboard's history section now has rows to page through
+    stages["dashboard.fetch_task_log_page.after_runs"] = time_stage(
+        db.fetch_task_log_page.uncached, args.iterations
+    )
+
+    # Digests stream today's tasks (the agent runs above) from the database
+    print("⏱️  build_digest")
+    stages["build_digest"] = time_stage(lambda: build_digest(recipients=recipients), args.iterations)
+    print("⏱️  send_daily_digest")
+    stages["send_daily_digest"] = time_stage(lambda: send_daily_digest(recipients[0]), args.iterations)
+    print(f"⏱️  send_daily_digest_bulk ({len(recipients)} recipients)")
+    stages["send_daily_digest_bulk"] = time_stage(
+        lambda: send_daily_digest_bulk(recipients), args.iterations
+    )
+    stages["send_daily_digest_bulk"]["recipients"] = len(recipients)
+
+    return {"clients": clients, "stages": stages, "spans": span_breakdown(metrics.snapshot())}
+
+
+def print_report(report):
+    """Print one size's results as aligned tables."""
+    print(f"\n📊 {report['clients']} clients")
+    print(f"{'stage':<46}{'p50 ms':>10}{'p95 ms':>10}{'ops/s':>10}")
+    for stage, result in report["stages"].items():
+        print(f"{stage:<46}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+              f"{result['throughput_per_s'] or 0:>10.2f}")
+    print(f"\n{'span':<46}{'count':>10}{'mean ms':>10}")
+    for stage, result in report["spans"].items():
+        print(f"{stage:<46}{result['count']:>10}{result['mean_ms']:>10.1f}")
+
+
+def find_regressions(reports, baseline, max_ratio):
+    """
+    Compare p95 latencies with a baseline results file.
+
+    Args:
+        reports (list): Reports from this run.
+        baseline (dict): Parsed JSON written by an earlier `--output`.
+        max_ratio (float): Largest acceptable current/baseline p95 ratio.
+
+    Returns:
+        list of str: One message per regressed stage.
+    """
+    previous = {r["clients"]: r["stages"] for r in baseline.get("reports", [])}
+    regressions = []
+    for report in reports:
+        for stage, result in report["stages"].items():
+            before = previous.get(report["clients"], {}).get(stage)
+            if before and before["p95_ms"] and result["p95_ms"] > before["p95_ms"] * max_ratio:
+                regressions.append(
+                    f"{report['clients']} clients / {stage}: p95 {result['p95_ms']:.1f} ms "
+                    f"vs baseline {before['p95_ms']:.1f} ms"
+                )
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Broker AI agent against local fakes.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated client-book sizes (default: %(default)s)")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed calls per stage")
+    parser.add_argument("--llm-latency", type=float, default=0.2,
+                        help="Fake LLM seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.005,
+                        help="Fake LLM seconds between tokens")
+    parser.add_argument("--google-latency", type=float, default=0.02,
+                        help="Fake Google API seconds per HTTP request")
+    parser.add_argument("--google-rate", type=float, default=0,
+                        help="Google API rate limit per second, API-wide and per user (0 = unlimited)")
+    parser.add_argument("--digest-recipients", type=int, default=100,
+                        help="Recipients for send_daily_digest_bulk")
+    parser.add_argument("--pool-size", type=int, default=5, help="DB connection pool size")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=1.25,
+                        help="Fail if a p95 exceeds this multiple of the baseline (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    with tempfile.TemporaryDirectory(prefix="broker-bench-") as workdir, \
+            FakeLLMServer(latency=args.llm_latency, token_delay=args.token_delay,
+                          plan_text=BENCHMARK_PLAN) as llm_server, \
+            FakeGmailServer(latency=args.google_latency) as google_server:
+
+        # Settings are read at import time, so set them before importing the app
+        os.environ["BROKER_LLM_ENDPOINT"] = llm_server.url
+        os.environ["BROKER_GOOGLE_API_ENDPOINT"] = google_server.url
+        for api in ("GMAIL", "CALENDAR"):
+            os.environ[f"BROKER_GOOGLE_RATE_{api}"] = str(args.google_rate)
+            os.environ[f"BROKER_GOOGLE_USER_RATE_{api}"] = str(args.google_rate)
+        os.environ["BROKER_LOG_PATH"] = os.path.join(workdir, "execution.log")
+        os.environ["BROKER_METRICS_PATH"] = os.path.join(workdir, "metrics.json")
+        os.environ["BROKER_LLM_CACHE_DIR"] = ""  # Never reuse on-disk completions
+
+        reports = []
+        for clients in sizes:
+            report = benchmark_size(clients, args, workdir)
+            print_report(report)
+            reports.append(report)
+
+        print(f"\n📬 Fake Google API: {len(google_server.sent)} emails, {len(google_server.events)} events, "
+              f"{google_server.http_requests} HTTP requests; fake LLM: {len(llm_server.requests)} requests")
+
+    results = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args), "reports": reports}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(reports, json.load(f), args.max_regression)
+        for message in regressions:
+            print(f"❌ Regression: {message}")
+        if regressions:
+            return 1
+        print("✅ No p95 regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
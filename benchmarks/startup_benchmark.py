@@ -0,0 +1,235 @@
+"""
+Startup-time benchmark for the dashboard and the CLI entry points.
+
+Each target is imported in a fresh interpreter under `python -X importtime`, and
+the report shows:
+
+- the import time of the target's app modules (p50/p95 over --iterations runs),
+- the modules with the highest self time, and
+- any heavy client library (Google API clients, MySQL driver, requests, ...)
+  that was imported at startup instead of on first use.
+
+Targets:
+    dashboard   the app modules `ui/dashboard.py` imports (read from its source;
+                Streamlit itself is not measured)
+    main        `python main.py`
+    job_worker  `python job_worker.py`
+
+Usage:
+    python benchmarks/startup_benchmark.py --iterations 5
+    python benchmarks/startup_benchmark.py --output startup.json
+    python benchmarks/startup_benchmark.py --baseline startup.json --max-regression 1.25
+
+The run exits with status 1 if a heavy library is imported at startup, or (with
+--baseline) if a target's p95 is more than --max-regression times the baseline's,
+so it can run as a check next to `run_benchmarks.py`.
+"""
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Add the repository root to the Python path so internal modules can be imported
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from benchmarks.run_benchmarks import percentile
+
+# Top-level packages of the app; other imports of the dashboard are third-party/stdlib
+APP_PACKAGES = {"agents", "models", "tools", "utils", "main"}
+
+# Libraries that must only be imported when first used
+HEAVY_MODULES = (
+    "googleapiclient",
+    "google_auth_oauthlib",
+    "google.auth",
+    "mysql.connector",
+    "requests",
+    "streamlit",
+)
+
+
+def dashboard_modules(path=os.path.join(ROOT, "ui", "dashboard.py")):
+    """
+    List the app modules imported by the dashboard script.
+
+    Returns:
+        list of str: Module names, in import order.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            # `from utils import job_queue` imports the submodule utils.job_queue
+            package = os.path.join(ROOT, *node.module.split("."))
+            names = [f"{node.module}.{alias.name}" for alias in node.names
+                     if os.path.exists(os.path.join(package, alias.name + ".py"))] or [node.module]
+        else:
+            continue
+        modules.extend(n for n in names if n.split(".")[0] in APP_PACKAGES and n not in modules)
+    return modules
+
+
+def targets():
+    """Return target name -> modules to import."""
+    return {
+        "dashboard": dashboard_modules(),
+        "main": ["main"],
+        "job_worker": ["job_worker"],
+    }
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+        list of tuple: (module, self_us, cumulative_us, depth) per imported module.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure(modules):
+    """
+    Import `modules` in a fresh interpreter.
+
+    Returns:
+        tuple: (milliseconds spent importing `modules`, parsed importtime rows)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    rows = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        message = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+        raise RuntimeError(f"import {', '.join(modules)} failed: {message}")
+
+    # Top-level entries of the requested modules cover everything they import
+    # (the interpreter's own startup imports are top-level entries too, and are skipped)
+    total_us = sum(cumulative for name, _, cumulative, depth in rows if depth == 0 and name in modules)
+    return total_us / 1000, rows
+
+
+def benchmark_target(name, modules, iterations, top):
+    """
+    Measure one target over several cold starts.
+
+    Returns:
+        dict: {"modules", "p50_ms", "p95_ms", "heaviest", "heavy_imports"}
+    """
+    durations, rows = [], []
+    for _ in range(iterations):
+        duration, rows = measure(modules)
+        durations.append(duration)
+
+    heaviest = sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+    imported = {row[0] for row in rows}
+    heavy = sorted(m for m in imported if any(m == h or m.startswith(h + ".") for h in HEAVY_MODULES))
+    return {
+        "modules": modules,
+        "p50_ms": round(percentile(durations, 50), 2),
+        "p95_ms": round(percentile(durations, 95), 2),
+        "heaviest": [{"module": m, "self_ms": round(s / 1000, 2)} for m, s, _, _ in heaviest],
+        "heavy_imports": heavy,
+    }
+
+
+def print_report(results):
+    """Print each target's timing and its heaviest modules."""
+    print(f"{'target':<14}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<14}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}")
+    for name, result in results.items():
+        print(f"\n🐢 Slowest imports for {name} (self time)")
+        for entry in result["heaviest"]:
+            print(f"  {entry['module']:<50}{entry['self_ms']:>8.1f} ms")
+
+
+def find_problems(results, baseline, max_ratio):
+    """
+    Collect heavy startup imports and p95 regressions against a baseline.
+
+    Args:
+        results (dict): Results of this run.
+        baseline (dict or None): Parsed JSON written by an earlier `--output`.
+        max_ratio (float): Largest acceptable current/baseline p95 ratio.
+
+    Returns:
+        list of str: One message per problem.
+    """
+    problems = []
+    previous = (baseline or {}).get("targets", {})
+    for name, result in results.items():
+        if result["heavy_imports"]:
+            problems.append(f"{name} imports {', '.join(result['heavy_imports'])} at startup")
+        before = previous.get(name)
+        if before and before["p95_ms"] and result["p95_ms"] > before["p95_ms"] * max_ratio:
+            problems.append(f"{name}: p95 {result['p95_ms']:.1f} ms vs baseline {before['p95_ms']:.1f} ms")
+    return problems
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the Broker AI entry points.")
+    parser.add_argument("--targets", default=",".join(targets()),
+                        help="Comma-separated targets (default: %(default)s)")
+    parser.add_argument("--iterations", type=int, default=5, help="Cold starts per target")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules listed per target")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=1.25,
+                        help="Fail if a p95 exceeds this multiple of the baseline (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    available = targets()
+    selected = [name.strip() for name in args.targets.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        print(f"❌ Unknown target(s): {', '.join(unknown)} (choose from {', '.join(available)})")
+        return 2
+
+    results = {}
+    for name in selected:
+        print(f"⏱️  {name}: import {', '.join(available[name])}")
+        results[name] = benchmark_target(name, available[name], args.iterations, args.top)
+    print()
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args),
+                       "targets": results}, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    problems = find_problems(results, baseline, args.max_regression)
+    for message in problems:
+        print(f"❌ {message}")
+    if problems:
+        return 1
+    print("\n✅ No heavy imports at startup" + (" and no regressions against the baseline" if baseline else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+broker_scheduler.py
+
+Runs the morning agent batch for many brokers at once.
+
+Every broker has its own database, Google tokens and (optionally) LLM endpoint,
+listed in a JSON file:
+
+    [
+        {"name": "acme", "db_name": "broker_acme",
+         "gmail_token": "tokens/acme_gmail.pickle",
+         "calendar_token": "tokens/acme_calendar.pickle",
+         "llm_endpoint": "http://10.0.0.5:1234/v1/completions"},
+        {"name": "zenith", "db_name": "broker_zenith", "db_host": "db2.internal",
+         "env": {"BROKER_AGENT_WORKERS": "4"}}
+    ]
+
+Each broker's `run_agent` runs in a fresh process (spawned, one broker per process),
+configured through the same BROKER_* environment variables a single-broker run reads,
+so connection pools, OAuth credentials, caches, logs and metrics never leak between
+brokers. Logs and metrics go to `logs/<name>/`.
+
+All brokers share the Google Cloud project's quota, so:
+- start times are staggered by `--stagger` seconds, and
+- each process gets an equal share of the project-wide Gmail/Calendar rates
+  (BROKER_GOOGLE_RATE_<API>), unless a broker's "env" sets them explicitly.
+
+Usage:
+    python broker_scheduler.py brokers.json --processes 4 --stagger 5 --output results.json
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+# ✅ Add the parent directory to the Python path so internal modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# App modules are imported inside each broker's process, after its environment is set,
+# because they read their settings (DB, tokens, LLM endpoint) at import time.
+
+# Broker config keys -> environment variables read by the app
+CONFIG_ENV = {
+    "db_host": "BROKER_DB_HOST",
+    "db_port": "BROKER_DB_PORT",
+    "db_user": "BROKER_DB_USER",
+    "db_password": "BROKER_DB_PASSWORD",
+    "db_name": "BROKER_DB_NAME",
+    "gmail_token": "BROKER_GMAIL_TOKEN",
+    "calendar_token": "BROKER_CALENDAR_TOKEN",
+    "llm_endpoint": "BROKER_LLM_ENDPOINT",
+}
+
+# Project-wide Google API rates (requests per second) shared by all broker processes
+SHARED_GOOGLE_RATES = {"gmail": 10.0, "calendar": 10.0}
+
+# Seconds between the starts of consecutive brokers
+DEFAULT_STAGGER_SECONDS = float(os.environ.get("BROKER_SCHEDULER_STAGGER", "5"))
+
+
+def load_brokers(path):
+    """
+    Read and validate the broker list.
+
+    Args:
+        path (str): JSON file with a list of broker configurations.
+
+    Returns:
+        list of dict: The broker configurations.
+
+    Raises:
+        ValueError: If a broker has no name, names repeat, or a key is unknown.
+    """
+    with open(path, encoding="utf-8") as f:
+        brokers = json.load(f)
+
+    names = set()
+    for broker in brokers:
+        name = broker.get("name")
+        if not name:
+            raise ValueError(f"Broker without a name: {broker}")
+        if name in names:
+            raise ValueError(f"Duplicate broker name: {name}")
+        names.add(name)
+        unknown = set(broker) - set(CONFIG_ENV) - {"name", "env"}
+        if unknown:
+            raise ValueError(f"Unknown settings for broker {name}: {', '.join(sorted(unknown))}")
+    return brokers
+
+
+def broker_env(broker, processes):
+    """
+    Build the environment variables one broker's run needs.
+
+    Args:
+        broker (dict): Broker configuration.
+        processes (int): Brokers running at the same time (splits the shared quota).
+
+    Returns:
+        dict: Variable name -> value, applied on top of the scheduler's environment.
+    """
+    log_dir = os.path.join("logs", broker["name"])
+    env = {
+        "BROKER_LOG_PATH": os.path.join(log_dir, "execution.log"),
+        "BROKER_METRICS_PATH": os.path.join(log_dir, "metrics.json"),
+    }
+    for api, rate in SHARED_GOOGLE_RATES.items():
+        name = f"BROKER_GOOGLE_RATE_{api.upper()}"
+        env[name] = str(float(os.environ.get(name, rate)) / processes)
+    env.update({var: str(broker[key]) for key, var in CONFIG_ENV.items() if broker.get(key) is not None})
+    env.update({key: str(value) for key, value in broker.get("env", {}).items()})
+    return env
+
+
+def run_broker(name, env, delay=0.0):
+    """
+    Run the agent for one broker. Executed in the broker's own process.
+
+    Args:
+        name (str): Broker name.
+        env (dict): Environment variables from `broker_env`.
+        delay (float): Seconds to wait before starting (staggering).
+
+    Returns:
+        dict: 'name', 'status' ('succeeded'/'failed'), 'tasks', 'failed_tasks',
+              'duration_ms' and 'error'.
+    """
+    time.sleep(delay)
+    os.environ.update(env)
+    start = time.perf_counter()
+    result = {"name": name, "status": "succeeded", "tasks": 0, "failed_tasks": 0, "error": None}
+    try:
+        from main import run_agent
+        tasks = run_agent()
+        result["tasks"] = len(tasks)
+        result["failed_tasks"] = sum(1 for t in tasks if t.get("status") == "failed")
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {e}",
+                      traceback=traceback.format_exc())
+    finally:
+        # Pool processes exit without running atexit hooks: write queued log events now
+        if "utils.logger" in sys.modules:
+            sys.modules["utils.logger"].flush_logs()
+    result["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def run_brokers(brokers, processes=None, stagger_seconds=DEFAULT_STAGGER_SECONDS, on_result=None):
+    """
+    Run `run_agent` for every broker across a process pool.
+
+    The first `processes` brokers start `stagger_seconds` apart; later brokers
+    start as earlier runs finish, which spreads them out as well.
+
+    Args:
+        brokers (list of dict): Broker configurations (see `load_brokers`).
+        processes (int, optional): Brokers run at once; defaults to the CPU count.
+        stagger_seconds (float): Delay between the starts of the first wave.
+        on_result (callable, optional): Called with each broker's result as it finishes.
+
+    Returns:
+        dict: 'brokers' (results in input order), 'succeeded', 'failed',
+              'tasks' and 'duration_ms' of the whole batch.
+    """
+    processes = max(1, min(processes or os.cpu_count() or 1, len(brokers) or 1))
+    start = time.perf_counter()
+    results = [None] * len(brokers)
+
+    # spawn + one broker per process: every broker starts from a clean interpreter
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        max_tasks_per_child=1,
+    ) as pool:
+        futures = {
+            pool.submit(
+                run_broker, broker["name"], broker_env(broker, processes),
+                stagger_seconds * index if index < processes else 0.0,
+            ): index
+            for index, broker in enumerate(brokers)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            index = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # The process itself died (e.g. out of memory)
+                result = {"name": brokers[index]["name"], "status": "failed", "tasks": 0,
+                          "failed_tasks": 0, "duration_ms": None, "error": f"{type(e).__name__}: {e}"}
+            results[index] = result
+            if on_result is not None:
+                on_result(result)
+
+    return {
+        "brokers": results,
+        "succeeded": sum(1 for r in results if r["status"] == "succeeded"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "tasks": sum(r["tasks"] for r in results),
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def print_result(result):
+    """Print one broker's outcome."""
+    if result["status"] == "succeeded":
+        print(f"✅ {result['name']}: {result['tasks']} tasks "
+              f"({result['failed_tasks']} failed) in {result['duration_ms']} ms")
+    else:
+        print(f"❌ {result['name']}: {result['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Broker AI agent for many brokers in parallel.")
+    parser.add_argument("config", help="JSON file with the broker configurations")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="Brokers run at the same time (default: CPU count)")
+    parser.add_argument("--stagger", type=float, default=DEFAULT_STAGGER_SECONDS,
+                        help="Seconds between broker start times")
+    parser.add_argument("--output", help="Write the aggregated results to this JSON file")
+    args = parser.parse_args()
+
+    brokers = load_brokers(args.config)
+    print(f"🚀 Running {len(brokers)} brokers")
+    summary = run_brokers(brokers, processes=args.processes, stagger_seconds=args.stagger,
+                          on_result=print_result)
+    print(f"🏁 {summary['succeeded']} succeeded, {summary['failed']} failed, "
+          f"{summary['tasks']} tasks in {summary['duration_ms'] / 1000:.1f} s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+fakes/gmail_server.py
+
+A local stand-in for the Gmail (and Calendar) API used by tests and benchmarks.
+
+It implements just enough of the APIs for `tools.gmail_tool` and `tools.calendar_tool`:
+- POST /gmail/v1/users/me/messages/send     (single send)
+- POST /batch/gmail/v1                      (multipart/mixed batch of sends)
+- POST [/calendar/v3]/calendars/primary/events (event insert; the prefix is dropped
+  when the client's base URL is overridden)
+- POST [/calendar/v3]/freeBusy                (free/busy query, answered from `busy`)
+- POST /batch/calendar/v3                     (multipart/mixed batch of inserts)
+
+Point the tools at it with the BROKER_GOOGLE_API_ENDPOINT environment variable:
+
+    with FakeGmailServer(latency=0.05, fail_once={"flaky@example.com"}) as server:
+        os.environ["BROKER_GOOGLE_API_ENDPOINT"] = server.url
+        send_bulk([...])
+        print(server.sent)
+
+Failure injection:
+- Recipients in `fail_once` get a 429 on their first attempt, then succeed.
+- Recipients containing "invalid" always get a 400.
+"""
+
+import base64
+import itertools
+import json
+import threading
+import time
+from email import message_from_bytes
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGmailServer:
+    """
+    Threaded HTTP server that records sent messages.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind (0 picks a free port).
+        latency (float): Seconds to sleep per HTTP request, to mimic network cost.
+        fail_once (set, optional): Recipients that are rate-limited (429) once.
+        busy (list, optional): (start, end) RFC 3339 strings returned by free/busy queries.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_once=None, busy=None):
+        self.latency = latency
+        self.fail_once = set(fail_once or ())
+        self.sent = []            # Recipients of successfully "sent" messages
+        self.events = []          # Bodies of inserted calendar events
+        self.busy = list(busy or ())
+        self.http_requests = 0    # Number of HTTP requests received (batch counts as one)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        """Root URL to use as BROKER_GOOGLE_API_ENDPOINT."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        """Start serving on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and wait for the thread to exit."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _send_one(self, body):
+        """
+        Handle one messages.send call.
+
+        Returns:
+            tuple: (HTTP status, JSON-serialisable response body)
+        """
+        raw = json.loads(body or b"{}").get("raw", "")
+        message = message_from_bytes(base64.urlsafe_b64decode(raw.encode()))
+        to = message.get("to", "")
+
+        with self._lock:
+            if "invalid" in to:
+                return 400, {"error": {"code": 400, "message": f"Invalid To header: {to}"}}
+            if to in self.fail_once:
+                self.fail_once.discard(to)
+                return 429, {"error": {"code": 429, "message": "Rate limit exceeded"}}
+            self.sent.append(to)
+            message_id = f"fake-{next(self._ids)}"
+        return 200, {"id": message_id, "labelIds": ["SENT"]}
+
+    def _insert_event(self, body):
+        """
+        Handle one events.insert call.
+
+        Returns:
+            tuple: (HTTP status, JSON-serialisable response body)
+        """
+        event = json.loads(body or b"{}")
+        with self._lock:
+            event_id = f"fake-event-{next(self._ids)}"
+            self.events.append(event)
+        return 200, dict(event, id=event_id, htmlLink=f"{self.url}calendar/event?eid={event_id}")
+
+    def _route(self, path, body):
+        """
+        Dispatch one API call by path.
+
+        Returns:
+            tuple: (HTTP status, JSON-serialisable response body)
+        """
+        if path == "/gmail/v1/users/me/messages/send":
+            return self._send_one(body)
+        if path.endswith("/calendars/primary/events"):
+            return self._insert_event(body)
+        if path.endswith("/freeBusy"):
+            busy = [{"start": start, "end": end} for start, end in self.busy]
+            return 200, {"kind": "calendar#freeBusy", "calendars": {"primary": {"busy": busy}}}
+        return 404, {"error": {"code": 404, "message": f"Unknown path {path}"}}
+
+    def _handle_batch(self, content_type, body):
+        """
+        Split a multipart/mixed batch into sub-requests and build the multipart response.
+
+        Returns:
+            tuple: (response content type, response body bytes)
+        """
+        envelope = BytesParser().parsebytes(
+            b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+        )
+        boundary = "batch_fake_boundary"
+        parts = []
+        for part in envelope.get_payload():
+            content_id = part.get("Content-ID", "").strip("<>")
+            inner = part.get_payload(decode=False)
+            if isinstance(inner, list):  # Some parsers treat application/http as a message
+                inner = inner[0].as_string()
+            head, _, inner_body = inner.replace("\r\n", "\n").partition("\n\n")
+            # Request line of the sub-request, e.g. "POST /gmail/v1/users/me/messages/send?alt=json HTTP/1.1"
+            inner_path = head.strip().split("\n", 1)[0].split(" ")[1].split("?", 1)[0]
+            status, payload = self._route(inner_path, inner_body.strip().encode())
+            reason = "OK" if status == 200 else "Error"
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {reason}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n")
+        return f"multipart/mixed; boundary={boundary}", "".join(parts).encode()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                with server._lock:
+                    server.http_requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                path = self.path.split("?", 1)[0]
+
+                if path.startswith("/batch/"):
+                    content_type, payload = server._handle_batch(self.headers["Content-Type"], body)
+                    status = 200
+                else:
+                    status, data = server._route(path, body)
+                    content_type, payload = "application/json", json.dumps(data).encode()
+
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass  # Keep test output quiet
+
+        return Handler
@@ -0,0 +1,146 @@
+"""
+fakes/llm_server.py
+
+A local stand-in for the OpenAI-compatible completion server used by tests and benchmarks.
+
+It implements POST /v1/completions in both modes `models.offline_model_runner` uses:
+- a single JSON response ({"choices": [{"text": ...}]}),
+- server-sent events when the request has "stream": true
+  (one `data: {...}` line per token, then `data: [DONE]`).
+
+Point the runner at it with the BROKER_LLM_ENDPOINT environment variable
+(read when `models.offline_model_runner` is imported):
+
+    with FakeLLMServer(latency=0.2, token_delay=0.01) as server:
+        os.environ["BROKER_LLM_ENDPOINT"] = server.url
+        ...
+
+The completion is `plan_text` (a canned three-task plan by default), cut at the
+first stop sequence and at `max_tokens` whitespace-separated tokens, like a real model.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Three tasks, one per task type, in the format the planner parses
+DEFAULT_PLAN = (
+    "1. Email John Smith a reminder about his missing payslips\n"
+    "2. Schedule a call with Priya Patel to review her loan options\n"
+    "3. Update notes for alex@example.com: Sent pre-approval checklist\n"
+)
+
+
+class FakeLLMServer:
+    """
+    Threaded HTTP server that answers completion requests with a canned plan.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind (0 picks a free port).
+        latency (float): Seconds before the first byte of a response (prompt processing).
+        token_delay (float): Seconds between tokens (generation speed).
+        plan_text (str, optional): Completion returned for every prompt.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, token_delay=0.0, plan_text=None):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.plan_text = plan_text or DEFAULT_PLAN
+        self.requests = []   # Request bodies received, in order
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self):
+        """Completions URL to use as BROKER_LLM_ENDPOINT."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/completions"
+
+    def start(self):
+        """Start serving on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the server and wait for the thread to exit."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def completion_tokens(self, body):
+        """
+        Build the tokens of the completion for one request.
+
+        Returns:
+            list of str: Tokens whose concatenation is the completion text.
+        """
+        text = self.plan_text
+        # Cut at the earliest stop sequence, as OpenAI-compatible servers do
+        for stop in body.get("stop") or ():
+            if stop and stop in text:
+                text = text[:text.index(stop)]
+        tokens = re.findall(r"\s*\S+|\s+", text)
+        return tokens[:int(body.get("max_tokens", 512))]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like real servers
+
+            def _send(self, status, content_type, payload):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.split("?", 1)[0] != "/v1/completions":
+                    return self._send(404, "application/json", b"{}")
+                with server._lock:
+                    server.requests.append(body)
+
+                if server.latency:
+                    time.sleep(server.latency)
+                tokens = server.completion_tokens(body)
+
+                if not body.get("stream"):
+                    if server.token_delay:
+                        time.sleep(server.token_delay * len(tokens))
+                    payload = json.dumps({"choices": [{"text": "".join(tokens), "index": 0}]})
+                    return self._send(200, "application/json", payload.encode())
+
+                # Stream one SSE event per token; chunked encoding keeps the connection reusable
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                events = [json.dumps({"choices": [{"text": token, "index": 0}]}) for token in tokens]
+                for data in events + ["[DONE]"]:
+                    if server.token_delay and data != "[DONE]":
+                        time.sleep(server.token_delay)
+                    chunk = f"data: {data}\n\n".encode()
+                    self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, format, *args):
+                pass  # Keep test output quiet
+
+        return Handler
@@ -0,0 +1,277 @@
+"""
+fakes/mysql_sqlite.py
+
+A SQLite-backed stand-in for `mysql.connector`, used by benchmarks and tests.
+
+It exposes just the connection/cursor surface `utils.db` relies on
+(`cursor(dictionary=True)`, `execute`, `executemany`, `fetchall`, `fetchmany`, `with_rows`,
+`rowcount`, `commit`, `rollback`, `is_connected`, `close`) and rewrites the
+MySQL dialect used in this repo into SQLite:
+
+- `%s` placeholders                      -> `?`
+- `NOW()`, `NOW() - INTERVAL n SECOND`   -> `datetime('now', 'localtime', ...)`
+- `CURDATE()`                            -> `date('now', 'localtime')`
+- `ON DUPLICATE KEY UPDATE ...`          -> `ON CONFLICT DO NOTHING`
+- `INT AUTO_INCREMENT PRIMARY KEY`       -> `INTEGER PRIMARY KEY AUTOINCREMENT`
+- inline `[UNIQUE] INDEX name (cols)` in CREATE TABLE -> separate CREATE INDEX
+- `information_schema.columns/statistics` lookups -> PRAGMA queries
+
+Usage:
+    from fakes.mysql_sqlite import create_schema, connect, seed_client_book
+    create_schema("/tmp/broker.db")
+    seed_client_book("/tmp/broker.db", clients=10_000)
+    pool = ConnectionPool(connect_factory=connect, database="/tmp/broker.db")
+"""
+
+import datetime
+import random
+import re
+import sqlite3
+
+# Store and read DATETIME/TIMESTAMP columns as Python datetimes, like mysql.connector
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" ", "seconds"))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("DATETIME", lambda raw: datetime.datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("DATE", lambda raw: datetime.date.fromisoformat(raw.decode()[:10]))
+
+# Tables used by the agent, in SQLite syntax
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT,
+    status TEXT,
+    last_contacted DATETIME,
+    notes TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    received BOOLEAN NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS appointments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    datetime DATETIME NOT NULL
+);
+CREATE TABLE IF NOT EXISTS completed_tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    content TEXT,
+    notes TEXT,
+    status TEXT,
+    completed_at DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+"""
+
+# Building blocks for synthetic client books
+FIRST_NAMES = ["Ava", "Liam", "Priya", "Noah", "Mia", "Oliver", "Zara", "Ethan", "Chloe", "Lucas"]
+LAST_NAMES = ["Smith", "Johnson", "Patel", "Nguyen", "Brown", "Garcia", "Wilson", "Chen", "Kelly", "Singh"]
+STATUSES = ["New", "In Progress", "Awaiting Documents", "Pre-Approved", "Closed", "Completed"]
+DOCUMENT_TYPES = ["ID proof", "Bank statement", "Payslip", "Tax return", "Contract of sale"]
+
+_REWRITES = [
+    (re.compile(r"NOW\(\)\s*([+-])\s*INTERVAL\s+(\d+|%s)\s+(DAY|HOUR|MINUTE|SECOND)", re.I),
+     lambda m: f"datetime('now', 'localtime', '{m.group(1)}' || {m.group(2)} || ' {m.group(3).lower()}s')"),
+    (re.compile(r"NOW\(\)", re.I), lambda m: "datetime('now', 'localtime')"),
+    (re.compile(r"CURDATE\(\)", re.I), lambda m: "date('now', 'localtime')"),
+    (re.compile(r"ON DUPLICATE KEY UPDATE[^;]*", re.I), lambda m: "ON CONFLICT DO NOTHING"),
+    (re.compile(r"INSERT IGNORE", re.I), lambda m: "INSERT OR IGNORE"),
+    (re.compile(r"\s+FOR UPDATE\b", re.I), lambda m: ""),  # SQLite locks the whole database on write
+    (re.compile(r"INT AUTO_INCREMENT PRIMARY KEY", re.I), lambda m: "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bFALSE\b"), lambda m: "0"),
+    (re.compile(r"\bTRUE\b"), lambda m: "1"),
+    (re.compile(r"%s"), lambda m: "?"),
+]
+
+_INLINE_INDEX = re.compile(r",\s*(UNIQUE\s+)?INDEX\s+(\w+)\s*\(([^)]*)\)", re.I)
+_CREATE_TABLE = re.compile(r"CREATE TABLE(?: IF NOT EXISTS)?\s+(\w+)", re.I)
+_TABLE_NAME = re.compile(r"table_name\s*=\s*'(\w+)'", re.I)
+_COLUMN_NAME = re.compile(r"column_name\s*=\s*'(\w+)'", re.I)
+
+
+def translate(query):
+    """
+    Rewrite one MySQL statement into SQLite statements.
+
+    Returns:
+        list of str: Statements to run in order (the last one produces the result).
+    """
+    extra = []
+    table = _CREATE_TABLE.search(query)
+    if table:
+        # SQLite has no inline INDEX clause; create those indexes afterwards
+        for unique, name, columns in _INLINE_INDEX.findall(query):
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            extra.append(f"CREATE {kind} IF NOT EXISTS {name} ON {table.group(1)} ({columns})")
+        query = _INLINE_INDEX.sub("", query)
+    for pattern, replacement in _REWRITES:
+        query = pattern.sub(replacement, query)
+    return [query] + extra
+
+
+class Cursor:
+    """Cursor mimicking the parts of `mysql.connector` cursors used by `utils.db`."""
+
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._dictionary = dictionary
+        self._rows = []
+        self.description = None
+        self.rowcount = -1
+
+    @property
+    def with_rows(self):
+        return self.description is not None
+
+    def _set_result(self, rows, columns):
+        self.description = [(c,) for c in columns] if columns is not None else None
+        if self._dictionary and columns is not None:
+            rows = [dict(zip(columns, row)) for row in rows]
+        self._rows = list(rows)
+
+    def _information_schema(self, query):
+        """Answer the information_schema lookups `utils.db` makes via PRAGMAs."""
+        table = _TABLE_NAME.search(query).group(1)
+        db = self._conn._db
+        if "information_schema.columns" in query:
+            column = _COLUMN_NAME.search(query).group(1)
+            names = [r[1] for r in db.execute(f"PRAGMA table_info({table})")]
+            self._set_result([(1,)] if column in names else [], ["1"])
+        else:
+            names = [r[1] for r in db.execute(f"PRAGMA index_list({table})")]
+            self._set_result([(n,) for n in names], ["index_name"])
+        self.rowcount = len(self._rows)
+
+    def execute(self, query, params=()):
+        if "information_schema" in query:
+            return self._information_schema(query)
+        statements = translate(query)
+        cursor = self._conn._db.execute(statements[0], tuple(params or ()))
+        for statement in statements[1:]:
+            self._conn._db.execute(statement)
+        columns = [d[0] for d in cursor.description] if cursor.description else None
+        self._set_result(cursor.fetchall() if columns else [], columns)
+        self.rowcount = cursor.rowcount if columns is None else len(self._rows)
+
+    def executemany(self, query, seq_params):
+        statement = translate(query)[0]
+        cursor = self._conn._db.executemany(statement, [tuple(p) for p in seq_params])
+        self._set_result([], None)
+        self.rowcount = cursor.rowcount
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        self._rows = []
+
+
+class Connection:
+    """Connection mimicking `mysql.connector` connections."""
+
+    def __init__(self, path):
+        self._db = sqlite3.connect(
+            path, detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,  # The pool hands connections between threads
+            timeout=30,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._open = True
+
+    def cursor(self, dictionary=False, **kwargs):
+        return Cursor(self, dictionary=dictionary)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def is_connected(self):
+        return self._open
+
+    def close(self):
+        self._open = False
+        self._db.close()
+
+
+def connect(database, **ignored):
+    """
+    Open a connection to the SQLite file named by `database`.
+
+    Other MySQL settings (host, user, password, port) are accepted and ignored.
+    """
+    return Connection(database)
+
+
+def create_schema(path):
+    """Create the agent's tables in the SQLite file at `path`."""
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    db.commit()
+    db.close()
+
+
+def client_name(index):
+    """Return the synthetic name of client number `index` (letters only, so name lookups parse it)."""
+    first = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    return f"{first} {last}"
+
+
+def client_email(index):
+    """Return the synthetic email address of client number `index`."""
+    return f"client{index}@example.com"
+
+
+def seed_client_book(path, clients=100, seed=42):
+    """
+    Fill the SQLite file at `path` with a synthetic client book.
+
+    Every client gets a status and a last-contacted date; about half have missing
+    documents and about one in five has an appointment in the next week.
+
+    Args:
+        path (str): SQLite file created with `create_schema`.
+        clients (int): Number of clients (e.g. 100, 10_000, 100_000).
+        seed (int): Random seed, so runs with the same size are comparable.
+    """
+    rng = random.Random(seed)
+    now = datetime.datetime.now().replace(microsecond=0)
+    db = sqlite3.connect(path)
+    db.executemany(
+        "INSERT INTO clients (id, name, email, status, last_contacted) VALUES (?, ?, ?, ?, ?)",
+        (
+            (i + 1, client_name(i), client_email(i), rng.choice(STATUSES),
+             None if rng.random() < 0.05 else now - datetime.timedelta(days=rng.randint(0, 90)))
+            for i in range(clients)
+        ),
+    )
+    db.executemany(
+        "INSERT INTO documents (client_id, type, received) VALUES (?, ?, ?)",
+        (
+            (i + 1, doc_type, 0)
+            for i in range(clients) if rng.random() < 0.5
+            for doc_type in rng.sample(DOCUMENT_TYPES, rng.randint(1, 3))
+        ),
+    )
+    db.executemany(
+        "INSERT INTO appointments (client_id, title, datetime) VALUES (?, ?, ?)",
+        (
+            (i + 1, "Loan review", now + datetime.timedelta(hours=rng.randint(1, 24 * 7)))
+            for i in range(clients) if rng.random() < 0.2
+        ),
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS idx_clients_email ON clients (email)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_clients_name ON clients (name)")
+    db.commit()
+    db.close()
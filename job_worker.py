@@ -0,0 +1,133 @@
+"""
+job_worker.py
+
+Worker process that executes agent runs queued by the dashboard (see `utils.job_queue`),
+and the background matching of uploaded documents (`tools.upload_tool`).
+
+Each worker runs one job at a time, so the number of worker processes caps how many
+agent runs hit the LLM server and Google APIs at once, however many brokers click
+"Run Agent Now". Start one (or a few) next to the dashboard:
+
+    python job_worker.py            # poll forever
+    python job_worker.py --once     # run queued jobs, then exit
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+# ✅ Add the parent directory to the Python path so internal modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import run_agent
+from tools import upload_tool
+from utils import job_queue
+from utils.logger import log_event
+
+
+def _run_agent_job(job):
+    """Run the agent, persisting each planned task and its outcome. Returns log fields."""
+    job_id = job["id"]
+    planned = []
+
+    def on_task(task):
+        job_queue.record_job_task(job_id, len(planned), task)
+        planned.append(task["id"])
+
+    run_agent(
+        on_task=on_task,
+        on_result=lambda task, result: job_queue.record_job_task_result(job_id, task, result),
+    )
+    return {"tasks": len(planned)}
+
+
+def _match_uploads_job(job):
+    """Match pending document uploads to missing documents. Returns log fields."""
+    return upload_tool.match_pending_uploads()
+
+
+# What each job kind runs; workers only claim the kinds listed here
+JOB_HANDLERS = {
+    "run_agent": _run_agent_job,
+    "match_uploads": _match_uploads_job,
+}
+
+
+def run_job(job):
+    """
+    Execute one claimed job and persist its final status.
+
+    A background thread refreshes the job's heartbeat while it runs, so other
+    workers can tell a long run from a dead worker.
+
+    Args:
+        job (dict): The job row returned by `job_queue.claim_next_job`.
+    """
+    job_id = job["id"]
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(job_queue.JOB_STALE_SECONDS / 4):
+            job_queue.heartbeat(job_id)
+
+    heartbeat_thread = threading.Thread(target=beat, name=f"job-{job_id}-heartbeat", daemon=True)
+    heartbeat_thread.start()
+
+    log_event(f"Job {job_id} started", job_id=job_id, kind=job["kind"], requested_by=job.get("requested_by"))
+    start = time.perf_counter()
+    try:
+        summary = JOB_HANDLERS[job["kind"]](job)
+    except Exception as e:
+        job_queue.finish_job(job_id, error=str(e) or type(e).__name__)
+        log_event(f"Job {job_id} failed", job_id=job_id, outcome="failed", error=str(e),
+                  duration_ms=round((time.perf_counter() - start) * 1000, 1))
+    else:
+        job_queue.finish_job(job_id)
+        log_event(f"Job {job_id} finished", job_id=job_id, outcome="succeeded",
+                  duration_ms=round((time.perf_counter() - start) * 1000, 1), **summary)
+    finally:
+        stop.set()
+        heartbeat_thread.join()
+
+
+def work(worker_id, once=False, poll_seconds=None):
+    """
+    Claim and run queued jobs until interrupted.
+
+    Args:
+        worker_id (str): Identifier stored on claimed jobs.
+        once (bool): Exit when the queue is empty instead of polling.
+        poll_seconds (float, optional): Sleep between empty polls;
+                                        defaults to job_queue.JOB_POLL_SECONDS.
+    """
+    poll_seconds = poll_seconds or job_queue.JOB_POLL_SECONDS
+    print(f"👷 Job worker {worker_id} started")
+    while True:
+        # Free the dedupe keys of runs whose worker died mid-run
+        job_queue.fail_stale_jobs()
+
+        job = job_queue.claim_next_job(worker_id, kinds=tuple(JOB_HANDLERS))
+        if job is not None:
+            print(f"▶️ Running {job['kind']} job {job['id']} (requested by {job.get('requested_by') or 'unknown'})")
+            run_job(job)
+            # An upload stored after the matcher's last read found this job still active
+            # instead of queueing a new one: queue it now
+            if job["kind"] == "match_uploads" and upload_tool.has_pending_uploads():
+                job_queue.enqueue_job("match_uploads", requested_by=worker_id)
+            continue
+        if once:
+            return
+        time.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued Broker AI agent jobs.")
+    parser.add_argument("--once", action="store_true", help="Exit when no job is queued")
+    args = parser.parse_args()
+    try:
+        work(f"{socket.gethostname()}:{os.getpid()}", once=args.once)
+    except KeyboardInterrupt:
+        print("👋 Job worker stopped")
@@ -1,46 +1,97 @@
 import sys
 import os
+import time
 
 # ✅ Add the parent directory to the Python path so internal modules can be imported
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # ✅ Import task-specific agents and utility modules
-from agents.planner_agent import generate_daily_plan  # Plans daily tasks using LLM
-from agents.email_agent import handle_emails          # Handles email-related tasks
-from agents.calendar_agent import manage_calendar     # Manages calendar events
+from agents.planner_agent import generate_daily_plan_stream  # Plans daily tasks using LLM (streamed)
+from agents.email_agent import handle_emails_bulk     # Sends email reminders in Gmail batches
+from agents.calendar_agent import CalendarScheduler, manage_calendar_bulk  # Books calendar events in batches
 from agents.crm_agent import update_crm               # Updates CRM notes
 from utils.logger import log_event                    # Logs key events to file
-from utils.db import log_task_completion              # Logs completed tasks into DB
+from utils.completion_log import CompletionLogWriter  # Buffers completed tasks for one bulk DB write
+from utils.task_executor import TaskExecutor, executor_config_from_env  # Runs tasks in parallel
+from utils import metrics                             # Per-stage latency metrics
 
-def run_agent():
+def run_agent(on_task=None, on_result=None):
     """
     Orchestrates the automation of daily broker tasks.
 
     This function:
     - Logs the start of the process
-    - Generates a task list using LLM logic
-    - Iterates through each task, delegates based on type
-    - Logs execution and stores completion in DB
+    - Streams a task list from the LLM planner
+    - Starts each task as soon as it is parsed, running tasks concurrently
+      and delegating each based on its type; email reminders and calendar
+      bookings are collected and sent together through Gmail/Calendar batch requests
+    - Logs execution and stores completion in DB (one bulk write at the end)
+
+    Args:
+        on_task (callable, optional): Called with each task as soon as the planner
+                                      produces it (e.g. to render it progressively).
+        on_result (callable, optional): Called as on_result(task, result) when a task
+                                        finishes (e.g. to persist job progress).
+
+    Returns:
+        list of dict: The planned tasks in their original order, each annotated with
+                      'status', 'duration_ms' and 'error' from its execution.
     """
     
     log_event("Starting Broker Task Automation Agent")
+    metrics.start_run()
+    run_start = time.perf_counter()
+
+    # 🧠 Step 1 + 🔁 Step 2: Stream today's tasks from the planning agent and run
+    # them in parallel as they arrive, each delegated based on its type
+    # Completed tasks are buffered and flushed in bulk when the block exits
+    # One scheduler per run: free/busy is fetched once and bookings don't overlap
+    scheduler = CalendarScheduler()
+    with CompletionLogWriter() as completion_log:
+        executor = TaskExecutor(
+            handlers={
+                "crm": update_crm,  # Update CRM system
+            },
+            # Email reminders and calendar bookings are collected and sent in batches
+            batch_handlers={
+                "email": handle_emails_bulk,                                       # Send email reminders
+                "calendar": lambda tasks: manage_calendar_bulk(tasks, scheduler),  # Book free slots
+            },
+            **executor_config_from_env(),
+        )
+
+        def record(task, result):
+            log_event(
+                f"Executed task: {task['type']}",
+                task_id=task.get('id'),
+                task_type=task['type'],
+                duration_ms=result['duration_ms'],
+                outcome=result['status'],
+                error=result['error'],
+            )
+            # ✅ Record successfully completed tasks for the bulk DB write
+            if result["status"] != "failed":
+                completion_log.add(task['type'], task['content'], task_id=task.get('id'))
+            if on_result is not None:
+                on_result(task, result)
+
+        tasks, results = executor.run_stream(
+            generate_daily_plan_stream(), on_result=record, on_task=on_task
+        )
+
+    # Attach per-task outcome and timing for the dashboard
+    for task, result in zip(tasks, results):
+        task.update(result)
 
-    # 🧠 Step 1: Generate today's task list via the planning agent
-    tasks = generate_daily_plan()
-
-    # 🔁 Step 2: Loop over each task and handle based on its type
-    for task in tasks:
-        log_event(f"Executing task: {task['type']}")
-
-        if task["type"] == "email":
-            handle_emails(task)           # Send email reminder
-        elif task["type"] == "calendar":
-            manage_calendar(task)         # Schedule an event
-        elif task["type"] == "crm":
-            update_crm(task)              # Update CRM system
-        
-        # ✅ Log the completed task in the database
-        log_task_completion(task['type'], task['content'])
+    # 📈 Record this run's per-stage breakdown and export metrics for the dashboard
+    run = metrics.finish_run(
+        (time.perf_counter() - run_start) * 1000,
+        tasks=len(tasks),
+        failures=sum(1 for r in results if r["status"] == "failed"),
+    )
+    log_event("Finished Broker Task Automation Agent", duration_ms=run["duration_ms"],
+              tasks=run["tasks"], failures=run["failures"])
+    metrics.export_json()
 
     # 📤 Return list of tasks executed
     return tasks
@@ -0,0 +1,192 @@
+"""
+Prompt-Response Cache for the Local LLM
+
+Content-addressed cache in front of `models.offline_model_runner.run_llm`.
+Entries are keyed on a SHA-256 of (prompt, max_tokens, temperature, endpoint),
+so planning over unchanged data returns instantly instead of paying full LLM
+latency again.
+
+- In-memory LRU with a maximum entry count.
+- Optional on-disk store (one JSON file per entry) that survives restarts,
+  pruned to a maximum number of files.
+- Time-to-live applied to both layers.
+- Hit/miss counters via `stats()`.
+
+Configuration (environment):
+    BROKER_LLM_CACHE_SIZE       In-memory entries (default 256, 0 disables caching)
+    BROKER_LLM_CACHE_TTL        Seconds an entry stays fresh (default 3600)
+    BROKER_LLM_CACHE_DIR        Directory for the on-disk store (unset = memory only)
+    BROKER_LLM_CACHE_DISK_SIZE  Maximum files kept on disk (default 5000)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(prompt, max_tokens, temperature, endpoint, stop=None):
+    """
+    Build the content address for a completion request.
+
+    Requests that differ only in their stop sequences get different keys,
+    since the stop sequences change the completion.
+
+    Returns:
+        str: Hex SHA-256 digest of the request parameters.
+    """
+    material = json.dumps(
+        {"prompt": prompt, "max_tokens": max_tokens,
+         "temperature": temperature, "endpoint": endpoint, "stop": stop},
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-level (memory + optional disk) cache of LLM completions.
+
+    Args:
+        max_entries (int): Maximum entries kept in memory (LRU eviction).
+        ttl (float): Seconds before an entry is considered stale.
+        cache_dir (str, optional): Directory for the on-disk store.
+        max_disk_entries (int): Maximum files kept in `cache_dir`.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600.0, cache_dir=None, max_disk_entries=5000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+
+        self._entries = OrderedDict()  # key -> (stored_at, text), most recent last
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        """False when the cache has been configured with zero size."""
+        return self.max_entries > 0
+
+    def _fresh(self, stored_at):
+        return time.time() - stored_at < self.ttl
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """
+        Look up a cached completion.
+
+        Returns:
+            str or None: The cached text, or None on a miss or stale entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry[0]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+        text = self._load_from_disk(key)
+        with self._lock:
+            if text is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return text
+
+    def _load_from_disk(self, key):
+        """Read a fresh entry from disk and promote it into memory."""
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not self._fresh(record["stored_at"]):
+            return None
+        self._remember(key, record["stored_at"], record["text"])
+        return record["text"]
+
+    def _remember(self, key, stored_at, text):
+        """Insert into the in-memory LRU, evicting the least recently used entries."""
+        with self._lock:
+            self._entries[key] = (stored_at, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, key, text):
+        """Store a completion in memory and, if configured, on disk."""
+        if not self.enabled:
+            return
+        stored_at = time.time()
+        self._remember(key, stored_at, text)
+
+        if self.cache_dir:
+            # Write to a temp file first so readers never see a half-written entry
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": stored_at, "text": text}, f)
+            os.replace(tmp_path, path)
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Delete the oldest files once the disk store exceeds `max_disk_entries`."""
+        try:
+            names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+        except OSError:
+            return
+        if len(names) <= self.max_disk_entries:
+            return
+        paths = [os.path.join(self.cache_dir, n) for n in names]
+        paths.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+        for path in paths[: len(paths) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Drop every in-memory entry and reset the counters (disk files are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """
+        Report cache effectiveness.
+
+        Returns:
+            dict: hits, misses, hit_rate and current in-memory size.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "size": len(self._entries),
+            }
+
+
+def cache_from_env():
+    """Build an `LLMResponseCache` from the BROKER_LLM_CACHE_* environment variables."""
+    return LLMResponseCache(
+        max_entries=int(os.environ.get("BROKER_LLM_CACHE_SIZE", "256")),
+        ttl=float(os.environ.get("BROKER_LLM_CACHE_TTL", "3600")),
+        cache_dir=os.environ.get("BROKER_LLM_CACHE_DIR") or None,
+        max_disk_entries=int(os.environ.get("BROKER_LLM_CACHE_DISK_SIZE", "5000")),
+    )
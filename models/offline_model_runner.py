@@ -1,27 +1,172 @@
-import requests  # For making HTTP POST requests to the local LLM API
+import json
+import os
+import threading
+import time
 
-def run_llm(prompt, max_tokens=512):
+from models.llm_cache import cache_from_env, make_key  # Prompt-response cache
+from utils.metrics import observe, span  # Per-stage latency metrics
+
+# OpenAI-compatible completions endpoint of the local LLM server
+LLM_ENDPOINT = os.environ.get("BROKER_LLM_ENDPOINT", "http://192.168.0.14:1234/v1/completions")
+
+# (connect, read) timeouts in seconds; the read timeout bounds the gap between streamed chunks
+LLM_TIMEOUT = (
+    float(os.environ.get("BROKER_LLM_CONNECT_TIMEOUT", "5")),
+    float(os.environ.get("BROKER_LLM_TIMEOUT", "120")),
+)
+
+# Retries for connection errors and 429/5xx responses, with exponential backoff
+LLM_RETRIES = int(os.environ.get("BROKER_LLM_RETRIES", "3"))
+LLM_BACKOFF = float(os.environ.get("BROKER_LLM_BACKOFF", "0.5"))
+
+# Controls randomness (0 = deterministic, 1 = more creative)
+TEMPERATURE = 0.7
+
+# Default stopping sequence (stop when newline is generated); pass stop=None for multi-line output
+DEFAULT_STOP = ["\n"]
+
+# Shared response cache, configured via BROKER_LLM_CACHE_* environment variables
+response_cache = cache_from_env()
+
+# Keep-alive HTTP session shared by every call, created on first use
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the shared keep-alive HTTP session for the LLM server.
+
+    The session pools connections (so repeated calls skip the TCP handshake) and
+    retries connection errors and 429/5xx responses with exponential backoff.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # `requests` is imported on first use so importing the agents stays fast
+                import requests  # For making HTTP POST requests to the local LLM API
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(
+                    total=LLM_RETRIES,
+                    backoff_factor=LLM_BACKOFF,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset({"POST"}),  # Completions are safe to resend
+                )
+                session = requests.Session()
+                session.mount("http://", HTTPAdapter(max_retries=retry, pool_maxsize=8))
+                session.mount("https://", HTTPAdapter(max_retries=retry, pool_maxsize=8))
+                _session = session
+    return _session
+
+
+def _payload(prompt, max_tokens, stop=DEFAULT_STOP, stream=False):
+    """Builds the JSON body of a completion request."""
+    payload = {
+        "prompt": prompt,            # Input prompt to guide the model's response
+        "max_tokens": max_tokens,    # Limit the length of the model's response
+        "temperature": TEMPERATURE,  # Controls randomness
+        "stream": stream,            # Ask for server-sent events instead of one response
+    }
+    if stop:
+        payload["stop"] = stop       # Optional stopping sequences
+    return payload
+
+
+def run_llm(prompt, max_tokens=512, use_cache=True, stop=DEFAULT_STOP):
     """
     Sends a prompt to a locally hosted LLM API and retrieves the generated completion.
 
+    Identical requests (same prompt, max_tokens, temperature, stop and endpoint) are served
+    from `response_cache` while the cached entry is fresh.
+
     Args:
         prompt (str): The instruction or context you want the language model to respond to.
         max_tokens (int): The maximum number of tokens (words/pieces) in the model's output.
+        use_cache (bool): Set to False to always call the model.
+        stop (list, optional): Stopping sequences; None lets the model write several lines.
 
     Returns:
         str: The text response generated by the model, stripped of leading/trailing whitespace.
     """
 
-    # Prepare the payload for the POST request
-    payload = {
-        "prompt": prompt,            # Input prompt to guide the model's response
-        "max_tokens": max_tokens,    # Limit the length of the model's response
-        "temperature": 0.7,          # Controls randomness (0 = deterministic, 1 = more creative)
-        "stop": ["\n"]               # Optional stopping sequence (stop when newline is generated)
-    }
+    # Return the cached completion if this exact request was answered recently
+    key = make_key(prompt, max_tokens, TEMPERATURE, LLM_ENDPOINT, stop)
+    if use_cache and response_cache.enabled:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    # Send a POST request to the local LLM server over the pooled session
+    with span("llm.completion"):
+        response = get_session().post(LLM_ENDPOINT, json=_payload(prompt, max_tokens, stop), timeout=LLM_TIMEOUT)
+        response.raise_for_status()
+
+    # Extract the model's text output from the JSON response
+    text = response.json()['choices'][0]['text'].strip()
+
+    # Remember the completion for identical future requests
+    if use_cache:
+        response_cache.put(key, text)
+    return text
+
+
+def stream_llm(prompt, max_tokens=512, use_cache=True, stop=DEFAULT_STOP):
+    """
+    Streams a completion from the local LLM API, yielding text as it arrives.
+
+    Uses the server-sent events mode of the OpenAI-compatible API: each
+    `data: {...}` line carries the next chunk of text, and `data: [DONE]` ends the stream.
+    A cached completion is yielded as a single chunk; a fully streamed completion is
+    added to the cache.
+
+    Args:
+        prompt (str): The instruction or context you want the language model to respond to.
+        max_tokens (int): The maximum number of tokens (words/pieces) in the model's output.
+        use_cache (bool): Set to False to always call the model.
+        stop (list, optional): Stopping sequences; None lets the model write several lines.
+
+    Yields:
+        str: Successive pieces of the generated text.
+    """
+    key = make_key(prompt, max_tokens, TEMPERATURE, LLM_ENDPOINT, stop)
+    if use_cache and response_cache.enabled:
+        cached = response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
 
-    # Send a POST request to the local LLM server at port 1234
-    response = requests.post("http://192.168.0.14:1234/v1/completions", json=payload)
+    pieces = []
+    start = time.perf_counter()
+    with span("llm.stream"):
+        response = get_session().post(
+            LLM_ENDPOINT, json=_payload(prompt, max_tokens, stop, stream=True),
+            timeout=LLM_TIMEOUT, stream=True,
+        )
+        with response:
+            response.raise_for_status()
+            # SSE is UTF-8; without a charset header requests would decode as ISO-8859-1
+            response.encoding = "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                # Skip keep-alive blank lines and SSE comments
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)['choices'][0].get('text', '')
+                if chunk:
+                    if not pieces:
+                        # Time to first token is what streaming consumers wait on
+                        observe("llm.first_token", (time.perf_counter() - start) * 1000)
+                    pieces.append(chunk)
+                    yield chunk
 
-    # Extract and return the model's text output from the JSON response
-    return response.json()['choices'][0]['text'].strip()
\ No newline at end of file
+    # Cache the full completion once the stream finished normally
+    if use_cache:
+        response_cache.put(key, "".join(pieces).strip())
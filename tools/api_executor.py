@@ -0,0 +1,418 @@
+"""
+tools/api_executor.py
+
+Shared executor for Google API calls (Gmail, Calendar) that handles quota and failures:
+
+- Token-bucket rate limiting per API (project-wide) and per user (token file), so
+  high-volume sends run at the quota instead of into it.
+- Retries of 429/5xx responses and network errors with exponential backoff and full
+  jitter; a `Retry-After` header wins over the computed delay, and a 429 pauses the
+  user's bucket so other threads back off too.
+- A dead-letter table (`api_dead_letters`) for calls that failed permanently, and
+  `replay_dead_letters` to send them again once the cause is fixed.
+
+Calls are made by operation name, so a dead letter can be replayed later:
+
+    register_operation("gmail.send", lambda payload: service.users().messages().send(...),
+                       user=TOKEN_PATH)
+    execute("gmail.send", {"body": body})
+
+Rates are requests per second, read from the environment:
+    BROKER_GOOGLE_RATE_<API>       project-wide (default gmail 10, calendar 10)
+    BROKER_GOOGLE_USER_RATE_<API>  per user     (default gmail 2.5, calendar 5)
+    BROKER_GOOGLE_MAX_RETRIES      retries per call (default 5)
+    BROKER_GOOGLE_BACKOFF          first backoff in seconds (default 1, doubled per retry, max 32)
+A rate of 0 disables that limit.
+
+Replay from the command line:
+    python tools/api_executor.py [operation]
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+# Add the repository root to the Python path so the module can also run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.db import run_query  # Pooled MySQL access for the dead-letter table
+from utils.metrics import span  # Per-stage latency metrics
+
+# Default requests per second: (project-wide, per user)
+DEFAULT_RATES = {"gmail": (10.0, 2.5), "calendar": (10.0, 5.0)}
+
+MAX_RETRIES = int(os.environ.get("BROKER_GOOGLE_MAX_RETRIES", "5"))
+BACKOFF = float(os.environ.get("BROKER_GOOGLE_BACKOFF", "1"))
+MAX_BACKOFF = 32.0
+
+# HTTP statuses worth retrying (rate limiting and transient server errors)
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ApiCallError(RuntimeError):
+    """Raised when a Google API call failed permanently (and was dead-lettered)."""
+
+    def __init__(self, operation, message, status=None):
+        super().__init__(f"{operation} failed: {message}")
+        self.operation = operation
+        self.status = status
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate (float): Tokens added per second (0 means unlimited).
+        capacity (float, optional): Maximum burst; defaults to one second of tokens.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """
+        Take `tokens` tokens, sleeping until they are available.
+
+        Tokens are reserved before sleeping, so waiting callers are served in order
+        and a request larger than the bucket (e.g. a whole batch) still goes through.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (min(tokens, self.capacity) - self._tokens) / self.rate)
+            self._tokens -= tokens
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Withhold tokens for about `seconds` (e.g. after a 429 with Retry-After)."""
+        if not self.rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class RateLimiter:
+    """One project-wide bucket per API plus one bucket per (API, user)."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _rate(api, per_user):
+        defaults = DEFAULT_RATES.get(api, (0.0, 0.0))
+        name = f"BROKER_GOOGLE_{'USER_' if per_user else ''}RATE_{api.upper()}"
+        return float(os.environ.get(name, defaults[1 if per_user else 0]))
+
+    def bucket(self, api, user=None):
+        """Return the bucket for an API (user=None) or for one user of it."""
+        key = (api, user)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self._rate(api, user is not None))
+            return bucket
+
+    def acquire(self, api, user=None, tokens=1):
+        """Wait for `tokens` from both the API-wide and the user's bucket."""
+        waited = self.bucket(api).acquire(tokens)
+        if user is not None:
+            waited += self.bucket(api, user).acquire(tokens)
+        return waited
+
+    def pause(self, api, user, seconds):
+        """Back off one user's calls (a 429 is usually a per-user quota)."""
+        self.bucket(api, user).pause(seconds)
+
+
+# Process-wide limiter shared by every Google API call
+limiter = RateLimiter()
+
+# operation name -> (request builder, user)
+_operations = {}
+
+
+def register_operation(operation, build_request, user=None):
+    """
+    Register how to build the API request for an operation.
+
+    Args:
+        operation (str): '<api>.<name>', e.g. 'gmail.send'.
+        build_request (callable): Called with the payload dict; returns a
+                                  googleapiclient request (anything with `.execute()`).
+        user (str, optional): Rate-limit key for the calling account (e.g. its token path).
+    """
+    _operations[operation] = (build_request, user)
+
+
+def status_of(exception):
+    """Return the HTTP status of a failed call, or None for network errors."""
+    resp = getattr(exception, "resp", None)
+    return getattr(resp, "status", None)
+
+
+def is_retryable(exception):
+    """Return True if a failed call is worth sending again."""
+    status = status_of(exception)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    # Connection-level failures are transient too
+    return isinstance(exception, (OSError, TimeoutError))
+
+
+def retry_after(exception):
+    """Return the server's Retry-After delay in seconds, if it sent one."""
+    resp = getattr(exception, "resp", None)
+    try:
+        return float(resp.get("retry-after")) if resp is not None and resp.get("retry-after") else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def backoff_delay(attempt, base=None):
+    """
+    Exponential backoff with full jitter: a random delay up to base * 2^attempt.
+
+    Jitter spreads the retries of many concurrent callers instead of having them
+    hit the API again at the same moment.
+    """
+    base = BACKOFF if base is None else base
+    return random.uniform(0, min(MAX_BACKOFF, base * (2 ** attempt)))
+
+
+def execute(operation, payload, max_retries=None, dead_letter_on_failure=True):
+    """
+    Run a registered API operation with rate limiting, retries and dead-lettering.
+
+    Args:
+        operation (str): Registered operation name (e.g. 'gmail.send').
+        payload (dict): JSON-serialisable arguments for the request builder.
+        max_retries (int, optional): Retries after the first attempt (default MAX_RETRIES).
+        dead_letter_on_failure (bool): Store the call in `api_dead_letters` if it fails.
+
+    Returns:
+        dict: The API response.
+
+    Raises:
+        ApiCallError: If the call failed with a permanent error or ran out of retries.
+    """
+    build_request, user = _operations[operation]
+    api = operation.split(".", 1)[0]
+    max_retries = MAX_RETRIES if max_retries is None else max_retries
+
+    for attempt in range(max_retries + 1):
+        limiter.acquire(api, user)
+        try:
+            with span(operation):
+                return build_request(payload).execute()
+        except Exception as e:
+            if not is_retryable(e) or attempt == max_retries:
+                if dead_letter_on_failure:
+                    dead_letter(operation, payload, e, attempts=attempt + 1)
+                raise ApiCallError(operation, str(e), status_of(e)) from e
+            delay = retry_after(e) or backoff_delay(attempt)
+            if status_of(e) == 429:
+                limiter.pause(api, user, delay)
+            time.sleep(delay)
+
+
+def execute_batch(operation, payloads, new_batch, batch_size=50, max_retries=3, backoff=1.0):
+    """
+    Run many calls of a registered operation through HTTP batch requests.
+
+    Calls are grouped into batches of at most `batch_size` sub-requests; each batch
+    takes one rate-limit token per sub-request (Google charges quota per call).
+    Only sub-requests that fail with a retryable error are retried, with jittered
+    exponential backoff between rounds; calls that still fail are dead-lettered.
+
+    Args:
+        operation (str): Registered operation name (e.g. 'gmail.send').
+        payloads (list of dict): One payload per call.
+        new_batch (callable): Returns an empty `BatchHttpRequest` for the API.
+        batch_size (int): Maximum sub-requests per batch.
+        max_retries (int): Retry rounds for failed sub-requests.
+        backoff (float): Maximum seconds to wait before the first retry; doubles each round.
+
+    Returns:
+        list of tuple: (response, exception) per payload, in input order; exactly one
+                       of the two is None.
+    """
+    build_request, user = _operations[operation]
+    api = operation.split(".", 1)[0]
+    responses = [None] * len(payloads)
+    errors = [None] * len(payloads)
+    pending = list(range(len(payloads)))
+
+    for attempt in range(max_retries + 1):
+        retry = []
+        last_round = attempt == max_retries
+
+        def record(request_id, response, exception):
+            # Map each sub-response back to its payload by request ID
+            index = int(request_id)
+            if exception is None:
+                responses[index] = response
+            elif is_retryable(exception) and not last_round:
+                retry.append(index)
+            else:
+                errors[index] = exception
+                dead_letter(operation, payloads[index], exception, attempts=attempt + 1)
+
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            batch = new_batch()
+            for index in chunk:
+                batch.add(build_request(payloads[index]), callback=record, request_id=str(index))
+            limiter.acquire(api, user, tokens=len(chunk))
+            try:
+                with span(f"{api}.batch"):
+                    batch.execute()
+            except Exception as e:
+                # The whole batch request failed; every call in it gets the same treatment
+                for index in chunk:
+                    if responses[index] is None and errors[index] is None and index not in retry:
+                        record(str(index), None, e)
+
+        if not retry:
+            break
+        time.sleep(backoff_delay(attempt, backoff))
+        pending = sorted(retry)
+
+    return list(zip(responses, errors))
+
+
+# Set once the dead-letter table has been checked in this process
+_dead_letter_table_ready = False
+_dead_letter_table_lock = threading.Lock()
+
+
+def ensure_dead_letter_table():
+    """
+    Creates the `api_dead_letters` table if it is missing.
+    """
+    global _dead_letter_table_ready
+    if _dead_letter_table_ready:
+        return
+    with _dead_letter_table_lock:
+        if _dead_letter_table_ready:
+            return
+        run_query("""
+            CREATE TABLE IF NOT EXISTS api_dead_letters (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                operation VARCHAR(60) NOT NULL,
+                payload MEDIUMTEXT NOT NULL,
+                status_code INT NULL,
+                error TEXT NOT NULL,
+                attempts INT NOT NULL,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                replayed_at DATETIME NULL,
+                INDEX idx_api_dead_letters_pending (replayed_at, operation)
+            )
+        """)
+        _dead_letter_table_ready = True
+
+
+def dead_letter(operation, payload, exception, attempts=1):
+    """
+    Store a permanently failed call so it can be replayed.
+
+    Never raises: if the database is unavailable the failure is only printed,
+    so a dead-letter problem does not hide the original API error.
+    """
+    try:
+        ensure_dead_letter_table()
+        run_query(
+            """
+            INSERT INTO api_dead_letters (operation, payload, status_code, error, attempts)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            (operation, json.dumps(payload), status_of(exception), str(exception)[:2000], attempts),
+        )
+    except Exception as e:
+        print(f"❌ Could not dead-letter {operation}: {e}")
+
+
+def fetch_dead_letters(operation=None, limit=100):
+    """
+    Fetch dead letters that have not been replayed yet, oldest first.
+
+    Returns:
+        list of dict: Rows with id, operation, payload (decoded), status_code, error,
+                      attempts and created_at.
+    """
+    ensure_dead_letter_table()
+    condition, params = ("AND operation = %s", (operation,)) if operation else ("", ())
+    rows = run_query(
+        f"""
+        SELECT id, operation, payload, status_code, error, attempts, created_at
+        FROM api_dead_letters
+        WHERE replayed_at IS NULL {condition}
+        ORDER BY id
+        LIMIT %s
+        """,
+        params + (limit,),
+    )
+    for row in rows:
+        row["payload"] = json.loads(row["payload"])
+    return rows
+
+
+def replay_dead_letters(operation=None, limit=100):
+    """
+    Send dead-lettered calls again through `execute`.
+
+    Successful calls are marked replayed; failed ones stay pending with their
+    error and attempt count updated (they are not dead-lettered a second time).
+
+    Args:
+        operation (str, optional): Only replay this operation.
+        limit (int): Maximum calls to replay.
+
+    Returns:
+        dict: {"replayed": int, "failed": int}
+    """
+    summary = {"replayed": 0, "failed": 0}
+    for row in fetch_dead_letters(operation, limit):
+        if row["operation"] not in _operations:
+            print(f"⚠️ No handler registered for {row['operation']}; skipping dead letter {row['id']}")
+            continue
+        try:
+            execute(row["operation"], row["payload"], dead_letter_on_failure=False)
+        except ApiCallError as e:
+            run_query(
+                "UPDATE api_dead_letters SET error = %s, status_code = %s, attempts = attempts + 1 WHERE id = %s",
+                (str(e)[:2000], e.status, row["id"]),
+            )
+            summary["failed"] += 1
+        else:
+            run_query("UPDATE api_dead_letters SET replayed_at = NOW() WHERE id = %s", (row["id"],))
+            summary["replayed"] += 1
+    print(f"🔁 Replayed {summary['replayed']} dead letters ({summary['failed']} still failing)")
+    return summary
+
+
+if __name__ == "__main__":
+    # Importing the tools registers their operations on the importable copy of this module
+    import tools.calendar_tool  # noqa: F401
+    import tools.gmail_tool     # noqa: F401
+    from tools import api_executor
+    api_executor.replay_dead_letters(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -1,85 +1,172 @@
 # Standard library imports
 import datetime  # For handling date and time
-import pickle    # For saving/loading authentication credentials
-import os        # For checking file paths
+import os        # For reading the token path from the environment
 
-# Google API libraries
-from google.auth.transport.requests import Request              # Used for refreshing tokens
-from google_auth_oauthlib.flow import InstalledAppFlow          # For handling OAuth2 login flow
-from googleapiclient.discovery import build                     # To build the Google Calendar API service
+# Rate limiting, retries and dead letters for Google API calls
+from tools import api_executor
+
+# Process-wide cache of authenticated Google API clients
+from tools.google_client import api_endpoint_override, get_service
 
 # Define the Google Calendar API scope - this grants permission to manage calendar events
 SCOPES = ['https://www.googleapis.com/auth/calendar.events']
 
+# Pickled OAuth token for the Calendar API (one per broker account)
+TOKEN_PATH = os.environ.get("BROKER_CALENDAR_TOKEN", 'tools/token_calendar.pickle')
+
+# Sub-requests per batch (the Calendar API allows up to 50)
+BATCH_SIZE = 50
+
+# Length of an event when none is given
+DEFAULT_EVENT_MINUTES = 60
+
 def authenticate_calendar():
     """
-    Authenticates and returns a Google Calendar service client.
+    Returns an authenticated Google Calendar service client.
 
-    Loads saved credentials from a pickle file if available,
-    otherwise triggers an OAuth2 login flow to generate a new token.
+    Credentials are loaded (or obtained via the OAuth2 flow) once per process and
+    refreshed only when near expiry; the service client is built once per thread.
 
     Returns:
         service: Authenticated Google Calendar service object.
     """
-    creds = None
-
-    # Check if we already have a valid saved token
-    if os.path.exists('tools/token_calendar.pickle'):
-        with open('tools/token_calendar.pickle', 'rb') as token:
-            creds = pickle.load(token)
-
-    # If no valid credentials are found, perform the OAuth flow
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            # Refresh the token if it's expired and we have a refresh token
-            creds.refresh(Request())
-        else:
-            # Start the OAuth flow using client credentials
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'tools/credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        
-        # Save the new token for future runs
-        with open('tools/token_calendar.pickle', 'wb') as token:
-            pickle.dump(creds, token)
-
-    # Return the authorized Google Calendar API service client
-    return build('calendar', 'v3', credentials=creds)
+    return get_service('calendar', 'v3', SCOPES, TOKEN_PATH)
 
-def schedule_event(event):
+def _insert_request(payload):
+    """Builds the events.insert request for a payload of {'body': <event resource>}."""
+    return authenticate_calendar().events().insert(calendarId='primary', body=payload['body'])
+
+def _freebusy_request(payload):
+    """Builds the freebusy.query request for a payload of {'body': <query>}."""
+    return authenticate_calendar().freebusy().query(body=payload['body'])
+
+# Registered by name so dead-lettered inserts can be replayed
+api_executor.register_operation("calendar.insert", _insert_request, user=TOKEN_PATH)
+api_executor.register_operation("calendar.freebusy", _freebusy_request, user=TOKEN_PATH)
+
+def _new_batch(service):
+    """Create a batch request, honouring a local fake endpoint if one is configured."""
+    endpoint = api_endpoint_override()
+    if endpoint:
+        # Imported on first use, like the rest of googleapiclient (see tools.google_client)
+        from googleapiclient.http import BatchHttpRequest
+
+        return BatchHttpRequest(batch_uri=endpoint.rstrip('/') + '/batch/calendar/v3')
+    return service.new_batch_http_request()
+
+def _parse_time(value):
+    """Parses an RFC 3339 timestamp from the API into a naive UTC datetime."""
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def fetch_busy_intervals(time_min, time_max):
     """
-    Schedules a calendar event in the user's primary Google Calendar.
+    Fetches the busy intervals of the primary calendar with one free/busy query.
 
     Args:
-        event (dict): Dictionary containing:
-            - 'title' (str): Title of the event
-            - 'time' (str): ISO 8601 formatted start datetime (e.g., "2025-06-10T15:00:00")
+        time_min (datetime): Start of the window (naive UTC).
+        time_max (datetime): End of the window (naive UTC).
 
-    Example:
-        schedule_event({"title": "Client Call", "time": "2025-06-10T15:00:00"})
+    Returns:
+        list of tuple: (start, end) naive UTC datetimes of every busy interval.
     """
-    # Get authenticated calendar service
-    service = authenticate_calendar()
+    query = {
+        'timeMin': time_min.isoformat() + 'Z',
+        'timeMax': time_max.isoformat() + 'Z',
+        'items': [{'id': 'primary'}],
+    }
+    response = api_executor.execute("calendar.freebusy", {'body': query})
+    busy = response.get('calendars', {}).get('primary', {}).get('busy', [])
+    return [(_parse_time(b['start']), _parse_time(b['end'])) for b in busy]
 
-    # Get the current UTC time in ISO format with 'Z' suffix
-    now = datetime.datetime.utcnow().isoformat() + 'Z'
+def build_event(event):
+    """
+    Builds the Calendar API resource for an event.
 
-    # Create event body using Google Calendar API format
-    calendar_event = {
+    Args:
+        event (dict): 'title', 'time' (ISO 8601 start, UTC) and optionally
+                      'duration_minutes' (defaults to DEFAULT_EVENT_MINUTES).
+
+    Returns:
+        dict: Event resource for events.insert.
+    """
+    start = datetime.datetime.fromisoformat(event['time'])
+    end = start + datetime.timedelta(minutes=event.get('duration_minutes', DEFAULT_EVENT_MINUTES))
+    return {
         'summary': event['title'],  # Title of the event
         'start': {
-            'dateTime': event['time'],  # Start time
-            'timeZone': 'UTC',          # Time zone
+            'dateTime': start.isoformat(),  # Start time
+            'timeZone': 'UTC',              # Time zone
         },
         'end': {
-            # End time is 1 hour after start
-            'dateTime': (datetime.datetime.fromisoformat(event['time']) + datetime.timedelta(hours=1)).isoformat(),
+            'dateTime': end.isoformat(),
             'timeZone': 'UTC',
         }
     }
 
-    # Insert the event into the primary calendar
-    created_event = service.events().insert(calendarId='primary', body=calendar_event).execute()
+def schedule_event(event):
+    """
+    Schedules a calendar event in the user's primary Google Calendar.
+
+    Args:
+        event (dict): Dictionary containing:
+            - 'title' (str): Title of the event
+            - 'time' (str): ISO 8601 formatted start datetime (e.g., "2025-06-10T15:00:00")
+            - 'duration_minutes' (int, optional): Length of the event (default 60)
+
+    Returns:
+        dict: The created event.
+
+    Raises:
+        ApiCallError: If the event could not be created after retries
+                      (the call is stored as a dead letter for replay).
+
+    Example:
+        schedule_event({"title": "Client Call", "time": "2025-06-10T15:00:00"})
+    """
+    # Create event body using Google Calendar API format
+    calendar_event = build_event(event)
+
+    # Insert the event into the primary calendar (rate limited and retried on 429/5xx)
+    created_event = api_executor.execute("calendar.insert", {'body': calendar_event})
 
     # Output the link to view the event in the user's calendar
-    print(f"Event created: {created_event.get('htmlLink')}")
\ No newline at end of file
+    print(f"Event created: {created_event.get('htmlLink')}")
+    return created_event
+
+def schedule_events_bulk(events, batch_size=BATCH_SIZE, max_retries=3, backoff=1.0):
+    """
+    Creates many calendar events using Calendar HTTP batch requests.
+
+    Retries, rate limiting and dead-lettering work as in `tools.gmail_tool.send_bulk`.
+
+    Args:
+        events (list of dict): Events as accepted by `schedule_event`.
+        batch_size (int): Maximum sub-requests per batch.
+        max_retries (int): Retry rounds for failed sub-requests.
+        backoff (float): Maximum seconds to wait before the first retry; doubles each round.
+
+    Returns:
+        list of dict: One result per event, in input order, with keys 'title',
+                      'id' (event ID or None), 'htmlLink' and 'error' (str or None).
+    """
+    if not events:
+        return []
+    service = authenticate_calendar()
+    outcomes = api_executor.execute_batch(
+        "calendar.insert", [{'body': build_event(e)} for e in events], lambda: _new_batch(service),
+        batch_size=batch_size, max_retries=max_retries, backoff=backoff,
+    )
+    results = [
+        {'title': event['title'],
+         'id': response.get('id') if response else None,
+         'htmlLink': response.get('htmlLink') if response else None,
+         'error': str(error) if error is not None else None}
+        for event, (response, error) in zip(events, outcomes)
+    ]
+
+    created = sum(1 for r in results if r['error'] is None)
+    print(f"📅 Bulk scheduling finished: {created}/{len(events)} events created")
+    return results
@@ -3,9 +3,16 @@
 """
 This module provides functions to interact with the CRM-related 
 client data stored in the database, specifically for updating notes.
+
+Notes can be updated one client at a time (`update_client_notes`) or in bulk
+(`update_client_notes_bulk`), either overwriting `clients.notes` or appending
+timestamped entries to the `client_notes` table.
 """
 
-from utils.db import run_query  # Import the utility function to execute DB queries
+import threading
+
+from utils.db import run_query, transaction  # Import the utility functions to execute DB queries
+from utils.query_cache import invalidate  # Drops cached reads of tables we write to
 
 def update_client_notes(client_email, notes):
     """
@@ -29,5 +36,107 @@ def update_client_notes(client_email, notes):
     # Execute the query with the provided parameters (note content and client email)
     run_query(query, (notes, client_email))
 
+    # Cached client reads may now be stale
+    invalidate("clients")
+
     # Confirm the update in the console/log
-    print(f"✅ Updated CRM notes for {client_email}")
\ No newline at end of file
+    print(f"✅ Updated CRM notes for {client_email}")
+
+
+# Maximum emails per IN (...) list / CASE expression in one statement
+BULK_CHUNK_SIZE = 500
+
+# Set once the client_notes table has been checked in this process
+_notes_table_ready = False
+_notes_table_lock = threading.Lock()
+
+
+def ensure_client_notes_table():
+    """
+    Creates the `client_notes` table used for appended, timestamped notes if it is missing.
+    """
+    global _notes_table_ready
+    if _notes_table_ready:
+        return
+    with _notes_table_lock:
+        if _notes_table_ready:
+            return
+        run_query("""
+            CREATE TABLE IF NOT EXISTS client_notes (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                client_id INT NOT NULL,
+                note TEXT NOT NULL,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_client_notes_client_created (client_id, created_at)
+            )
+        """)
+        _notes_table_ready = True
+
+
+def _chunks(items, size):
+    """Yields successive slices of `items` with at most `size` elements."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def update_client_notes_bulk(updates, append=False):
+    """
+    Applies many CRM note updates in a single transaction.
+
+    Args:
+        updates (list of tuple): (client_email, note) pairs. If an email appears more
+                                 than once, overwrite mode keeps the last note while
+                                 append mode adds every note.
+        append (bool): If True, add a timestamped row per note to `client_notes`
+                       instead of overwriting `clients.notes`.
+
+    Returns:
+        list of dict: One entry per input pair, in order, with keys 'email' and
+                      'affected' (number of client rows the note was applied to;
+                      0 means no client has that email).
+    """
+    if not updates:
+        return []
+    if append:
+        ensure_client_notes_table()
+
+    emails = list(dict.fromkeys(email for email, _ in updates))
+
+    with transaction() as cursor:
+        # Look up the client IDs for every email with a few batched SELECTs
+        client_ids = {}
+        for chunk in _chunks(emails, BULK_CHUNK_SIZE):
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"SELECT id, email FROM clients WHERE email IN ({placeholders})", tuple(chunk))
+            for row in cursor.fetchall():
+                client_ids.setdefault(row["email"], []).append(row["id"])
+
+        if append:
+            # One multi-row INSERT for all notes of known clients
+            rows = [
+                (client_id, note)
+                for email, note in updates
+                for client_id in client_ids.get(email, ())
+            ]
+            if rows:
+                cursor.executemany("INSERT INTO client_notes (client_id, note) VALUES (%s, %s)", rows)
+        else:
+            # The last note per email wins, as with sequential single updates
+            latest = dict(updates)
+            known = [email for email in emails if email in client_ids]
+            for chunk in _chunks(known, BULK_CHUNK_SIZE):
+                cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+                placeholders = ", ".join(["%s"] * len(chunk))
+                params = [value for email in chunk for value in (email, latest[email])]
+                cursor.execute(
+                    f"UPDATE clients SET notes = CASE email {cases} END WHERE email IN ({placeholders})",
+                    tuple(params) + tuple(chunk),
+                )
+
+    # Cached client reads may now be stale
+    invalidate("clients")
+
+    results = [{"email": email, "affected": len(client_ids.get(email, ()))} for email, _ in updates]
+    applied = sum(1 for r in results if r["affected"])
+    print(f"✅ Applied {applied}/{len(updates)} CRM note updates ({'append' if append else 'overwrite'})")
+    return results
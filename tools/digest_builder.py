@@ -0,0 +1,136 @@
+"""
+tools/digest_builder.py
+
+Builds daily digest email bodies from a stream of completed tasks.
+
+Tasks are consumed one at a time (e.g. straight from `utils.db.iter_completed_tasks`),
+so memory does not grow with the task history:
+
+- Tasks are counted per type; only the first `max_items` lines of each type are
+  kept, the rest are summarised as "...and N more".
+- Bodies are assembled from a list of lines and joined once, instead of repeated
+  string concatenation.
+- One pass can render a digest per recipient: every recipient gets the shared
+  summary plus the tasks that mention them.
+
+Configuration is read from the environment:
+    BROKER_DIGEST_MAX_ITEMS (default 20): task lines listed per type and per recipient
+"""
+
+import os
+from collections import OrderedDict
+
+# Task lines listed per section before the rest are only counted
+DIGEST_MAX_ITEMS = int(os.environ.get("BROKER_DIGEST_MAX_ITEMS", "20"))
+
+# Opening line of every digest
+DIGEST_HEADER = "Here’s a summary of today’s broker activity:"
+
+
+class _Section:
+    """Count of tasks plus the first few task lines of one digest section."""
+
+    def __init__(self):
+        self.count = 0
+        self.lines = []
+
+    def add(self, line, max_items):
+        self.count += 1
+        if len(self.lines) < max_items:
+            self.lines.append(line)
+
+    def render(self, parts):
+        parts.extend(self.lines)
+        if self.count > len(self.lines):
+            parts.append(f"  ...and {self.count - len(self.lines)} more")
+
+
+class DigestBuilder:
+    """
+    Accumulates completed tasks into a type-grouped digest.
+
+    Args:
+        recipients (iterable, optional): Email addresses that get a personal section.
+        mentions (callable, optional): Maps a task's content to the email addresses it
+                                       mentions (e.g. via `ClientDirectory.mentioned_in`).
+                                       Without it, only the shared summary is built.
+        max_items (int): Task lines listed per section.
+    """
+
+    def __init__(self, recipients=(), mentions=None, max_items=DIGEST_MAX_ITEMS):
+        self.max_items = max_items
+        self.total = 0
+        self._by_type = OrderedDict()  # Task type -> _Section, in first-seen order
+        self._recipients = {email.lower(): _Section() for email in recipients}
+        self._mentions = mentions if self._recipients else None
+        self._shared = None  # Rendered shared summary, reused for every recipient
+
+    def add(self, task):
+        """
+        Add one completed task.
+
+        Args:
+            task (dict): Task with 'type' (or 'task_type') and 'content'.
+        """
+        # Try both 'type' and 'task_type' to support different formats
+        task_type = (task.get('type') or task.get('task_type') or 'task').lower()
+        content = task.get('content') or "[No details provided]"
+        line = f"- {content}"
+
+        section = self._by_type.get(task_type)
+        if section is None:
+            section = self._by_type[task_type] = _Section()
+        section.add(line, self.max_items)
+        self.total += 1
+        self._shared = None
+
+        if self._mentions is not None:
+            for email in self._mentions(content):
+                personal = self._recipients.get(email.lower())
+                if personal is not None:
+                    personal.add(f"- [{task_type.capitalize()}] {content}", self.max_items)
+        return self
+
+    def extend(self, tasks):
+        """Add every task of an iterable (consumed lazily). Returns the builder."""
+        for task in tasks:
+            self.add(task)
+        return self
+
+    def render_summary(self):
+        """
+        Render the part of the digest shared by every recipient.
+
+        Returns:
+            str: Header, per-type counts and task lines.
+        """
+        if self._shared is None:
+            parts = [DIGEST_HEADER, ""]
+            if not self.total:
+                parts.append("No tasks completed today.")
+            else:
+                parts.append(f"{self.total} task(s) completed.")
+                for task_type, section in self._by_type.items():
+                    parts.append("")
+                    parts.append(f"{task_type.capitalize()} ({section.count}):")
+                    section.render(parts)
+            self._shared = "\n".join(parts) + "\n"
+        return self._shared
+
+    def render(self, recipient=None):
+        """
+        Render the digest body, personalised for `recipient` if given.
+
+        Args:
+            recipient (str, optional): One of the builder's recipients.
+
+        Returns:
+            str: The digest body.
+        """
+        body = self.render_summary()
+        personal = self._recipients.get(recipient.lower()) if recipient else None
+        if personal is None or not personal.count:
+            return body
+        parts = ["", f"Updates about you ({personal.count}):"]
+        personal.render(parts)
+        return body + "\n".join(parts) + "\n"
@@ -2,66 +2,63 @@
 tools/gmail_tool.py
 
 This module provides functionality to:
-- Authenticate with the Gmail API using OAuth2.
+- Authenticate with the Gmail API using OAuth2 (cached per process).
 - Send individual emails.
-- Send a daily digest email summarizing broker tasks.
+- Send many emails at once using Gmail HTTP batch requests.
+- Send a daily digest email summarizing today's broker tasks, streamed from
+  MySQL and personalised per recipient (see `tools.digest_builder`).
+
+Every call goes through `tools.api_executor`: rate limited per API and per
+user, retried with jittered backoff, and dead-lettered if it fails for good.
 """
 
 import base64
 import os
-import pickle
-from email.mime.text import MIMEText
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from contextlib import closing
+
+from tools import api_executor  # Rate limiting, retries and dead letters for Google API calls
+from tools.digest_builder import DigestBuilder  # Streams tasks into grouped digest bodies
+from tools.google_client import api_endpoint_override, get_service  # Cached Google API clients
+from utils.client_directory import get_client_directory  # Finds the clients a task mentions
+from utils.db import digest_window, iter_completed_tasks  # Today's completed tasks, streamed
 
 # Define the required Gmail API scope for sending emails
 SCOPES = ['https://www.googleapis.com/auth/gmail.send']
 
+# Pickled OAuth token for the Gmail API (one per broker account)
+TOKEN_PATH = os.environ.get("BROKER_GMAIL_TOKEN", 'tools/token.pickle')
+
+# Gmail recommends at most 50 sub-requests per batch to avoid rate limiting
+BATCH_SIZE = 50
+
 
 def gmail_authenticate():
     """
-    Authenticates the user with Gmail using OAuth 2.0.
+    Returns an authenticated Gmail service using OAuth 2.0.
+
+    The credentials and service client are cached by `tools.google_client`,
+    so repeated calls do not reload the token or rebuild the client.
 
     Returns:
         googleapiclient.discovery.Resource: Authenticated Gmail API service.
     """
-    creds = None
+    return get_service('gmail', 'v1', SCOPES, TOKEN_PATH)
 
-    # Load the saved credentials from a pickle file if available
-    if os.path.exists('tools/token.pickle'):
-        with open('tools/token.pickle', 'rb') as token:
-            creds = pickle.load(token)
 
-    # If credentials are missing or invalid, perform OAuth flow
-    if not creds or not creds.valid:
-        # Refresh the token if it's expired
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # Start a new OAuth flow to obtain fresh credentials
-            flow = InstalledAppFlow.from_client_secrets_file(
-                'tools/credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-        # Save the credentials for future use
-        with open('tools/token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
-
-    # Return the authenticated Gmail service
-    return build('gmail', 'v1', credentials=creds)
-
-
-def send_email(to, subject, message_text):
+def build_message(to, subject, message_text):
     """
-    Sends an email using the Gmail API.
+    Builds the Gmail API request body for a plain-text email.
 
     Args:
         to (str): Recipient's email address.
         subject (str): Email subject line.
         message_text (str): Email message body (plain text).
+
+    Returns:
+        dict: Request body with the base64url-encoded raw message.
     """
-    # Authenticate and get the Gmail service
-    service = gmail_authenticate()
+    # The email package is slow to import, so it is loaded with the first message
+    from email.mime.text import MIMEText
 
     # Construct the email message
     message = MIMEText(message_text)
@@ -70,43 +67,174 @@ def send_email(to, subject, message_text):
 
     # Encode the message as base64 to send via the API
     raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    body = {'raw': raw}
+    return {'raw': raw}
 
-    try:
-        # Send the email via Gmail API
-        message = service.users().messages().send(userId='me', body=body).execute()
-        print(f"📧 Email sent to {to}, ID: {message['id']}")
-    except Exception as e:
-        print(f"❌ An error occurred while sending email: {e}")
+
+def _send_request(payload):
+    """Builds the messages.send request for a payload of {'body': ...} (see `build_message`)."""
+    return gmail_authenticate().users().messages().send(userId='me', body=payload['body'])
+
+
+# Registered by name so dead-lettered sends can be replayed
+api_executor.register_operation("gmail.send", _send_request, user=TOKEN_PATH)
+
+
+def send_email(to, subject, message_text):
+    """
+    Sends an email using the Gmail API.
+
+    Rate limits and transient errors (429/5xx, network) are retried with backoff;
+    an email that still cannot be sent is stored as a dead letter for replay.
+
+    Args:
+        to (str): Recipient's email address.
+        subject (str): Email subject line.
+        message_text (str): Email message body (plain text).
+
+    Returns:
+        str: The Gmail message ID.
+
+    Raises:
+        ApiCallError: If the email could not be sent.
+    """
+    body = build_message(to, subject, message_text)
+
+    # Send the email via Gmail API
+    message = api_executor.execute("gmail.send", {'body': body})
+    print(f"📧 Email sent to {to}, ID: {message['id']}")
+    return message['id']
+
+
+def _new_batch(service):
+    """Create a batch request, honouring a local fake endpoint if one is configured."""
+    endpoint = api_endpoint_override()
+    if endpoint:
+        # Imported on first use, like the rest of googleapiclient (see tools.google_client)
+        from googleapiclient.http import BatchHttpRequest
+
+        return BatchHttpRequest(batch_uri=endpoint.rstrip('/') + '/batch/gmail/v1')
+    return service.new_batch_http_request()
 
 
-def send_daily_digest(to_email, tasks):
+def send_bulk(messages, batch_size=BATCH_SIZE, max_retries=3, backoff=1.0):
     """
-    Sends a daily digest email summarizing all tasks completed today.
+    Sends many emails using Gmail HTTP batch requests.
+
+    Messages are grouped into batches of at most `batch_size` sub-requests; each
+    batch takes one rate-limit token per sub-request. Only sub-requests that fail
+    with a retryable error (429/5xx or a network error) are retried, with jittered
+    exponential backoff between rounds. Messages that still fail are dead-lettered
+    (see `tools.api_executor.execute_batch`).
+
+    Args:
+        messages (list of tuple): (to, subject, message_text) for each email.
+        batch_size (int): Maximum sub-requests per batch (Gmail allows up to 100).
+        max_retries (int): Retry rounds for failed sub-requests.
+        backoff (float): Maximum seconds to wait before the first retry; doubles each round.
+
+    Returns:
+        list of dict: One result per message, in input order, with keys
+                      'to', 'id' (Gmail message ID or None) and 'error' (str or None).
+    """
+    service = gmail_authenticate()
+    payloads = [{'body': build_message(*m)} for m in messages]
+    outcomes = api_executor.execute_batch(
+        "gmail.send", payloads, lambda: _new_batch(service),
+        batch_size=batch_size, max_retries=max_retries, backoff=backoff,
+    )
+    results = [
+        {'to': m[0], 'id': response.get('id') if response else None,
+         'error': str(error) if error is not None else None}
+        for m, (response, error) in zip(messages, outcomes)
+    ]
+
+    sent = sum(1 for r in results if r['error'] is None)
+    print(f"📧 Bulk send finished: {sent}/{len(messages)} emails sent")
+    return results
+
+
+def build_digest(tasks=None, day=None, recipients=()):
+    """
+    Builds the daily digest in one pass over the completed tasks.
+
+    Args:
+        tasks (iterable, optional): Task dictionaries with 'type' and 'content'. If omitted,
+                                    the tasks completed on `day` are streamed from MySQL
+                                    (filtered to the digest window in SQL).
+        day (date, optional): Day to summarise when streaming; defaults to today.
+        recipients (iterable): Email addresses that get a section with the tasks mentioning them.
+
+    Returns:
+        DigestBuilder: The filled builder; call `render(recipient)` for each body.
+    """
+    recipients = list(recipients)
+    mentions = None
+    if recipients:
+        directory = get_client_directory()  # Cached; resolves names/emails in task content
+        mentions = lambda content: [c["email"] for c in directory.mentioned_in(content)]
+    builder = DigestBuilder(recipients, mentions)
+
+    if tasks is not None:
+        return builder.extend(tasks)
+    # closing() releases the pooled connection even if building fails midway
+    with closing(iter_completed_tasks(*digest_window(day))) as rows:
+        return builder.extend(rows)
+
+
+def build_digest_body(tasks):
+    """
+    Builds the plain-text body of the daily digest email.
+
+    Args:
+        tasks (iterable): Task dictionaries, each with 'type' and 'content'.
+
+    Returns:
+        str: The digest body, grouped by task type with counts.
+    """
+    return DigestBuilder().extend(tasks).render()
+
+
+def send_daily_digest(to_email, tasks=None, day=None):
+    """
+    Sends a daily digest email summarizing the tasks completed today.
 
     Args:
         to_email (str): The email address to send the digest to.
-        tasks (list): A list of task dictionaries, each with 'type' and 'content'.
+        tasks (iterable, optional): Task dictionaries to summarise; by default the
+                                    tasks completed on `day` are streamed from MySQL.
+        day (date, optional): Day to summarise; defaults to today.
 
     Returns:
-        bool: True if email was sent successfully.
-    """
-    # Header for the digest
-    body = "Here’s a summary of today’s broker activity:\n\n"
-
-    # Handle empty task list
-    if not tasks:
-        body += "No tasks completed today."
-    else:
-        # Loop through each task and add it to the body
-        for t in tasks:
-            # Try both 'type' and 'task_type' to support different formats
-            task_type = t.get('type') or t.get('task_type', 'Task')
-            content = t.get('content') or "[No details provided]"
-            body += f"- [{task_type.capitalize()}] {content}\n"
+        bool: True if email was sent successfully, False if it failed (and was dead-lettered).
+    """
+    body = build_digest(tasks, day, recipients=[to_email]).render(to_email)
 
     # Send the composed email
-    send_email(to_email, "Your Daily Broker Summary", body)
+    try:
+        send_email(to_email, "Your Daily Broker Summary", body)
+    except api_executor.ApiCallError as e:
+        print(f"❌ An error occurred while sending the digest: {e}")
+        return False
 
     # Return success (true)
-    return True
\ No newline at end of file
+    return True
+
+
+def send_daily_digest_bulk(to_emails, tasks=None, day=None):
+    """
+    Sends a personalised daily digest to many recipients using batched requests.
+
+    The tasks are read once; every recipient gets the shared summary plus the
+    tasks that mention them.
+
+    Args:
+        to_emails (list): Email addresses to send the digest to.
+        tasks (iterable, optional): Task dictionaries to summarise; by default the
+                                    tasks completed on `day` are streamed from MySQL.
+        day (date, optional): Day to summarise; defaults to today.
+
+    Returns:
+        list of dict: Per-recipient results as returned by `send_bulk`.
+    """
+    digest = build_digest(tasks, day, recipients=to_emails)
+    return send_bulk([(to, "Your Daily Broker Summary", digest.render(to)) for to in to_emails])
@@ -0,0 +1,148 @@
+"""
+tools/google_client.py
+
+Process-wide cache of authenticated Google API service clients.
+
+Building a Gmail or Calendar client used to happen on every send: unpickle the
+token, maybe refresh it, and construct the discovery client. This module does
+that work once:
+
+- Credentials are loaded once per token file and shared by every thread.
+  They are refreshed (under a lock) only when they are within
+  `REFRESH_MARGIN` of expiry.
+- Service objects are built from the discovery documents bundled with
+  `googleapiclient` (`static_discovery=True`), so building never hits the network.
+- Each worker thread gets its own service object, because the underlying
+  `httplib2` transport is not thread-safe.
+
+Setting BROKER_GOOGLE_API_ENDPOINT (e.g. http://127.0.0.1:8099/ for the fake
+server in `fakes/gmail_server.py`, which also serves Calendar) points every client at that root URL and
+sends requests unauthenticated, which is how local tests avoid real Google APIs.
+"""
+
+import datetime
+import os
+import pickle
+import threading
+
+# The google-auth / googleapiclient libraries are imported inside the functions that
+# use them: they dominate import time, and the dashboard or a run without Google
+# tasks should not pay for them at startup.
+
+# Refresh credentials this long before they actually expire
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+# token_path -> shared credentials object
+_credentials = {}
+_credentials_lock = threading.Lock()
+
+# Per-thread cache: (api, version, token_path) -> (credentials, service)
+_local = threading.local()
+
+
+def api_endpoint_override():
+    """Return the root URL configured in BROKER_GOOGLE_API_ENDPOINT, or None."""
+    return os.environ.get("BROKER_GOOGLE_API_ENDPOINT") or None
+
+
+def _needs_refresh(creds):
+    """Return True if the credentials are invalid or expire within REFRESH_MARGIN."""
+    if not creds.valid:
+        return True
+    expiry = getattr(creds, "expiry", None)
+    return expiry is not None and expiry - datetime.datetime.utcnow() < REFRESH_MARGIN
+
+
+def get_credentials(token_path, scopes, client_secrets='tools/credentials.json'):
+    """
+    Return shared OAuth2 credentials for a token file, refreshing only when near expiry.
+
+    Loads saved credentials from the pickle file if available, otherwise triggers
+    an OAuth2 login flow and saves the resulting token.
+
+    Args:
+        token_path (str): Path of the pickled token (e.g. 'tools/token.pickle').
+        scopes (list): OAuth scopes required by the API.
+        client_secrets (str): Path of the OAuth client secrets file.
+
+    Returns:
+        google.oauth2.credentials.Credentials: Valid credentials.
+    """
+    with _credentials_lock:
+        creds = _credentials.get(token_path)
+
+        # Load the saved token on first use in this process
+        if creds is None and os.path.exists(token_path):
+            with open(token_path, 'rb') as token:
+                creds = pickle.load(token)
+
+        if creds is None or _needs_refresh(creds):
+            if creds and creds.refresh_token:
+                from google.auth.transport.requests import Request  # Used for refreshing tokens
+
+                # Refresh the token if it's expired (or about to) and we have a refresh token
+                creds.refresh(Request())
+            else:
+                from google_auth_oauthlib.flow import InstalledAppFlow  # For handling OAuth2 login flow
+
+                # Start the OAuth flow using client credentials
+                flow = InstalledAppFlow.from_client_secrets_file(client_secrets, scopes)
+                creds = flow.run_local_server(port=0)
+
+            # Save the new token for future runs
+            with open(token_path, 'wb') as token:
+                pickle.dump(creds, token)
+
+        _credentials[token_path] = creds
+        return creds
+
+
+def get_service(api, version, scopes, token_path):
+    """
+    Return an authenticated Google API service client for the current thread.
+
+    Args:
+        api (str): API name, e.g. 'gmail' or 'calendar'.
+        version (str): API version, e.g. 'v1' or 'v3'.
+        scopes (list): OAuth scopes required by the API.
+        token_path (str): Path of the pickled token for this API.
+
+    Returns:
+        googleapiclient.discovery.Resource: Cached service client.
+    """
+    endpoint = api_endpoint_override()
+    if endpoint:
+        creds = _anonymous_credentials()
+    else:
+        creds = get_credentials(token_path, scopes)
+
+    services = getattr(_local, "services", None)
+    if services is None:
+        services = _local.services = {}
+
+    key = (api, version, token_path)
+    cached = services.get(key)
+    # Rebuild only if the credentials object was replaced (e.g. a new OAuth login)
+    if cached is None or cached[0] is not creds:
+        from googleapiclient.discovery import build  # To build Google API service clients
+
+        service = build(api, version, credentials=creds,
+                        cache_discovery=False, static_discovery=True,
+                        client_options={"api_endpoint": endpoint} if endpoint else None)
+        cached = services[key] = (creds, service)
+    return cached[1]
+
+
+def _anonymous_credentials():
+    """Return one shared set of anonymous credentials for fake endpoints."""
+    from google.auth.credentials import AnonymousCredentials  # Used against local fake endpoints
+
+    with _credentials_lock:
+        return _credentials.setdefault("<anonymous>", AnonymousCredentials())
+
+
+def clear_cache():
+    """Forget all cached credentials and this thread's service clients."""
+    with _credentials_lock:
+        _credentials.clear()
+    _local.services = {}
@@ -0,0 +1,253 @@
+"""
+tools/upload_tool.py
+
+Stores client documents uploaded through the dashboard and matches them to the
+`documents` checklist the planner reads.
+
+- `save_upload` copies the upload to disk in fixed-size chunks while hashing it,
+  so memory use does not grow with the file size. Files are content-addressed
+  (`<upload dir>/<sha256[:2]>/<sha256>.<ext>`): uploading the same bytes again,
+  under any name, is detected and skipped.
+- Every stored file gets a row in `document_uploads` (indexed by client and by
+  status) with status 'pending'.
+- `match_pending_uploads` runs in the background (as a 'match_uploads' job of
+  `job_worker.py`): it finds the client and document type of each pending upload
+  (the client chosen at upload time, or names/emails in the file name) and marks
+  the matching `documents` row `received = TRUE`, so `fetch_missing_documents`
+  stops listing it.
+
+Configuration is read from the environment:
+    BROKER_UPLOAD_DIR (default "uploads"), BROKER_UPLOAD_CHUNK_BYTES (default 1 MiB)
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+from utils.client_directory import get_client_directory, normalize_name
+from utils.db import run_query, transaction  # Pooled MySQL access
+from utils.query_cache import cached, invalidate
+
+# Where uploaded files are stored
+UPLOAD_DIR = os.environ.get("BROKER_UPLOAD_DIR", "uploads")
+
+# Bytes read and written per step while storing an upload
+CHUNK_BYTES = int(os.environ.get("BROKER_UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+# Upload states: waiting for the matcher, matched to a document, or no document found
+PENDING, MATCHED, UNMATCHED = "pending", "matched", "unmatched"
+
+# Set once the uploads table has been checked in this process
+_upload_table_ready = False
+_upload_table_lock = threading.Lock()
+
+
+def ensure_upload_table():
+    """
+    Creates the `document_uploads` table if it is missing.
+    """
+    global _upload_table_ready
+    if _upload_table_ready:
+        return
+    with _upload_table_lock:
+        if _upload_table_ready:
+            return
+        run_query("""
+            CREATE TABLE IF NOT EXISTS document_uploads (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                sha256 CHAR(64) NOT NULL,
+                original_name VARCHAR(255) NOT NULL,
+                stored_path VARCHAR(255) NOT NULL,
+                size_bytes BIGINT NOT NULL,
+                client_id INT NULL,
+                document_id INT NULL,
+                status VARCHAR(20) NOT NULL,
+                uploaded_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                matched_at DATETIME NULL,
+                UNIQUE INDEX uq_document_uploads_sha256 (sha256),
+                INDEX idx_document_uploads_client_id (client_id),
+                INDEX idx_document_uploads_status_id (status, id)
+            )
+        """)
+        _upload_table_ready = True
+
+
+def _find_upload(sha256):
+    rows = run_query("SELECT * FROM document_uploads WHERE sha256 = %s", (sha256,))
+    return rows[0] if rows else None
+
+
+def save_upload(stream, filename, client_id=None, upload_dir=None, chunk_bytes=None):
+    """
+    Store an uploaded file by content hash and record it for matching.
+
+    Args:
+        stream: Readable binary file object (e.g. a Streamlit `UploadedFile`).
+        filename (str): Name the file was uploaded under.
+        client_id (int, optional): Client the document belongs to, if known;
+                                   otherwise the matcher looks for one in `filename`.
+        upload_dir (str, optional): Storage directory; defaults to UPLOAD_DIR.
+        chunk_bytes (int, optional): Copy chunk size; defaults to CHUNK_BYTES.
+
+    Returns:
+        dict: The `document_uploads` row plus 'duplicate' (True if the same content
+              was already stored, in which case nothing new is written).
+    """
+    ensure_upload_table()
+    upload_dir = upload_dir or UPLOAD_DIR
+    chunk_bytes = chunk_bytes or CHUNK_BYTES
+    os.makedirs(upload_dir, exist_ok=True)
+
+    # Copy to a temporary file in the same directory, hashing as we go
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=upload_dir, prefix=".upload-", delete=False) as tmp:
+        try:
+            for chunk in iter(lambda: stream.read(chunk_bytes), b""):
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    sha256 = digest.hexdigest()
+
+    existing = _find_upload(sha256)
+    if existing is not None:
+        os.unlink(tmp.name)
+        return dict(existing, duplicate=True)
+
+    # Same-directory rename is atomic: readers never see a partly written file
+    extension = os.path.splitext(filename)[1].lower()
+    stored_path = os.path.join(upload_dir, sha256[:2], sha256 + extension)
+    os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+    os.replace(tmp.name, stored_path)
+
+    # The unique hash turns a concurrent upload of the same content into a no-op
+    run_query(
+        """
+        INSERT INTO document_uploads (sha256, original_name, stored_path, size_bytes, client_id, status)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE sha256 = sha256
+        """,
+        (sha256, os.path.basename(filename), stored_path, size, client_id, PENDING),
+    )
+    invalidate("document_uploads")
+    return dict(_find_upload(sha256), duplicate=False)
+
+
+def _words(text):
+    """Normalized words of a file name: "John_Smith-payslip.pdf" -> "john smith payslip"."""
+    return normalize_name(re.sub(r"[_\-.]+", " ", os.path.splitext(text)[0]))
+
+
+def _candidate_clients(upload, directory):
+    """IDs of the clients an upload may belong to: the one chosen at upload, or those named in the file name."""
+    if upload["client_id"] is not None:
+        return [upload["client_id"]]
+    name = os.path.splitext(upload["original_name"])[0]
+    return [c["id"] for c in directory.mentioned_in(re.sub(r"[_\-]+", " ", name))]
+
+
+def _match_document(upload, missing_by_client, directory):
+    """
+    Pick the client and the missing document an upload most likely is.
+
+    Returns:
+        tuple: (client_id or None, document row or None)
+    """
+    client_ids = _candidate_clients(upload, directory)
+    if len(client_ids) != 1:
+        return None, None  # No client, or several: leave it to a person
+
+    client_id = client_ids[0]
+    words = _words(upload["original_name"])
+    compact = words.replace(" ", "")
+    for document in missing_by_client.get(client_id, []):
+        doc_type = normalize_name(document["type"])
+        # "Bank statement" matches "bank statement", "bank_statement" and "BankStatement"
+        if f" {doc_type} " in f" {words} " or doc_type.replace(" ", "") in compact:
+            return client_id, document
+    return client_id, None
+
+
+def match_pending_uploads(batch_size=100):
+    """
+    Match pending uploads to missing documents and mark those documents received.
+
+    Runs until no pending upload is left, so uploads stored while it runs are
+    picked up too.
+
+    Args:
+        batch_size (int): Uploads read per round.
+
+    Returns:
+        dict: Number of uploads 'matched' and left 'unmatched'.
+    """
+    ensure_upload_table()
+    directory = get_client_directory()
+    totals = {MATCHED: 0, UNMATCHED: 0}
+    while True:
+        uploads = run_query(
+            "SELECT * FROM document_uploads WHERE status = %s ORDER BY id LIMIT %s",
+            (PENDING, batch_size),
+        )
+        if not uploads:
+            break
+
+        # One query for the missing documents of every client in this round
+        client_ids = sorted({c for upload in uploads for c in _candidate_clients(upload, directory)})
+        missing_by_client = {}
+        if client_ids:
+            placeholders = ", ".join(["%s"] * len(client_ids))
+            rows = run_query(
+                f"SELECT id, client_id, type FROM documents WHERE received = FALSE AND client_id IN ({placeholders})",
+                tuple(client_ids),
+            )
+            for row in rows:
+                missing_by_client.setdefault(row["client_id"], []).append(row)
+
+        with transaction() as cursor:
+            for upload in uploads:
+                client_id, document = _match_document(upload, missing_by_client, directory)
+                if document is not None:
+                    cursor.execute("UPDATE documents SET received = TRUE WHERE id = %s", (document["id"],))
+                    missing_by_client[client_id].remove(document)  # Two uploads can't satisfy one row
+                status = MATCHED if document is not None else UNMATCHED
+                cursor.execute(
+                    """
+                    UPDATE document_uploads
+                    SET status = %s, client_id = %s, document_id = %s, matched_at = NOW()
+                    WHERE id = %s
+                    """,
+                    (status, client_id, document["id"] if document else None, upload["id"]),
+                )
+                totals[status] += 1
+
+        # The planner's missing-documents list and the upload metrics changed
+        invalidate("documents", "document_uploads")
+    return {"matched": totals[MATCHED], "unmatched": totals[UNMATCHED]}
+
+
+def has_pending_uploads():
+    """Return True if any upload is waiting for the matcher (never cached)."""
+    ensure_upload_table()
+    return bool(run_query("SELECT id FROM document_uploads WHERE status = %s LIMIT 1", (PENDING,)))
+
+
+@cached(ttl=60, tags=("document_uploads",))
+def fetch_upload_stats():
+    """
+    Count uploads per status for the dashboard.
+
+    Returns:
+        dict: {'pending': n, 'matched': n, 'unmatched': n}
+    """
+    ensure_upload_table()
+    rows = run_query("SELECT status, COUNT(*) AS total FROM document_uploads GROUP BY status")
+    stats = {PENDING: 0, MATCHED: 0, UNMATCHED: 0}
+    stats.update({r["status"]: int(r["total"]) for r in rows})
+    return stats
@@ -3,9 +3,9 @@ dashboard.py
 
 Streamlit-based UI for the Broker Task Automation Agent.
 Features:
-- Manual agent execution.
+- Manual agent execution (queued for `job_worker.py`, with live progress).
 - Filtering and displaying of daily tasks.
-- Uploading documents.
+- Uploading documents (matched to missing client documents in the background).
 - Viewing task history and metrics.
 - Sending a daily digest email to selected clients.
 """
@@ -13,15 +13,25 @@ Features:
 import streamlit as st
 import sys
 import os
+import time
 from datetime import datetime
 
 # Add parent directory to sys.path to allow imports from project root
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import core functionalities
-from main import run_agent
-from utils.db import fetch_task_log, log_task_completion, fetch_client_emails
-from tools.gmail_tool import send_daily_digest
+from utils import job_queue
+from utils.db import (
+    fetch_client_emails,
+    fetch_task_log_page,
+    fetch_task_stats,
+    ensure_task_log_schema,
+)
+from utils.completion_log import CompletionLogWriter
+from tools.gmail_tool import send_daily_digest, send_daily_digest_bulk
+from tools.upload_tool import fetch_upload_stats, save_upload
+from utils.client_directory import get_client_directory
+from utils import metrics
 
 # Set Streamlit app page configuration
 st.set_page_config(page_title="Broker Task Automation Agent", layout="wide")
@@ -29,77 +39,214 @@ st.set_page_config(page_title="Broker Task Automation Agent", layout="wide")
 # App title
 st.title("📊 Broker Task Automation Agent")
 
+# Add the task_id column and the task-history indexes once per server process
+# (the unique task_id index can only be created after the column exists)
+@st.cache_resource
+def _init_task_log_schema():
+    return ensure_task_log_schema()
+
+_init_task_log_schema()
+
 # Initialize session state to store tasks (avoids rerunning agent unnecessarily)
 if "tasks" not in st.session_state:
     st.session_state.tasks = []
 
-# Button to manually trigger the agent and update session state with tasks
+# Task IDs already persisted from this session, so reruns don't write them again
+if "logged_task_ids" not in st.session_state:
+    st.session_state.logged_task_ids = set()
+
+# Button to queue an agent run; a job worker (`python job_worker.py`) executes it,
+# so the UI stays responsive and a second click joins the run already in progress
 if st.button("🔁 Run Agent Now"):
-    st.session_state.tasks = run_agent()
-    st.success("Agent ran successfully!")
+    job_id, created = job_queue.enqueue_job("run_agent", requested_by="dashboard")
+    st.session_state.job_id = job_id
+    if created:
+        st.info(f"Agent run #{job_id} queued.")
+    else:
+        st.info(f"Agent run #{job_id} is already queued or running; showing its progress.")
+
+# Follow the run started from this session, or the latest run after a reload
+job = (
+    job_queue.get_job(st.session_state.job_id) if "job_id" in st.session_state
+    else job_queue.fetch_latest_job("run_agent")
+)
+job_active = job is not None and job["status"] in job_queue.ACTIVE_STATUSES
+if job is not None:
+    # Tasks are persisted by the worker as they are planned and finished
+    st.session_state.tasks = job_queue.fetch_job_tasks(job["id"])
+    if job["status"] == job_queue.QUEUED:
+        st.caption(f"⏳ Agent run #{job['id']} is waiting for a worker...")
+    elif job["status"] == job_queue.RUNNING:
+        st.caption(f"⚙️ Agent run #{job['id']} running: {job['tasks_done']}/{job['tasks_total']} "
+                   "planned tasks finished")
+    elif job["status"] == job_queue.FAILED:
+        st.error(f"Agent run #{job['id']} failed: {job['error']}")
+    else:
+        st.success(f"Agent run #{job['id']} finished at {job['finished_at']} "
+                   f"({job['tasks_failed']} of {job['tasks_total']} tasks failed)")
 
 # Task filter UI section
 st.subheader("📋 Today's Tasks")
 filter_type = st.selectbox("Filter by task type", options=["All", "email", "calendar", "crm"])
 
-# Display filtered tasks
-for task in st.session_state.tasks:
-    # Apply filter if selected
-    if filter_type != "All" and task["type"] != filter_type:
-        continue
-
-    # Layout for task: checkbox and description
-    col1, col2 = st.columns([0.05, 0.95])
-    with col1:
-        completed = st.checkbox("✔️", key=task["content"])
-        if completed:
-            # Log completed task to DB
-            log_task_completion(task["type"], task["content"])
-    with col2:
-        st.markdown(f"**{task['type'].capitalize()}**: {task['content']}")
+# Display filtered tasks; newly checked tasks are written to the DB in one bulk upsert
+with CompletionLogWriter() as completion_log:
+    for task in st.session_state.tasks:
+        # Apply filter if selected
+        if filter_type != "All" and task["type"] != filter_type:
+            continue
+
+        # Layout for task: checkbox and description
+        col1, col2 = st.columns([0.05, 0.95])
+        with col1:
+            completed = st.checkbox("✔️", key=f"done-{task['id']}")
+            if completed and task["id"] not in st.session_state.logged_task_ids:
+                # Buffer completed task for the DB write (once per task ID)
+                completion_log.add(task["type"], task["content"], task_id=task["id"])
+        with col2:
+            st.markdown(f"**{task['type'].capitalize()}**: {task['content']}")
+            if task.get("status") == "failed":
+                st.caption(f"⚠️ Failed after {task['duration_ms']} ms: {task['error']}")
+            elif task.get("status") == "running":
+                st.caption("⏳ Running...")
+
+# Remember what was persisted (the upsert also ignores repeats across sessions)
+st.session_state.logged_task_ids.update(
+    task["id"] for task in st.session_state.tasks
+    if st.session_state.get(f"done-{task['id']}")
+)
 
 # Upload document section
 st.subheader("📎 Upload Documents")
+upload_clients = get_client_directory().clients
+upload_client = st.selectbox(
+    "Client (leave blank to detect it from the file name)",
+    options=[None] + upload_clients,
+    format_func=lambda c: "" if c is None else f"{c['name']} <{c['email']}>",
+)
 uploaded_file = st.file_uploader(
     "Attach client documents (PDF, docx, etc.)", type=["pdf", "docx"]
 )
-if uploaded_file:
-    # Ensure uploads directory exists
-    os.makedirs("uploads", exist_ok=True)
-
-    # Save uploaded file
-    with open(f"uploads/{uploaded_file.name}", "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    st.success(f"{uploaded_file.name} uploaded!")
+# Uploader file IDs already saved in this session -> (level, message) shown on reruns,
+# so a file left in the uploader is not hashed and stored again on every rerun
+if "saved_uploads" not in st.session_state:
+    st.session_state.saved_uploads = {}
 
-# Dashboard metrics section
+if uploaded_file:
+    outcome = st.session_state.saved_uploads.get(uploaded_file.file_id)
+    if outcome is None:
+        # Written in chunks and stored by content hash; re-uploads of known content are detected
+        upload = save_upload(uploaded_file, uploaded_file.name,
+                             client_id=upload_client["id"] if upload_client else None)
+        if upload["duplicate"]:
+            outcome = ("info", f"{uploaded_file.name} was already uploaded (as {upload['original_name']}).")
+        else:
+            # A job worker matches it to the client's missing documents in the background
+            job_queue.enqueue_job("match_uploads", requested_by="dashboard")
+            outcome = ("success", f"{uploaded_file.name} uploaded!")
+        st.session_state.saved_uploads[uploaded_file.file_id] = outcome
+    level, message = outcome
+    (st.info if level == "info" else st.success)(message)
+
+# Dashboard metrics section (aggregated in SQL instead of counting fetched rows)
 st.subheader("📊 Dashboard Insights")
-task_logs = fetch_task_log()
+task_stats = fetch_task_stats()
 
 # Display number of tasks completed and pending uploads
 col1, col2 = st.columns(2)
-col1.metric("Tasks Completed", len(task_logs))
-col2.metric("Pending Uploads", len(os.listdir("uploads")) if os.path.exists("uploads") else 0)
-
-# Display task history log
+col1.metric("Tasks Completed", task_stats["total"])
+upload_stats = fetch_upload_stats()
+col2.metric("Pending Uploads", upload_stats["pending"] + upload_stats["unmatched"])
+if upload_stats["unmatched"]:
+    col2.caption(f"{upload_stats['unmatched']} upload(s) could not be matched to a missing document")
+if task_stats["by_type"]:
+    st.caption(" · ".join(f"{t.capitalize()}: {n}" for t, n in sorted(task_stats["by_type"].items())))
+
+# Display task history log, one keyset-paginated page at a time
 st.subheader("📝 Task History")
+
+# Stack of cursors for the pages visited so far (None = newest page)
+if "history_cursors" not in st.session_state:
+    st.session_state.history_cursors = [None]
+
+task_logs, next_cursor = fetch_task_log_page(cursor=st.session_state.history_cursors[-1])
 for log in task_logs:
     st.markdown(
         f"✔️ **{log['type'].capitalize()}**: {log['content']} on {log.get('completed_at', 'Unknown')}"
     )
 
+col1, col2 = st.columns(2)
+col1.button(
+    "⬅️ Newer",
+    disabled=len(st.session_state.history_cursors) == 1,
+    on_click=lambda: st.session_state.history_cursors.pop(),
+)
+col2.button(
+    "Older ➡️",
+    disabled=next_cursor is None,
+    on_click=lambda: st.session_state.history_cursors.append(next_cursor),
+)
+
+# Recent agent run breakdowns (written by run_agent to the metrics JSON file)
+st.subheader("⏱️ Recent Agent Runs")
+metrics_data = metrics.load_json()
+if not metrics_data or not metrics_data["recent_runs"]:
+    st.caption("No agent runs recorded yet.")
+else:
+    runs = metrics_data["recent_runs"]
+    st.dataframe(
+        [
+            {
+                "Started": r["started_at"],
+                "Duration (ms)": r["duration_ms"],
+                "Tasks": r["tasks"],
+                "Failures": r["failures"],
+            }
+            for r in runs
+        ],
+        use_container_width=True,
+    )
+
+    # Where the latest run spent its time, per stage
+    latest_stages = runs[0]["stages"]
+    if latest_stages:
+        st.bar_chart({stage: s["total_ms"] for stage, s in sorted(latest_stages.items())})
+
+    st.download_button(
+        "Download Prometheus metrics",
+        metrics.to_prometheus(metrics_data),
+        file_name="broker_metrics.prom",
+        mime="text/plain",
+    )
+
 # Digest email sending section
 st.subheader("📧 Send Daily Digest")
 
 # Dropdown to select a client email
 clients = fetch_client_emails()
 selected_client = st.selectbox("Select client to notify", options=clients)
+send_to_all = st.checkbox(f"Send to all {len(clients)} clients (batched)")
 
 # Button to send daily digest email
 if st.button("Send Digest Email"):
-    tasks_for_digest = fetch_task_log()  # Use completed tasks for digest
-    success = send_daily_digest(selected_client, tasks_for_digest)
-    if success:
-        st.success(f"Digest email sent to {selected_client}")
+    # Today's tasks are streamed from MySQL inside the digest functions
+    if send_to_all:
+        # One pass over today's tasks, then one Gmail batch request per 50 recipients
+        results = send_daily_digest_bulk(clients)
+        failed = [r for r in results if r["error"]]
+        if failed:
+            st.error(f"Digest failed for {len(failed)} of {len(results)} clients: "
+                     + ", ".join(r["to"] for r in failed))
+        else:
+            st.success(f"Digest email sent to {len(results)} clients")
     else:
-        st.error("Failed to send digest.")
\ No newline at end of file
+        success = send_daily_digest(selected_client)
+        if success:
+            st.success(f"Digest email sent to {selected_client}")
+        else:
+            st.error("Failed to send digest.")
+
+# Poll the queued/running agent job: rerun the page once everything above has rendered
+if job_active:
+    time.sleep(job_queue.JOB_POLL_SECONDS)
+    st.rerun()
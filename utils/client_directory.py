@@ -0,0 +1,180 @@
+"""
+In-Memory Client Directory for Broker AI System
+
+Resolves client names (as written by the LLM) to client records without a
+database query per name. The whole `clients` table (id, name, email) is loaded
+in one query and indexed by:
+
+- exact name                      -> O(1) lookup
+- normalized name (case, spacing,
+  punctuation and titles ignored) -> O(1) lookup
+- fuzzy match over normalized names for near misses ("Jon Smith" -> "John Smith")
+
+The directory is cached through `utils.query_cache` under the "clients" tag,
+so any write that invalidates "clients" (e.g. a CRM update) makes the next
+lookup reload it.
+
+Unresolvable names raise `ClientNotFoundError` instead of falling back to a
+placeholder address.
+"""
+
+import difflib
+import re
+
+from utils.db import run_query
+from utils.query_cache import cached
+
+# How long the directory is trusted before reloading (seconds)
+DIRECTORY_TTL = 300
+
+# Minimum similarity (0-1) for a fuzzy name match
+FUZZY_CUTOFF = 0.85
+
+# Titles the LLM often adds in front of names
+_TITLES = {"mr", "mrs", "ms", "miss", "dr", "prof"}
+
+
+class ClientNotFoundError(LookupError):
+    """Raised when a name cannot be resolved to a client with an email address."""
+
+
+def normalize_name(name):
+    """
+    Normalize a client name for case-insensitive matching.
+
+    Lowercases, drops punctuation and leading titles, and collapses whitespace:
+    "  Mr. JOHN  o'Neil " -> "john oneil".
+
+    Args:
+        name (str): Name as written in the DB or by the LLM.
+
+    Returns:
+        str: Normalized name.
+    """
+    words = re.sub(r"[^\w\s]", "", (name or "").lower()).split()
+    while words and words[0] in _TITLES:
+        words = words[1:]
+    return " ".join(words)
+
+
+class ClientDirectory:
+    """
+    Lookup tables over client rows.
+
+    Args:
+        rows (list of dict): Rows with 'id', 'name' and 'email' keys.
+    """
+
+    def __init__(self, rows):
+        self.clients = [r for r in rows if r.get("email")]
+        self._by_name = {}
+        self._by_normalized = {}
+        self._by_email = {}
+        for client in self.clients:
+            self._by_email.setdefault(client["email"].lower(), client)
+            # First row wins if names repeat, matching the old `LIMIT`-less lookup
+            self._by_name.setdefault(client["name"], client)
+            self._by_normalized.setdefault(normalize_name(client["name"]), client)
+        self._normalized_names = list(self._by_normalized)
+
+    def __len__(self):
+        return len(self.clients)
+
+    def mentioned_in(self, text, max_words=4):
+        """
+        Find the clients a piece of text mentions by email address or full name.
+
+        Only exact (normalized) names are matched, by looking up every run of up to
+        `max_words` consecutive words, so the cost grows with the text, not the directory.
+
+        Args:
+            text (str): E.g. the content of a completed task.
+            max_words (int): Longest name to look for, in words.
+
+        Returns:
+            list of dict: Matching client rows, without duplicates.
+        """
+        found = {}
+        for email in re.findall(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+", text or ""):
+            client = self._by_email.get(email.lower())
+            if client is not None:
+                found[client["email"]] = client
+        # Drop emails and possessives ("John Smith's renewal") before splitting into words
+        text = re.sub(r"\S+@\S+|['’]s\b", " ", text or "")
+        words = normalize_name(text).split()
+        for start in range(len(words)):
+            for length in range(1, max_words + 1):
+                client = self._by_normalized.get(" ".join(words[start:start + length]))
+                if client is not None:
+                    found[client["email"]] = client
+        return list(found.values())
+
+    def lookup(self, name):
+        """
+        Find the client record for a name.
+
+        Tries an exact match, then a normalized match, then the closest fuzzy match.
+
+        Args:
+            name (str): Client name, e.g. extracted from an LLM task.
+
+        Returns:
+            dict or None: The client row (id, name, email), or None if nothing matches.
+        """
+        client = self._by_name.get(name)
+        if client is not None:
+            return client
+
+        normalized = normalize_name(name)
+        client = self._by_normalized.get(normalized)
+        if client is not None:
+            return client
+
+        close = difflib.get_close_matches(normalized, self._normalized_names, n=1, cutoff=FUZZY_CUTOFF)
+        return self._by_normalized[close[0]] if close else None
+
+    def resolve_email(self, name):
+        """
+        Resolve a client name to an email address.
+
+        Args:
+            name (str): Client name.
+
+        Returns:
+            str: The client's email address.
+
+        Raises:
+            ClientNotFoundError: If no client matches the name.
+        """
+        client = self.lookup(name)
+        if client is None:
+            raise ClientNotFoundError(f"No client with an email address matches '{name}'")
+        return client["email"]
+
+
+@cached(ttl=DIRECTORY_TTL, tags=("clients",))
+def get_client_directory():
+    """
+    Return the shared client directory, loading it with one query when needed.
+
+    Returns:
+        ClientDirectory: Directory over all clients that have an email address.
+    """
+    rows = run_query("SELECT id, name, email FROM clients WHERE email IS NOT NULL")
+    return ClientDirectory(rows)
+
+
+def resolve_client_email(name):
+    """
+    Resolve a client name to an email address using the shared directory.
+
+    Args:
+        name (str): Client name.
+
+    Returns:
+        str: The client's email address.
+
+    Raises:
+        ClientNotFoundError: If no client matches the name.
+    """
+    return get_client_directory().resolve_email(name)
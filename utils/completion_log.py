@@ -0,0 +1,110 @@
+"""
+Buffered Task-Completion Log Writer
+
+Collects completed-task rows in memory during an agent run and writes them to
+the `completed_tasks` table with one bulk INSERT, instead of opening a query per
+task. The buffer is flushed when it reaches `max_batch` rows, when a new row
+arrives after the oldest buffered row is `max_delay` seconds old, and when the
+writer is closed (e.g. at the end of `run_agent`).
+
+Each row carries a stable task ID (see `utils.db.make_task_id`). A task ID is
+only buffered once per writer, and the database upsert ignores IDs that were
+already logged, so completions are written exactly once.
+
+Example:
+    with CompletionLogWriter() as completion_log:
+        completion_log.add("email", "Sent follow-up to Jane")
+"""
+
+import threading
+import time
+
+from utils.db import log_task_completions, make_task_id  # Bulk upsert into completed_tasks
+
+
+class CompletionLogWriter:
+    """
+    Thread-safe buffer for `completed_tasks` rows.
+
+    Args:
+        max_batch (int): Flush as soon as this many rows are buffered.
+        max_delay (float): Flush once the oldest buffered row is this many seconds old.
+    """
+
+    def __init__(self, max_batch=500, max_delay=5.0):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self._rows = []           # Buffered (task_id, type, content, notes, status) tuples
+        self._seen = set()        # Task IDs already accepted by this writer
+        self._first_added = None  # Monotonic time of the oldest buffered row
+        self._lock = threading.Lock()
+
+    def add(self, task_type, content, notes="", status="completed", task_id=None):
+        """
+        Buffer a completed task, flushing if the size or time limit is reached.
+
+        Args:
+            task_type (str): Type of task (e.g. 'email', 'calendar', 'crm').
+            content (str): Summary or details of the task.
+            notes (str): Optional additional notes.
+            status (str): Task status, defaults to 'completed'.
+            task_id (str, optional): Stable task ID; derived from type, content and today's
+                                     date if omitted, so without it a task is only
+                                     de-duplicated within one calendar day.
+
+        Returns:
+            bool: False if the same task ID was already logged by this writer.
+        """
+        task_id = task_id or make_task_id(task_type, content)
+        with self._lock:
+            if task_id in self._seen:
+                return False
+            self._seen.add(task_id)
+            self._rows.append((task_id, task_type, content, notes, status))
+            if self._first_added is None:
+                self._first_added = time.monotonic()
+
+            due = (
+                len(self._rows) >= self.max_batch
+                or time.monotonic() - self._first_added >= self.max_delay
+            )
+            if due:
+                self._flush_locked()
+        return True
+
+    def flush(self):
+        """
+        Write every buffered row to the database in one bulk upsert.
+
+        Returns:
+            int: Number of rows written.
+        """
+        with self._lock:
+            return self._flush_locked()
+
+    def _flush_locked(self):
+        """Flush the buffer; caller must hold `self._lock`."""
+        if not self._rows:
+            return 0
+        rows, self._rows = self._rows, []
+        self._first_added = None
+        try:
+            log_task_completions(rows)
+        except Exception:
+            # Put the rows back so a later flush can retry them
+            self._rows = rows + self._rows
+            self._first_added = time.monotonic()
+            raise
+        return len(rows)
+
+    def close(self):
+        """Flush any remaining rows."""
+        return self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
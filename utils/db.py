@@ -1,7 +1,9 @@
 """
 Database Utility Functions for Broker AI System
 
-This module provides database interaction functions using `mysql.connector`.
+This module provides database interaction functions using `mysql.connector`,
+sharing connections through the pool in `utils.db_pool`. Read functions are
+cached by `utils.query_cache` and write functions invalidate the tables they touch.
 It allows querying and updating client, document, task, and appointment data
 used by the automation agent.
 
@@ -9,12 +11,29 @@ Author: [Your Name]
 Date: [YYYY-MM-DD]
 """
 
-import mysql.connector  # Import MySQL connector to interact with MySQL DB
+import datetime
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from utils.db_pool import get_pool  # Shared, bounded pool of MySQL connections
+from utils.query_cache import cached, invalidate  # Process-wide cache for read queries
+from utils.metrics import span  # Per-stage latency metrics
+
+# Cache lifetimes (seconds) for read queries. Writes made through this module
+# invalidate the affected entries immediately; the TTL bounds staleness for
+# changes made outside this process.
+PLANNER_CACHE_TTL = 30
+DASHBOARD_CACHE_TTL = 60
 
 def run_query(query, params=None):
     """
     Execute a SQL query and return the results as a list of dictionaries.
 
+    The connection is borrowed from the shared pool in `utils.db_pool`
+    (configured via the BROKER_DB_* environment variables) and returned
+    afterwards, so no connect handshake happens on the hot path.
+
     Args:
         query (str): The SQL query to execute.
         params (tuple, optional): Parameters to be safely substituted into the query.
@@ -22,21 +41,100 @@ def run_query(query, params=None):
     Returns:
         list: List of result rows as dictionaries.
     """
-    conn = mysql.connector.connect(
-        host='127.0.0.1',       # Localhost database connection
-        user='root',            # Your DB username
-        password='Gopinath',    # Your DB password
-        database='broker_ai'    # Target database
-    )
-    cursor = conn.cursor(dictionary=True)  # Use dict cursor to return rows as dicts
-    cursor.execute(query, params or ())    # Execute with parameters (or empty tuple)
-    result = cursor.fetchall()             # Fetch all rows
-    conn.commit()                          # Commit (required for INSERT/UPDATE/DELETE)
-    cursor.close()
-    conn.close()
+    with span("db.query"), get_pool().connection() as conn:
+        cursor = conn.cursor(dictionary=True)  # Use dict cursor to return rows as dicts
+        try:
+            cursor.execute(query, params or ())    # Execute with parameters (or empty tuple)
+            result = cursor.fetchall() if cursor.with_rows else []  # Fetch rows for SELECTs
+            conn.commit()                          # Commit (required for INSERT/UPDATE/DELETE)
+        finally:
+            cursor.close()
     return result                          # Return result as list of dictionaries
 
 
+def run_many(query, rows):
+    """
+    Execute the same SQL statement for many parameter tuples in one round trip.
+
+    For INSERT statements `mysql.connector` rewrites `executemany` into a single
+    multi-row INSERT, so a whole batch costs one network round trip.
+
+    Args:
+        query (str): The SQL statement to execute (with %s placeholders).
+        rows (list of tuple): One parameter tuple per row.
+
+    Returns:
+        int: Number of rows affected.
+    """
+    if not rows:
+        return 0
+    with span("db.bulk_write"), get_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(query, rows)  # Batched execution of every parameter tuple
+            affected = cursor.rowcount
+            conn.commit()
+        finally:
+            cursor.close()
+    return affected
+
+
+def iter_query(query, params=None, fetch_size=500):
+    """
+    Execute a SELECT and yield its rows as dictionaries, `fetch_size` rows at a time.
+
+    Uses an unbuffered cursor, so MySQL streams the result set to the client instead
+    of the whole result being materialized in memory first. The pooled connection is
+    held until the generator is exhausted or closed; consume it on the thread that
+    started it (e.g. with `contextlib.closing`).
+
+    Args:
+        query (str): The SELECT to execute.
+        params (tuple, optional): Parameters to be safely substituted into the query.
+        fetch_size (int): Rows fetched from the server per round trip.
+
+    Yields:
+        dict: One result row.
+    """
+    with span("db.stream"), get_pool().connection() as conn:
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            # An unbuffered result must be drained before the connection is reused
+            if getattr(conn, "unread_result", False):
+                conn.consume_results()
+            cursor.close()
+
+
+@contextmanager
+def transaction():
+    """
+    Run several statements on one pooled connection inside a single transaction.
+
+    Yields a dictionary cursor; the transaction is committed when the block exits
+    normally and rolled back if it raises.
+
+    Example:
+        with transaction() as cursor:
+            cursor.execute("UPDATE ...", params)
+            cursor.executemany("INSERT ...", rows)
+    """
+    with get_pool().connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            yield cursor
+            conn.commit()
+        finally:
+            cursor.close()
+
+
+@cached(ttl=PLANNER_CACHE_TTL, tags=("clients",))
 def fetch_clients_for_followup():
     """
     Fetch clients who are not marked as 'Closed' or 'Completed',
@@ -54,6 +152,7 @@ def fetch_clients_for_followup():
     return run_query(query)
 
 
+@cached(ttl=PLANNER_CACHE_TTL, tags=("documents", "clients"))
 def fetch_missing_documents():
     """
     Fetch list of missing documents per client.
@@ -70,6 +169,7 @@ def fetch_missing_documents():
     return run_query(query)
 
 
+@cached(ttl=PLANNER_CACHE_TTL, tags=("appointments", "clients"))
 def fetch_upcoming_appointments():
     """
     Fetch client appointments scheduled within the next 3 days.
@@ -86,26 +186,83 @@ def fetch_upcoming_appointments():
     return run_query(query)
 
 
-def log_task_completion(task_type, content, notes="", status="completed"):
+def make_task_id(task_type, content, day=None):
+    """
+    Build the stable ID that identifies a task in completed_tasks.
+
+    The ID is derived from the task's type, content and the day it was planned,
+    so the same task logged twice on one day (e.g. on every dashboard rerun)
+    maps to the same row. The same type and content on another day gets a
+    different ID, i.e. counts as a new task.
+
+    Args:
+        task_type (str): Type of task (e.g. 'email', 'calendar', 'crm').
+        content (str): Summary or details of the task.
+        day (datetime.date, optional): Day the task belongs to (defaults to today).
+
+    Returns:
+        str: 20-character hex ID.
+    """
+    day = day or datetime.date.today()
+    material = f"{day.isoformat()}|{task_type}|{content}"
+    return hashlib.sha1(material.encode("utf-8")).hexdigest()[:20]
+
+
+# Upsert keyed on the unique task_id: logging the same task again is a no-op
+LOG_TASK_QUERY = """
+    INSERT INTO completed_tasks (task_id, type, content, notes, status)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE task_id = task_id
+"""
+
+
+def log_task_completion(task_type, content, notes="", status="completed", task_id=None):
     """
     Log a task that has been completed into the completed_tasks table.
 
+    Logging is idempotent: a task whose ID is already recorded is not inserted again.
+    Without an explicit `task_id`, the ID is derived from the type, content and today's
+    date (see `make_task_id`), so idempotency only holds within one calendar day: the
+    same task logged on another day is a new row. Pass the planned task's ID to log a
+    task exactly once regardless of when it completes.
+
     Args:
         task_type (str): Type of task (e.g. 'email', 'calendar', 'crm').
         content (str): Summary or details of the task.
         notes (str): Optional additional notes.
         status (str): Task status, defaults to 'completed'.
+        task_id (str, optional): Stable task ID; derived with `make_task_id` (for today) if omitted.
     """
-    query = """
-    INSERT INTO completed_tasks (type, content, notes, status)
-    VALUES (%s, %s, %s, %s)
+    ensure_task_log_schema()
+    task_id = task_id or make_task_id(task_type, content)
+    result = run_query(LOG_TASK_QUERY, (task_id, task_type, content, notes, status))
+    invalidate("completed_tasks")  # Task history and metrics changed
+    return result
+
+
+def log_task_completions(rows):
     """
-    return run_query(query, (task_type, content, notes, status))
+    Log many completed tasks with a single bulk upsert.
 
+    Args:
+        rows (list of tuple): Each tuple is (task_id, task_type, content, notes, status).
 
+    Returns:
+        int: Rows affected as reported by MySQL (already-logged task IDs count as 0).
+    """
+    ensure_task_log_schema()
+    inserted = run_many(LOG_TASK_QUERY, rows)
+    invalidate("completed_tasks")  # Task history and metrics changed
+    return inserted
+
+
+@cached(ttl=DASHBOARD_CACHE_TTL, tags=("completed_tasks",))
 def fetch_task_log():
     """
-    Fetch the task completion log.
+    Fetch the full task completion log.
+
+    Prefer `fetch_task_log_page` and `fetch_task_stats` for anything that runs on
+    every dashboard rerun; this reads the whole table.
 
     Returns:
         list: Completed tasks with type, content, and completion timestamp.
@@ -114,28 +271,179 @@ def fetch_task_log():
     return run_query(query)
 
 
-def fetch_client_emails():
+def digest_window(day=None):
     """
-    Fetch all distinct client emails that are not NULL.
+    Return the [start, end) completion-time window of a daily digest.
+
+    Args:
+        day (date, optional): The day to summarise; defaults to today.
 
     Returns:
-        list: List of client email addresses.
+        tuple: (start, end) datetimes at midnight of `day` and of the next day.
     """
-    query = "SELECT DISTINCT email FROM clients WHERE email IS NOT NULL"
-    rows = run_query(query)
-    return [r["email"] for r in rows]
+    day = day or datetime.date.today()
+    start = datetime.datetime.combine(day, datetime.time.min)
+    return start, start + datetime.timedelta(days=1)
 
 
-def get_client_email_by_name(name):
+def iter_completed_tasks(start, end, fetch_size=500):
     """
-    Get a client email by their name.
+    Stream the tasks completed in [start, end), grouped by type.
+
+    The window is filtered in SQL and rows are ordered by (type, completed_at),
+    matching the `idx_completed_tasks_type_completed_at` index, so consumers can
+    build per-type sections while rows arrive.
 
     Args:
-        name (str): Full name of the client.
+        start (datetime): Window start (inclusive).
+        end (datetime): Window end (exclusive).
+        fetch_size (int): Rows fetched per round trip.
+
+    Yields:
+        dict: Rows with type, content and completed_at.
+    """
+    query = """
+        SELECT type, content, completed_at
+        FROM completed_tasks
+        WHERE completed_at >= %s AND completed_at < %s
+        ORDER BY type, completed_at
+    """
+    yield from iter_query(query, (start, end), fetch_size)
+
+
+# Default number of history rows shown per dashboard page
+TASK_LOG_PAGE_SIZE = 50
+
+# Indexes that keep task-history pagination and per-type metrics cheap,
+# plus the unique key that makes completion logging idempotent
+TASK_LOG_INDEXES = {
+    "idx_completed_tasks_completed_at": "INDEX (completed_at, id)",
+    "idx_completed_tasks_type_completed_at": "INDEX (type, completed_at)",
+    "uq_completed_tasks_task_id": "UNIQUE (task_id)",
+}
+
+# Set once the completed_tasks schema has been checked in this process
+_task_log_schema_ready = False
+_task_log_schema_lock = threading.Lock()
+
+
+def ensure_task_log_indexes():
+    """
+    Create the completed_tasks indexes used by pagination, metrics and upserts, if missing.
+
+    Safe to call repeatedly: existing indexes are looked up in information_schema
+    first (MySQL has no CREATE INDEX IF NOT EXISTS).
 
     Returns:
-        str: Email address if found, else a default placeholder email.
+        list: Names of the indexes that were created.
+    """
+    existing = {
+        r["index_name"]
+        for r in run_query("""
+            SELECT DISTINCT index_name AS index_name
+            FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'completed_tasks'
+        """)
+    }
+    created = []
+    for name, definition in TASK_LOG_INDEXES.items():
+        if name not in existing:
+            kind, columns = definition.split(" ", 1)
+            unique = "UNIQUE " if kind == "UNIQUE" else ""
+            run_query(f"CREATE {unique}INDEX {name} ON completed_tasks {columns}")
+            created.append(name)
+    return created
+
+
+def ensure_task_log_schema():
     """
-    query = "SELECT email FROM clients WHERE name = %s"
-    result = run_query(query, (name,))
-    return result[0]["email"] if result else "client@example.com"
\ No newline at end of file
+    Make sure completed_tasks has the task_id column and its indexes.
+
+    Runs the checks once per process; later calls return immediately.
+    Rows logged before task IDs existed keep a NULL task_id.
+    """
+    global _task_log_schema_ready
+    if _task_log_schema_ready:
+        return
+    with _task_log_schema_lock:
+        if _task_log_schema_ready:
+            return
+        has_task_id = run_query("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = 'completed_tasks'
+              AND column_name = 'task_id'
+        """)
+        if not has_task_id:
+            run_query("ALTER TABLE completed_tasks ADD COLUMN task_id VARCHAR(40) NULL")
+        ensure_task_log_indexes()
+        _task_log_schema_ready = True
+
+
+@cached(ttl=DASHBOARD_CACHE_TTL, tags=("completed_tasks",))
+def fetch_task_log_page(limit=TASK_LOG_PAGE_SIZE, cursor=None, task_type=None):
+    """
+    Fetch one page of the task completion log, newest first, using a keyset cursor.
+
+    Unlike OFFSET paging, each page is an index range scan on (completed_at, id),
+    so the cost does not grow with the size of the history.
+
+    Args:
+        limit (int): Maximum rows to return.
+        cursor (tuple, optional): (completed_at, id) of the last row of the previous
+                                  page; None for the first page.
+        task_type (str, optional): Only return tasks of this type.
+
+    Returns:
+        tuple: (rows, next_cursor) where rows have id, type, content and completed_at,
+               and next_cursor is None when there are no older rows.
+    """
+    conditions, params = [], []
+    if task_type:
+        conditions.append("type = %s")
+        params.append(task_type)
+    if cursor is not None:
+        conditions.append("(completed_at, id) < (%s, %s)")
+        params.extend(cursor)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    # Fetch one extra row to know whether another page exists
+    query = f"""
+        SELECT id, type, content, completed_at
+        FROM completed_tasks
+        {where}
+        ORDER BY completed_at DESC, id DESC
+        LIMIT %s
+    """
+    rows = run_query(query, tuple(params) + (limit + 1,))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1]["completed_at"], rows[-1]["id"])
+    return rows, next_cursor
+
+
+@cached(ttl=DASHBOARD_CACHE_TTL, tags=("completed_tasks",))
+def fetch_task_stats():
+    """
+    Aggregate the task completion log for dashboard metrics.
+
+    Returns:
+        dict: {"total": int, "by_type": {task_type: count}}
+    """
+    query = "SELECT type, COUNT(*) AS total FROM completed_tasks GROUP BY type"
+    by_type = {r["type"]: int(r["total"]) for r in run_query(query)}
+    return {"total": sum(by_type.values()), "by_type": by_type}
+
+
+@cached(ttl=DASHBOARD_CACHE_TTL, tags=("clients",))
+def fetch_client_emails():
+    """
+    Fetch all distinct client emails that are not NULL.
+
+    Returns:
+        list: List of client email addresses.
+    """
+    query = "SELECT DISTINCT email FROM clients WHERE email IS NOT NULL"
+    rows = run_query(query)
+    return [r["email"] for r in rows]
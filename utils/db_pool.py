@@ -0,0 +1,274 @@
+"""
+MySQL Connection Pool for Broker AI System
+
+This module keeps a bounded set of open `mysql.connector` connections that
+every function in `utils.db` shares, so the connect handshake is paid once
+per connection instead of once per query.
+
+Features:
+- Bounded pool size (callers block until a connection is free).
+- Health check (ping) before handing out a connection that sat idle longer than
+  the ping threshold; recently used connections are handed out without a round trip.
+- Reaping of connections that sat idle longer than the idle timeout.
+- Per-thread checkout: nested queries on the same thread reuse one connection.
+
+Configuration is read from the environment:
+    BROKER_DB_HOST, BROKER_DB_PORT, BROKER_DB_USER, BROKER_DB_PASSWORD,
+    BROKER_DB_NAME, BROKER_DB_POOL_SIZE, BROKER_DB_POOL_TIMEOUT,
+    BROKER_DB_IDLE_TIMEOUT, BROKER_DB_PING_AFTER
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def mysql_connect(**connect_args):
+    """Open a MySQL connection (the driver is imported on first use)."""
+    import mysql.connector  # MySQL driver used to open the underlying connections
+    return mysql.connector.connect(**connect_args)
+
+
+def db_config_from_env():
+    """
+    Build the connection settings for the pool from environment variables.
+
+    Returns:
+        dict: Keyword arguments for `mysql.connector.connect` plus pool settings
+              (`pool_size`, `pool_timeout`, `idle_timeout`, `ping_after`).
+    """
+    return {
+        "host": os.environ.get("BROKER_DB_HOST", "127.0.0.1"),
+        "port": int(os.environ.get("BROKER_DB_PORT", "3306")),
+        "user": os.environ.get("BROKER_DB_USER", "root"),
+        "password": os.environ.get("BROKER_DB_PASSWORD", ""),
+        "database": os.environ.get("BROKER_DB_NAME", "broker_ai"),
+        "pool_size": int(os.environ.get("BROKER_DB_POOL_SIZE", "5")),
+        "pool_timeout": float(os.environ.get("BROKER_DB_POOL_TIMEOUT", "30")),
+        "idle_timeout": float(os.environ.get("BROKER_DB_IDLE_TIMEOUT", "300")),
+        "ping_after": float(os.environ.get("BROKER_DB_PING_AFTER", "5")),
+    }
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no connection becomes free within the pool timeout."""
+
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of MySQL connections.
+
+    Args:
+        pool_size (int): Maximum number of connections open at once.
+        pool_timeout (float): Seconds to wait for a free connection before failing.
+        idle_timeout (float): Seconds a connection may sit unused before it is closed.
+        ping_after (float): Only connections idle for longer than this are pinged
+                            before being handed out.
+        connect_factory (callable, optional): Opens a connection from `connect_args`;
+            defaults to `mysql.connector.connect`. Benchmarks pass a local stand-in.
+        **connect_args: Passed straight to the connect factory.
+    """
+
+    def __init__(self, pool_size=5, pool_timeout=30.0, idle_timeout=300.0, ping_after=5.0,
+                 connect_factory=None, **connect_args):
+        self.connect_factory = connect_factory or mysql_connect
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.connect_args = connect_args
+
+        # Each slot represents one connection that may be open (idle or checked out)
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+        # Idle connections as (connection, last_used_timestamp), most recent on the right
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+        # Per-thread checkout record: (connection, nesting depth)
+        self._local = threading.local()
+
+    def _connect(self):
+        """Open a brand-new connection using the configured settings."""
+        return self.connect_factory(**self.connect_args)
+
+    @staticmethod
+    def _is_healthy(conn):
+        """Return True if the connection still answers a ping."""
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        """Close a connection, ignoring errors from already-broken sockets."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _reap_idle(self):
+        """
+        Close idle connections that have not been used within `idle_timeout`.
+
+        Must be called with `self._lock` held. Returns the connections to close
+        so the actual socket teardown happens outside the lock.
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        stale = []
+        # Oldest connections sit on the left of the deque
+        while self._idle and self._idle[0][1] < cutoff:
+            stale.append(self._idle.popleft()[0])
+        return stale
+
+    def acquire(self):
+        """
+        Check out a connection for the current thread.
+
+        If this thread already holds a connection (e.g. a nested query), the same
+        connection is returned and its nesting depth is increased.
+
+        Returns:
+            MySQLConnection: An open, healthy connection.
+
+        Raises:
+            PoolTimeoutError: If no connection is free within `pool_timeout`.
+        """
+        held = getattr(self._local, "held", None)
+        if held is not None:
+            conn, depth = held
+            self._local.held = (conn, depth + 1)
+            return conn
+
+        if not self._slots.acquire(timeout=self.pool_timeout):
+            raise PoolTimeoutError(
+                f"No database connection available within {self.pool_timeout}s "
+                f"(pool size {self.pool_size})"
+            )
+
+        try:
+            conn, last_used = None, None
+            with self._lock:
+                stale = self._reap_idle()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+            for old in stale:
+                self._close_quietly(old)
+
+            # Replace a connection that died while it was idle; one used moments ago
+            # is handed out without the extra ping round trip
+            idle_for = time.monotonic() - last_used if conn is not None else 0.0
+            if conn is not None and idle_for > self.ping_after and not self._is_healthy(conn):
+                self._close_quietly(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+        self._local.held = (conn, 1)
+        return conn
+
+    def release(self, conn, discard=False):
+        """
+        Return a connection checked out with `acquire`.
+
+        Args:
+            conn: The connection previously returned by `acquire`.
+            discard (bool): Close the connection instead of keeping it idle
+                            (used after errors that may leave it in a bad state).
+        """
+        held = getattr(self._local, "held", None)
+        if held is None or held[0] is not conn:
+            raise RuntimeError("Connection released by a thread that does not hold it")
+
+        _, depth = held
+        if depth > 1:
+            self._local.held = (conn, depth - 1)
+            return
+
+        self._local.held = None
+        if discard:
+            self._close_quietly(conn)
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out a connection and always returns it.
+
+        Example:
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+        """
+        conn = self.acquire()
+        failed = False
+        try:
+            yield conn
+        except Exception:
+            failed = True
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            # A connection that broke during the query is dropped, not reused
+            self.release(conn, discard=failed and not self._is_healthy(conn))
+
+    def close_all(self):
+        """Close every idle connection (checked-out connections close on release)."""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+
+# Process-wide pool shared by every `utils.db` function, created on first use
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Return the shared connection pool, creating it from the environment on first use.
+
+    Returns:
+        ConnectionPool: The process-wide pool.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**db_config_from_env())
+    return _pool
+
+
+def set_pool(pool):
+    """
+    Replace the shared pool (e.g. with one backed by a local database stand-in).
+
+    Args:
+        pool (ConnectionPool): The pool every `utils.db` function should use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = pool
+
+
+def reset_pool():
+    """Close and forget the shared pool (e.g. after changing DB settings)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = None
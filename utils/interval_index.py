@@ -0,0 +1,119 @@
+"""
+In-memory index of busy time intervals.
+
+Intervals are kept sorted and merged (no two overlap or touch), so a conflict
+check is one binary search: only the interval starting right before the
+candidate's end can overlap it.
+
+Example:
+    busy = IntervalIndex([(nine, ten), (eleven, noon)])
+    busy.overlaps(ten, eleven)          # False
+    busy.next_free(nine, hour, five_pm) # ten (earliest free start)
+    busy.add(ten, eleven)               # Book it
+"""
+
+import bisect
+import threading
+
+
+class IntervalIndex:
+    """
+    Thread-safe set of half-open [start, end) intervals.
+
+    Args:
+        intervals (iterable, optional): Initial (start, end) pairs; any comparable
+                                        values (e.g. datetimes) work.
+    """
+
+    def __init__(self, intervals=()):
+        self._starts = []  # Sorted interval starts
+        self._ends = []    # End of the interval at the same position
+        self._lock = threading.Lock()
+        for start, end in sorted(intervals):
+            self.add(start, end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(zip(self._starts, self._ends)))
+
+    def _overlaps(self, start, end):
+        # The last interval starting before `end` is the only one that can reach past `start`
+        position = bisect.bisect_left(self._starts, end) - 1
+        return position >= 0 and self._ends[position] > start
+
+    def overlaps(self, start, end):
+        """Return True if [start, end) intersects any interval (O(log n))."""
+        with self._lock:
+            return self._overlaps(start, end)
+
+    def _add(self, start, end):
+        left = bisect.bisect_left(self._ends, start)     # First interval ending at/after start
+        right = bisect.bisect_right(self._starts, end)   # First interval starting after end
+        if left < right:
+            start = min(start, self._starts[left])
+            end = max(end, self._ends[right - 1])
+        self._starts[left:right] = [start]
+        self._ends[left:right] = [end]
+
+    def add(self, start, end):
+        """Insert [start, end), merging it with intervals it overlaps or touches."""
+        if start < end:
+            with self._lock:
+                self._add(start, end)
+
+    def try_add(self, start, end):
+        """
+        Insert [start, end) only if it is free.
+
+        Returns:
+            bool: True if the interval was added, False on a conflict.
+        """
+        with self._lock:
+            if self._overlaps(start, end):
+                return False
+            self._add(start, end)
+            return True
+
+    def remove(self, start, end):
+        """Free [start, end), splitting intervals that cover it partly."""
+        with self._lock:
+            left = bisect.bisect_right(self._ends, start)
+            right = bisect.bisect_left(self._starts, end)
+            pieces = []
+            for s, e in zip(self._starts[left:right], self._ends[left:right]):
+                if s < start:
+                    pieces.append((s, start))
+                if e > end:
+                    pieces.append((end, e))
+            self._starts[left:right] = [s for s, _ in pieces]
+            self._ends[left:right] = [e for _, e in pieces]
+
+    def _next_free(self, start, duration, not_after):
+        candidate = start
+        position = bisect.bisect_right(self._starts, candidate) - 1
+        if position >= 0 and self._ends[position] > candidate:
+            candidate = self._ends[position]  # Inside a busy interval: skip to its end
+        position += 1
+        # Walk forward over busy intervals until the gap before the next one is big enough
+        while position < len(self._starts) and self._starts[position] < candidate + duration:
+            candidate = max(candidate, self._ends[position])
+            position += 1
+        return candidate if candidate + duration <= not_after else None
+
+    def next_free(self, start, duration, not_after):
+        """
+        Find the earliest free interval of `duration` starting at or after `start`.
+
+        Args:
+            start: Earliest acceptable start.
+            duration: Length of the interval (e.g. a timedelta).
+            not_after: The interval must end by this point.
+
+        Returns:
+            The start of the free interval, or None if none fits.
+        """
+        with self._lock:
+            return self._next_free(start, duration, not_after)
@@ -0,0 +1,295 @@
+"""
+Background Job Queue for Agent Runs
+
+The dashboard used to call `run_agent()` inside the Streamlit script, blocking the
+UI for the whole LLM + API run and starting a second run on a double click. Runs
+are now queued in MySQL and executed by a separate worker process (`job_worker.py`):
+
+- `enqueue_job` adds a run, or returns the run already queued/running for the same
+  dedupe key. A UNIQUE index on `active_key` (set only while a job is queued or
+  running) makes the de-duplication safe across processes and brokers.
+- Workers claim queued jobs with a conditional UPDATE, so two workers never run
+  the same job, and refresh a heartbeat while it runs. Jobs whose worker stopped
+  heartbeating are failed by `fail_stale_jobs`, freeing their dedupe key.
+- Each planned task is persisted in `agent_job_tasks` as it is planned and updated
+  when it finishes, so the dashboard can poll `get_job` / `fetch_job_tasks`.
+
+Job reads are never cached: callers poll them for live status.
+
+Configuration is read from the environment:
+    BROKER_JOB_POLL_SECONDS (default 2), BROKER_JOB_STALE_SECONDS (default 120)
+"""
+
+import os
+import threading
+
+from utils.db import run_query, transaction  # Pooled MySQL access
+
+# How often workers look for new jobs and the dashboard refreshes a running job
+JOB_POLL_SECONDS = float(os.environ.get("BROKER_JOB_POLL_SECONDS", "2"))
+
+# A running job whose heartbeat is older than this is considered abandoned
+JOB_STALE_SECONDS = int(os.environ.get("BROKER_JOB_STALE_SECONDS", "120"))
+
+# Job states; only queued and running jobs hold their dedupe key
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# Set once the job tables have been checked in this process
+_job_tables_ready = False
+_job_tables_lock = threading.Lock()
+
+
+def ensure_job_tables():
+    """
+    Creates the `agent_jobs` and `agent_job_tasks` tables if they are missing.
+    """
+    global _job_tables_ready
+    if _job_tables_ready:
+        return
+    with _job_tables_lock:
+        if _job_tables_ready:
+            return
+        run_query("""
+            CREATE TABLE IF NOT EXISTS agent_jobs (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                kind VARCHAR(40) NOT NULL,
+                dedupe_key VARCHAR(100) NOT NULL,
+                active_key VARCHAR(100) NULL,
+                status VARCHAR(20) NOT NULL,
+                requested_by VARCHAR(100) NULL,
+                worker VARCHAR(100) NULL,
+                error TEXT NULL,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                started_at DATETIME NULL,
+                heartbeat_at DATETIME NULL,
+                finished_at DATETIME NULL,
+                UNIQUE INDEX uq_agent_jobs_active_key (active_key),
+                INDEX idx_agent_jobs_status_id (status, id),
+                INDEX idx_agent_jobs_dedupe_key_id (dedupe_key, id)
+            )
+        """)
+        run_query("""
+            CREATE TABLE IF NOT EXISTS agent_job_tasks (
+                job_id INT NOT NULL,
+                task_id VARCHAR(40) NOT NULL,
+                position INT NOT NULL,
+                type VARCHAR(20) NOT NULL,
+                content TEXT NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                duration_ms FLOAT NULL,
+                error TEXT NULL,
+                updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (job_id, task_id)
+            )
+        """)
+        _job_tables_ready = True
+
+
+def enqueue_job(kind="run_agent", dedupe_key=None, requested_by=None):
+    """
+    Queue a job unless an equivalent one is already queued or running.
+
+    Args:
+        kind (str): What the worker should run (e.g. 'run_agent').
+        dedupe_key (str, optional): Jobs with the same key are not queued twice
+                                    while one is active; defaults to `kind`.
+        requested_by (str, optional): Who asked for the job (shown in the dashboard).
+
+    Returns:
+        tuple: (job_id, created) where `created` is False if an active job with the
+               same dedupe key was returned instead.
+    """
+    ensure_job_tables()
+    dedupe_key = dedupe_key or kind
+    while True:
+        with transaction() as cursor:
+            # The unique active_key makes this a no-op while a job holds the key; an
+            # uncommitted insert of the same key by another request is waited for.
+            # rowcount tells the two apart regardless of the CLIENT_FOUND_ROWS flag.
+            cursor.execute(
+                """
+                INSERT IGNORE INTO agent_jobs (kind, dedupe_key, active_key, status, requested_by)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                (kind, dedupe_key, dedupe_key, QUEUED, requested_by),
+            )
+            created = cursor.rowcount == 1
+
+            # A locking read sees the latest committed row, not this transaction's
+            # REPEATABLE READ snapshot (which may predate the competing insert)
+            cursor.execute("SELECT id FROM agent_jobs WHERE active_key = %s FOR UPDATE", (dedupe_key,))
+            active = cursor.fetchall()
+        if active:
+            return active[0]["id"], created
+        # The active job finished in between: try again
+
+
+def claim_next_job(worker, kinds=("run_agent",)):
+    """
+    Claim the oldest queued job for this worker.
+
+    Args:
+        worker (str): Worker identifier stored on the job (e.g. 'host:pid').
+        kinds (tuple): Job kinds this worker can run.
+
+    Returns:
+        dict or None: The claimed job row, or None if nothing is queued.
+    """
+    ensure_job_tables()
+    placeholders = ", ".join(["%s"] * len(kinds))
+    candidates = run_query(
+        f"SELECT id FROM agent_jobs WHERE status = %s AND kind IN ({placeholders}) ORDER BY id LIMIT 5",
+        (QUEUED,) + tuple(kinds),
+    )
+    for candidate in candidates:
+        # Only one worker's UPDATE can move the job out of 'queued'
+        with transaction() as cursor:
+            cursor.execute(
+                """
+                UPDATE agent_jobs
+                SET status = %s, worker = %s, started_at = NOW(), heartbeat_at = NOW()
+                WHERE id = %s AND status = %s
+                """,
+                (RUNNING, worker, candidate["id"], QUEUED),
+            )
+            claimed = cursor.rowcount == 1
+        if claimed:
+            return get_job(candidate["id"])
+    return None
+
+
+def heartbeat(job_id):
+    """Record that the worker running `job_id` is still alive."""
+    run_query("UPDATE agent_jobs SET heartbeat_at = NOW() WHERE id = %s", (job_id,))
+
+
+def finish_job(job_id, error=None):
+    """
+    Mark a running job as succeeded (or failed, if `error` is given) and free its dedupe key.
+
+    Args:
+        job_id (int): The job to finish.
+        error (str, optional): Failure message; None means the job succeeded.
+    """
+    run_query(
+        """
+        UPDATE agent_jobs
+        SET status = %s, error = %s, active_key = NULL, finished_at = NOW()
+        WHERE id = %s
+        """,
+        (FAILED if error else SUCCEEDED, error, job_id),
+    )
+
+
+def fail_stale_jobs(stale_seconds=None):
+    """
+    Fail running jobs whose worker stopped sending heartbeats (e.g. it was killed).
+
+    Args:
+        stale_seconds (int, optional): Heartbeat age limit; defaults to JOB_STALE_SECONDS.
+
+    Returns:
+        int: Number of jobs failed.
+    """
+    ensure_job_tables()
+    stale = run_query(
+        "SELECT id FROM agent_jobs WHERE status = %s AND heartbeat_at < NOW() - INTERVAL %s SECOND",
+        (RUNNING, stale_seconds or JOB_STALE_SECONDS),
+    )
+    for job in stale:
+        finish_job(job["id"], error="Worker stopped responding")
+    return len(stale)
+
+
+def record_job_task(job_id, position, task):
+    """
+    Persist a newly planned task of a job (status 'running').
+
+    Args:
+        job_id (int): The job the task belongs to.
+        position (int): Order of the task in the plan.
+        task (dict): Task with 'id', 'type' and 'content'.
+    """
+    run_query(
+        """
+        INSERT INTO agent_job_tasks (job_id, task_id, position, type, content, status)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE job_id = job_id
+        """,
+        (job_id, task["id"], position, task["type"], task["content"], RUNNING),
+    )
+
+
+def record_job_task_result(job_id, task, result):
+    """
+    Store the outcome of one task of a job.
+
+    Args:
+        job_id (int): The job the task belongs to.
+        task (dict): Task with an 'id'.
+        result (dict): Executor result with 'status', 'duration_ms' and 'error'.
+    """
+    run_query(
+        """
+        UPDATE agent_job_tasks
+        SET status = %s, duration_ms = %s, error = %s, updated_at = NOW()
+        WHERE job_id = %s AND task_id = %s
+        """,
+        (result["status"], result["duration_ms"], result["error"], job_id, task["id"]),
+    )
+
+
+def get_job(job_id):
+    """
+    Fetch one job with its task progress.
+
+    Returns:
+        dict or None: The job row plus 'tasks_total', 'tasks_done' and 'tasks_failed'.
+    """
+    rows = run_query("SELECT * FROM agent_jobs WHERE id = %s", (job_id,))
+    if not rows:
+        return None
+    job = rows[0]
+    counts = run_query(
+        "SELECT status, COUNT(*) AS total FROM agent_job_tasks WHERE job_id = %s GROUP BY status",
+        (job_id,),
+    )
+    by_status = {r["status"]: int(r["total"]) for r in counts}
+    job["tasks_total"] = sum(by_status.values())
+    job["tasks_failed"] = by_status.get("failed", 0)
+    job["tasks_done"] = job["tasks_total"] - by_status.get(RUNNING, 0)
+    return job
+
+
+def fetch_latest_job(dedupe_key="run_agent"):
+    """
+    Fetch the most recent job for a dedupe key (active or finished).
+
+    Returns:
+        dict or None: The job (see `get_job`), or None if none was ever queued.
+    """
+    ensure_job_tables()
+    rows = run_query(
+        "SELECT id FROM agent_jobs WHERE dedupe_key = %s ORDER BY id DESC LIMIT 1",
+        (dedupe_key,),
+    )
+    return get_job(rows[0]["id"]) if rows else None
+
+
+def fetch_job_tasks(job_id):
+    """
+    Fetch the tasks of a job in plan order.
+
+    Returns:
+        list of dict: Tasks with 'id', 'type', 'content', 'status', 'duration_ms' and 'error'.
+    """
+    return run_query(
+        """
+        SELECT task_id AS id, type, content, status, duration_ms, error
+        FROM agent_job_tasks
+        WHERE job_id = %s
+        ORDER BY position
+        """,
+        (job_id,),
+    )
@@ -1,20 +1,253 @@
+"""
+Structured, asynchronous event logger for the Broker AI System.
+
+`log_event` only puts a record on an in-memory queue; a background writer
+thread batches records into `logs/execution.log` as JSON lines, so logging
+never blocks the agent's hot path and parallel tasks don't race on the file.
+
+Each line is a JSON object:
+    {"ts": "2025-06-10T08:00:00.123456", "message": "...",
+     "task_id": "...", "task_type": "email", "duration_ms": 812.4, "outcome": "completed"}
+(fields that were not given are omitted).
+
+The file is rotated when it grows beyond BROKER_LOG_MAX_BYTES (default 10 MB)
+or has been open longer than BROKER_LOG_ROTATE_SECONDS (default one day),
+keeping BROKER_LOG_BACKUPS old files (default 5). Pending records are flushed
+at interpreter exit.
+
+Several processes (the dashboard, `job_worker.py`, `main.py`) may share one log
+file: each batch is written and rotated under an exclusive lock on
+`<path>.lock`, and a process reopens the file when another one has rotated it
+away. The lock needs `fcntl` (POSIX); elsewhere give each process its own
+BROKER_LOG_PATH. A process forked after logging starts its own writer; records
+still queued in the parent at fork time are written by the parent only.
+"""
+
+import atexit
+import contextlib
+import datetime
+import json
 import os
+import queue
+import threading
+import time
+
+try:
+    import fcntl  # Cross-process lock around writes and rotation (POSIX only)
+except ImportError:
+    fcntl = None
+
+LOG_PATH = os.environ.get("BROKER_LOG_PATH", "logs/execution.log")
+MAX_BYTES = int(os.environ.get("BROKER_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+ROTATE_SECONDS = float(os.environ.get("BROKER_LOG_ROTATE_SECONDS", "86400"))
+BACKUP_COUNT = int(os.environ.get("BROKER_LOG_BACKUPS", "5"))
+
+
+class AsyncLogWriter:
+    """
+    Background thread that writes queued log records to a rotating file.
+
+    Args:
+        path (str): Log file path.
+        max_bytes (int): Rotate once the file reaches this size (0 disables).
+        rotate_seconds (float): Rotate once the file has been open this long (0 disables).
+        backup_count (int): Number of rotated files to keep (path.1 ... path.N).
+        flush_interval (float): Maximum seconds a record waits before being written.
+        batch_size (int): Maximum records written per batch.
+    """
+
+    def __init__(self, path, max_bytes=MAX_BYTES, rotate_seconds=ROTATE_SECONDS,
+                 backup_count=BACKUP_COUNT, flush_interval=0.5, batch_size=500):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._queue = queue.Queue()
+        self._file = None
+        self._lock_file = None
+        self._opened_at = None
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, record):
+        """Queue a record (dict) for writing; never blocks on file I/O."""
+        self._queue.put(record)
+
+    def flush(self, timeout=5.0):
+        """Block until every record queued so far has been written."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Write pending records and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self._file is not None and not self._file.closed:
+            self._file.close()  # Rotated away by another process
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.monotonic()
+
+    def _replaced(self):
+        """True if another process rotated the file away since it was opened."""
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold the cross-process lock on `<path>.lock` (a no-op without fcntl)."""
+        if fcntl is None:
+            yield
+            return
+        if self._lock_file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._lock_file = open(self.path + ".lock", "a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _expired(self):
+        return bool(self.rotate_seconds) and time.monotonic() - self._opened_at >= self.rotate_seconds
+
+    def _rotate(self):
+        """Shift path.N-1 -> path.N ... path -> path.1 and reopen an empty file."""
+        self._file.close()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _write(self, lines):
+        with self._locked():
+            if self._file is None or self._replaced():
+                self._open()
+            if self._expired():
+                self._rotate()
+
+            # Rotate before the record that would push the file past max_bytes, so a
+            # file only exceeds the limit when a single record is larger than it.
+            # The size comes from the file itself: other processes append to it too.
+            pending, size = [], os.fstat(self._file.fileno()).st_size
+            for line in lines:
+                length = len(line.encode("utf-8"))
+                if self.max_bytes and size and size + length > self.max_bytes:
+                    self._file.write("".join(pending))
+                    self._file.flush()
+                    self._rotate()
+                    pending, size = [], 0
+                pending.append(line)
+                size += length
+            self._file.write("".join(pending))
+            self._file.flush()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            lines, waiters = [], []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            # Drain whatever else is already queued, up to one batch
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    lines.append(json.dumps(item, default=str) + "\n")
+                if stopping or len(lines) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if lines:
+                try:
+                    self._write(lines)
+                except OSError:
+                    pass  # Logging must never take the agent down
+            for waiter in waiters:
+                waiter.set()
+
+        if self._file is not None:
+            self._file.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+
+
+# Process-wide writer, started on the first log call
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    """A forked child has no writer thread: start a fresh writer on its first log call."""
+    global _writer, _writer_lock
+    _writer = None
+    _writer_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_writer():
+    """Return the shared log writer, starting it (and its exit hook) on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AsyncLogWriter(LOG_PATH)
+                atexit.register(_writer.close)
+    return _writer
+
 
-def log_event(message):
+def log_event(message, task_id=None, task_type=None, duration_ms=None, outcome=None, **fields):
     """
-    Appends a log message to the 'logs/execution.log' file.
+    Records a structured log event in 'logs/execution.log'.
 
-    This function is useful for keeping a simple event trail
-    for debugging or audit purposes.
+    The record is queued and written by a background thread, so this returns
+    immediately.
 
     Args:
         message (str): The log message to be recorded.
+        task_id (str, optional): ID of the task the event belongs to.
+        task_type (str, optional): Task type (e.g. 'email', 'calendar', 'crm').
+        duration_ms (float, optional): How long the step took.
+        outcome (str, optional): Result of the step (e.g. 'completed', 'failed').
+        **fields: Any additional JSON-serialisable context (None values are omitted).
     """
+    record = {"ts": datetime.datetime.now().isoformat(), "message": message}
+    fields.update(task_id=task_id, task_type=task_type, duration_ms=duration_ms, outcome=outcome)
+    # Omit fields that were not given to keep lines short
+    record.update((key, value) for key, value in fields.items() if value is not None)
+    get_writer().emit(record)
 
-    # ✅ Create the "logs" directory if it doesn't already exist
-    os.makedirs("logs", exist_ok=True)
 
-    # ✅ Open (or create) the log file in append mode
-    with open("logs/execution.log", "a") as log_file:
-        # ✅ Write the message with a [LOG] tag prefix
-        log_file.write(f"[LOG] {message}\n")
\ No newline at end of file
+def flush_logs(timeout=5.0):
+    """Block until all queued log events have been written (e.g. before reading the file)."""
+    if _writer is not None:
+        _writer.flush(timeout)
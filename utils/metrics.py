@@ -0,0 +1,242 @@
+"""
+Lightweight Tracing and Metrics for Broker AI System
+
+Wrap each stage of an agent run in a span to find where time goes:
+
+    with span("llm.completion"):
+        text = run_llm(prompt)
+
+    @traced("gmail.send")
+    def send_email(...): ...
+
+Every span feeds:
+- a latency histogram per stage (milliseconds, fixed buckets),
+- success/failure counters per stage,
+- the breakdown of the agent run in progress (see `start_run`/`finish_run`).
+
+Export:
+- `to_prometheus()` returns the Prometheus text exposition format.
+- `export_json(path)` writes histograms, counters and the recent run
+  breakdowns to a JSON file (BROKER_METRICS_PATH, default logs/metrics.json),
+  which the dashboard reads to show recent runs.
+"""
+
+import contextvars
+import datetime
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+METRICS_PATH = os.environ.get("BROKER_METRICS_PATH", "logs/metrics.json")
+
+# Histogram bucket upper bounds in milliseconds (+Inf is implicit)
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# Number of finished runs kept for the dashboard
+RECENT_RUNS = 20
+
+_lock = threading.Lock()
+_histograms = {}   # stage -> {"buckets": [counts], "count": int, "sum": float}
+_counters = {}     # (stage, outcome) -> int
+_recent_runs = deque(maxlen=RECENT_RUNS)
+# Breakdown of the run in progress. A context variable, so concurrent runs in one
+# process keep separate breakdowns; worker threads see their run when submitted
+# with `contextvars.copy_context().run` (see utils.task_executor).
+_current_run = contextvars.ContextVar("broker_current_run", default=None)
+
+
+def observe(stage, duration_ms, ok=True):
+    """
+    Record one timed operation.
+
+    Args:
+        stage (str): Stage name, e.g. "db.query" or "gmail.send".
+        duration_ms (float): How long it took.
+        ok (bool): Whether it succeeded.
+    """
+    outcome = "success" if ok else "failure"
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = {"buckets": [0] * len(BUCKETS_MS), "count": 0, "sum": 0.0}
+        for index, bound in enumerate(BUCKETS_MS):
+            if duration_ms <= bound:
+                hist["buckets"][index] += 1
+                break
+        hist["count"] += 1
+        hist["sum"] += duration_ms
+        _counters[(stage, outcome)] = _counters.get((stage, outcome), 0) + 1
+
+        run = _current_run.get()
+        if run is not None:
+            stages = run["stages"]
+            entry = stages.setdefault(stage, {"count": 0, "total_ms": 0.0, "failures": 0})
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + duration_ms, 1)
+            entry["failures"] += 0 if ok else 1
+
+
+@contextmanager
+def span(stage):
+    """
+    Time the enclosed block as one operation of `stage`.
+
+    An exception marks the operation as failed and is re-raised.
+    """
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        observe(stage, (time.perf_counter() - start) * 1000, ok)
+
+
+def traced(stage):
+    """Decorator that wraps every call of the function in `span(stage)`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_run():
+    """Begin collecting a per-stage breakdown for a new agent run."""
+    _current_run.set({
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "stages": {},
+    })
+
+
+def finish_run(duration_ms, tasks=0, failures=0):
+    """
+    Close the current run's breakdown and add it to the recent runs.
+
+    Args:
+        duration_ms (float): Wall time of the whole run.
+        tasks (int): Number of tasks executed.
+        failures (int): Number of tasks that failed.
+
+    Returns:
+        dict: The finished run breakdown.
+    """
+    run = _current_run.get() or {"started_at": None, "stages": {}}
+    _current_run.set(None)
+    with _lock:
+        run.update(duration_ms=round(duration_ms, 1), tasks=tasks, failures=failures)
+        _recent_runs.appendleft(run)
+    return run
+
+
+def recent_runs():
+    """Return the breakdowns of the most recent runs, newest first."""
+    with _lock:
+        return list(_recent_runs)
+
+
+def snapshot():
+    """
+    Return all metrics as plain data.
+
+    Returns:
+        dict: {"histograms": ..., "counters": ..., "recent_runs": [...], "buckets_ms": [...]}
+    """
+    with _lock:
+        return {
+            "buckets_ms": list(BUCKETS_MS),
+            "histograms": {stage: dict(h, buckets=list(h["buckets"])) for stage, h in _histograms.items()},
+            "counters": [
+                {"stage": stage, "outcome": outcome, "value": value}
+                for (stage, outcome), value in sorted(_counters.items())
+            ],
+            "recent_runs": list(_recent_runs),
+        }
+
+
+def to_prometheus(data=None):
+    """
+    Render histograms and counters in the Prometheus text exposition format.
+
+    Args:
+        data (dict, optional): A snapshot (e.g. from `load_json`); defaults to this
+                               process's live metrics.
+
+    Returns:
+        str: Metrics text (stage names become the `stage` label).
+    """
+    data = data or snapshot()
+    buckets_ms = data.get("buckets_ms", BUCKETS_MS)
+    lines = [
+        "# HELP broker_stage_latency_ms Latency of agent stages in milliseconds.",
+        "# TYPE broker_stage_latency_ms histogram",
+    ]
+    for stage, hist in sorted(data["histograms"].items()):
+        cumulative = 0
+        for bound, count in zip(buckets_ms, hist["buckets"]):
+            cumulative += count
+            lines.append(f'broker_stage_latency_ms_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'broker_stage_latency_ms_bucket{{stage="{stage}",le="+Inf"}} {hist["count"]}')
+        lines.append(f'broker_stage_latency_ms_sum{{stage="{stage}"}} {hist["sum"]:.3f}')
+        lines.append(f'broker_stage_latency_ms_count{{stage="{stage}"}} {hist["count"]}')
+
+    lines += [
+        "# HELP broker_stage_total Agent stage operations by outcome.",
+        "# TYPE broker_stage_total counter",
+    ]
+    for counter in data["counters"]:
+        lines.append(
+            f'broker_stage_total{{stage="{counter["stage"]}",outcome="{counter["outcome"]}"}} {counter["value"]}'
+        )
+    return "\n".join(lines) + "\n"
+
+
+def export_json(path=None):
+    """
+    Write the metrics snapshot to a JSON file (atomically).
+
+    Args:
+        path (str, optional): Target file (defaults to METRICS_PATH).
+    """
+    path = path or METRICS_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # A uniquely named temp file, so processes sharing the path never write the same one
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory or ".",
+                                     prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                     delete=False) as f:
+        json.dump(snapshot(), f, indent=2, default=str)
+    os.replace(f.name, path)
+
+
+def load_json(path=None):
+    """
+    Read a metrics snapshot written by `export_json` (e.g. by another process).
+
+    Returns:
+        dict or None: The snapshot, or None if no file exists yet.
+    """
+    try:
+        with open(path or METRICS_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def reset():
+    """Clear every histogram, counter and run breakdown."""
+    _current_run.set(None)
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _recent_runs.clear()
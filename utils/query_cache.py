@@ -0,0 +1,132 @@
+"""
+Query-Result Cache for Broker AI System
+
+A process-wide, thread-safe cache for the read functions in `utils.db`.
+Streamlit runs every browser session in the same server process, so all
+dashboard sessions share these entries and a widget interaction no longer
+re-queries MySQL for data that has not changed.
+
+Each cached function declares the tables it reads (its "tags"). Write
+functions call `invalidate(<table>)` after they commit, which drops every
+entry tagged with that table, so readers never see stale data written by
+this process.
+
+Invalidation is in-memory and does not reach other processes. Data written
+elsewhere is picked up when the entry's TTL expires, which is why results
+reading a table that `job_worker.py` writes in the background
+(SHARED_TABLES: completed tasks from `run_agent`, documents and uploads from
+the upload matcher) are kept for at most BROKER_QUERY_CACHE_SHARED_TTL
+seconds, whatever TTL their function declares. The dashboard therefore shows
+a worker's results within a few seconds, while its own writes (e.g. "Run
+Agent Now") still appear immediately.
+
+Configuration (environment):
+    BROKER_QUERY_CACHE=0                Disable caching entirely (every call hits the DB).
+    BROKER_QUERY_CACHE_SIZE=n           Most results kept (default 1024, least recently used dropped).
+    BROKER_QUERY_CACHE_SHARED_TTL=n     Longest TTL, in seconds, for SHARED_TABLES (default 5).
+
+Cached results are shared between callers and must be treated as read-only.
+
+Example:
+    @cached(ttl=60, tags=("completed_tasks",))
+    def fetch_task_stats():
+        ...
+
+    invalidate("completed_tasks")
+"""
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+ENABLED = os.environ.get("BROKER_QUERY_CACHE", "1") != "0"
+
+# Most cached results kept at once; the least recently used are dropped first
+MAX_ENTRIES = int(os.environ.get("BROKER_QUERY_CACHE_SIZE", "1024"))
+
+# Tables written by job_worker.py, whose invalidations never reach this process
+SHARED_TABLES = frozenset({"completed_tasks", "documents", "document_uploads"})
+
+# Longest TTL of a result that reads one of SHARED_TABLES
+SHARED_TTL = float(os.environ.get("BROKER_QUERY_CACHE_SHARED_TTL", "5"))
+
+# (function name, args, kwargs) -> (expires_at, tags, value), in least-recently-used order
+_entries = OrderedDict()
+
+# table name -> number of invalidations so far; guards against caching a result
+# that was read while a concurrent write was being invalidated
+_versions = {}
+_lock = threading.Lock()
+
+
+def cached(ttl, tags):
+    """
+    Decorator caching a read function's result per argument set.
+
+    Args:
+        ttl (float): Seconds a result stays valid (capped at SHARED_TTL if the
+                     function reads one of SHARED_TABLES).
+        tags (tuple): Table names the function reads; used by `invalidate`.
+
+    Returns:
+        callable: The decorator.
+    """
+    tags = frozenset(tags)
+    if tags & SHARED_TABLES:
+        ttl = min(ttl, SHARED_TTL)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+
+            key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with _lock:
+                entry = _entries.get(key)
+                if entry is not None:
+                    if entry[0] > now:
+                        _entries.move_to_end(key)
+                        return entry[2]
+                    del _entries[key]  # Expired: don't let per-argument keys pile up
+                versions = [_versions.get(tag, 0) for tag in tags]
+
+            # Query outside the lock so slow queries don't block other readers
+            value = func(*args, **kwargs)
+            with _lock:
+                # Only store if none of the tables were invalidated while querying
+                if versions == [_versions.get(tag, 0) for tag in tags]:
+                    _entries[key] = (now + ttl, tags, value)
+                    _entries.move_to_end(key)
+                    while len(_entries) > MAX_ENTRIES:
+                        _entries.popitem(last=False)
+            return value
+
+        wrapper.uncached = func  # Direct access that always hits the database
+        return wrapper
+
+    return decorator
+
+
+def invalidate(*tags):
+    """
+    Drop every cached result that reads any of the given tables.
+
+    Args:
+        *tags (str): Table names that were written to.
+    """
+    with _lock:
+        for tag in tags:
+            _versions[tag] = _versions.get(tag, 0) + 1
+        stale = [key for key, entry in _entries.items() if entry[1].intersection(tags)]
+        for key in stale:
+            del _entries[key]
+
+
+def clear():
+    """Drop every cached result."""
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,226 @@
+"""
+Parallel Task Executor for Broker AI System
+
+Runs independent agent tasks (email, calendar, CRM) concurrently on a thread
+pool instead of one after another, so a run's wall time is bounded by the
+slowest tasks rather than the sum of every Gmail send, Calendar insert and
+DB write.
+
+Features:
+- Configurable worker count (BROKER_AGENT_WORKERS, default 8).
+- Per-task-type concurrency limits (BROKER_AGENT_LIMIT_<TYPE>, e.g.
+  BROKER_AGENT_LIMIT_CALENDAR=2) to stay friendly with external APIs.
+- Batched task types: tasks of a type with a bulk handler (e.g. email
+  reminders sent through Gmail batch requests) are collected and handed
+  over together, up to BROKER_AGENT_BATCH_SIZE (default 50) at a time.
+- Results are returned in the same order as the input tasks, each with
+  its status, duration and error message (if any).
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+
+from utils.metrics import observe  # Per-stage latency metrics
+
+# Default number of tasks of each type allowed to run at the same time
+DEFAULT_TYPE_LIMITS = {"email": 4, "calendar": 2, "crm": 4}
+
+
+def executor_config_from_env():
+    """
+    Read the worker count, per-type limits and batch size from environment variables.
+
+    Returns:
+        dict: {"max_workers": int, "type_limits": {task_type: int}, "batch_size": int}
+    """
+    type_limits = {
+        task_type: int(os.environ.get(f"BROKER_AGENT_LIMIT_{task_type.upper()}", limit))
+        for task_type, limit in DEFAULT_TYPE_LIMITS.items()
+    }
+    return {
+        "max_workers": int(os.environ.get("BROKER_AGENT_WORKERS", "8")),
+        "type_limits": type_limits,
+        "batch_size": int(os.environ.get("BROKER_AGENT_BATCH_SIZE", "50")),
+    }
+
+
+class TaskExecutor:
+    """
+    Dispatch task dicts to their handlers on a bounded thread pool.
+
+    Args:
+        handlers (dict): Maps a task type (e.g. "email") to a callable taking the task.
+        max_workers (int): Number of worker threads.
+        type_limits (dict, optional): Maximum concurrent tasks per task type.
+        batch_handlers (dict, optional): Maps a task type to a callable taking a list of
+            tasks and returning one result dict per task, in order, whose 'error' is
+            None on success. `run_stream` collects these tasks and runs them together.
+        batch_size (int): Maximum tasks handed to a batch handler at once.
+    """
+
+    def __init__(self, handlers, max_workers=8, type_limits=None, batch_handlers=None, batch_size=50):
+        self.handlers = handlers
+        self.batch_handlers = batch_handlers or {}
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self._limits = {
+            task_type: threading.BoundedSemaphore(max(1, limit))
+            for task_type, limit in (type_limits or {}).items()
+        }
+
+    def _run_one(self, task):
+        """
+        Run a single task under its type's concurrency limit.
+
+        Returns:
+            dict: {"status": "completed"|"failed"|"skipped", "duration_ms": float, "error": str|None}
+        """
+        handler = self.handlers.get(task.get("type"))
+        if handler is None:
+            return {"status": "skipped", "duration_ms": 0.0, "error": None}
+
+        limit = self._limits.get(task["type"])
+        if limit is not None:
+            limit.acquire()
+        start = time.perf_counter()
+        try:
+            handler(task)
+            status, error = "completed", None
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if limit is not None:
+                limit.release()
+        observe(f"task.{task['type']}", duration_ms, ok=status == "completed")
+        return {"status": status, "duration_ms": round(duration_ms, 1), "error": error}
+
+    def _run_batch(self, task_type, tasks, on_result):
+        """
+        Run a batch of same-type tasks through their bulk handler.
+
+        A failure of the whole call fails every task of the batch.
+
+        Returns:
+            list of dict: One result per task, as returned by `_run_one`.
+        """
+        start = time.perf_counter()
+        try:
+            errors = [r["error"] for r in self.batch_handlers[task_type](tasks)]
+        except Exception as e:
+            errors = [f"{type(e).__name__}: {e}"] * len(tasks)
+        duration_ms = (time.perf_counter() - start) * 1000
+        observe(f"batch.{task_type}", duration_ms, ok=not any(errors))
+
+        results = []
+        for task, error in zip(tasks, errors):
+            result = {"status": "failed" if error else "completed",
+                      "duration_ms": round(duration_ms, 1), "error": error}
+            if on_result is not None:
+                on_result(task, result)
+            results.append(result)
+        return results
+
+    @staticmethod
+    def _interleave_by_type(tasks):
+        """
+        Order task indexes round-robin across task types.
+
+        This keeps workers from all blocking on one rate-limited type while
+        tasks of other types wait in the queue.
+        """
+        by_type = OrderedDict()
+        for index, task in enumerate(tasks):
+            by_type.setdefault(task.get("type"), []).append(index)
+        return [
+            index
+            for group in zip_longest(*by_type.values())
+            for index in group
+            if index is not None
+        ]
+
+    def _run_and_report(self, task, on_result):
+        """Run one task and pass its outcome to the optional callback."""
+        result = self._run_one(task)
+        if on_result is not None:
+            on_result(task, result)
+        return result
+
+    def run(self, tasks, on_result=None):
+        """
+        Execute every task concurrently and collect their outcomes.
+
+        Args:
+            tasks (list of dict): Tasks with at least a "type" key.
+            on_result (callable, optional): Called as on_result(task, result) from the
+                worker thread as soon as each task finishes.
+
+        Returns:
+            list of dict: One result per task, in the same order as `tasks`.
+        """
+        futures = [None] * len(tasks)
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="broker-task") as pool:
+            for index in self._interleave_by_type(tasks):
+                # Run in a copy of the caller's context so spans count towards its run
+                futures[index] = pool.submit(contextvars.copy_context().run,
+                                             self._run_and_report, tasks[index], on_result)
+            # Surfaces errors raised by the on_result callback
+            return [future.result() for future in futures]
+
+    def run_stream(self, tasks, on_result=None, on_task=None):
+        """
+        Execute tasks from an iterator, starting each one as soon as it arrives.
+
+        This lets execution overlap with a task producer that is still running,
+        such as a streamed LLM plan. Tasks with a batch handler are submitted once
+        `batch_size` of their type have arrived, and the rest when the stream ends.
+
+        Args:
+            tasks (iterable of dict): Tasks with at least a "type" key.
+            on_result (callable, optional): Called as on_result(task, result) from the
+                worker thread as soon as each task finishes.
+            on_task (callable, optional): Called as on_task(task) on the calling thread
+                when each task is received, before it is submitted.
+
+        Returns:
+            tuple: (list of received tasks, list of results), both in arrival order.
+        """
+        received, futures = [], []
+        pending = OrderedDict()  # Task type -> indexes of tasks waiting for their batch
+        batches = []             # (future, indexes) of submitted batches
+
+        def submit_batch(pool, task_type):
+            indexes = pending.pop(task_type)
+            future = pool.submit(contextvars.copy_context().run, self._run_batch,
+                                 task_type, [received[i] for i in indexes], on_result)
+            batches.append((future, indexes))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix="broker-task") as pool:
+            for task in tasks:
+                received.append(task)
+                if on_task is not None:
+                    on_task(task)
+                task_type = task.get("type")
+                if task_type in self.batch_handlers:
+                    pending.setdefault(task_type, []).append(len(received) - 1)
+                    futures.append(None)  # Filled in from the batch's results
+                    if len(pending[task_type]) >= self.batch_size:
+                        submit_batch(pool, task_type)
+                    continue
+                futures.append(pool.submit(contextvars.copy_context().run,
+                                           self._run_and_report, task, on_result))
+            for task_type in list(pending):
+                submit_batch(pool, task_type)
+
+            results = [future.result() if future is not None else None for future in futures]
+            for future, indexes in batches:
+                for index, result in zip(indexes, future.result()):
+                    results[index] = result
+        return received, results